@@ -0,0 +1,386 @@
+"""
+SQX Historical Backfill
+Sweeps /price/byIsinHistorical over every (ISIN, date) in an ISIN list and a
+date range, writing one CSV row per distinct price.
+
+Each ISIN's dates are split into chunks that run concurrently. A chunk walks
+its dates newest first; when the API answers a date with an earlier
+"closest available" pricing_date, every sweep date between the two resolves
+to that same price, so they are skipped rather than requested and stored
+again. Each chunk also remembers the pricing dates it has stored, so dates
+before an ISIN's history, which resolve forward to its first price, do not
+store that price again. Progress is checkpointed so an interrupted sweep resumes where it
+stopped without duplicating rows.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqx_client import SQXClient
+
+HISTORICAL_ENDPOINT = "/price/byIsinHistorical"
+
+CALENDAR_WEEKDAYS = "weekdays"
+CALENDAR_DAILY = "daily"
+CALENDARS = (CALENDAR_WEEKDAYS, CALENDAR_DAILY)
+
+CSV_COLUMNS = ["isin", "requested_date", "pricing_date", "price", "currency"]
+
+# Statuses after which the same date is requested again
+RETRYABLE_STATUSES = {0, 429, 500, 502, 503, 504}
+
+CHECKPOINT_VERSION = 1
+
+
+def read_holidays(path: str) -> Set[str]:
+    """Read YYYY-MM-DD dates, one per line, skipping blanks and # comments"""
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip() and not line.startswith("#")}
+
+
+def sweep_dates(start: str, end: str, calendar: str = CALENDAR_WEEKDAYS,
+                holidays: Iterable[str] = ()) -> List[str]:
+    """Return the calendar's dates from start to end inclusive, newest first"""
+    if calendar not in CALENDARS:
+        raise ValueError(f"Unknown calendar: {calendar}")
+    first = date.fromisoformat(start)
+    day = date.fromisoformat(end)
+    skip = set(holidays)
+    dates = []
+    while day >= first:
+        if (calendar == CALENDAR_DAILY or day.weekday() < 5) and day.isoformat() not in skip:
+            dates.append(day.isoformat())
+        day -= timedelta(days=1)
+    return dates
+
+
+class _Chunk:
+    """
+    A run of one ISIN's sweep dates, newest first.
+
+    The chunk stores prices whose pricing_date lies in (lower, upper]: from
+    just above the next chunk's newest date up to its own newest date. The
+    newest chunk has no upper bound and the oldest no lower bound, so every
+    pricing_date is owned by exactly one chunk. written holds the pricing
+    dates the chunk has stored.
+    """
+
+    def __init__(self, seq: int, isin: str, dates: List[str],
+                 lower: Optional[str], upper: Optional[str], start_index: int = 0,
+                 written: Iterable[str] = ()):
+        self.seq = seq
+        self.isin = isin
+        self.dates = dates
+        self.lower = lower
+        self.upper = upper
+        self.index = start_index
+        self.written: Set[str] = set(written)
+
+    def owns(self, pricing_date: str) -> bool:
+        return ((self.lower is None or pricing_date > self.lower)
+                and (self.upper is None or pricing_date <= self.upper))
+
+
+class BackfillSweeper:
+    """
+    Runs a historical backfill with checkpointing.
+
+    The checkpoint records the CSV size at the moment it was taken, the
+    highest work-item number below which everything is done, completed items
+    above it and the date cursor of items in progress. On resume the CSV is
+    cut back to that size and work restarts from those cursors, so rows
+    written after the last checkpoint are regenerated rather than duplicated.
+    """
+
+    def __init__(self, client: SQXClient, dates: List[str], output_path: str,
+                 checkpoint_path: Optional[str] = None, chunk_days: int = 20,
+                 workers: int = 8, checkpoint_interval: float = 5.0, max_attempts: int = 4,
+                 source: str = ""):
+        if chunk_days < 1:
+            raise ValueError("chunk_days must be at least 1")
+        self.client = client
+        self.dates = dates
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path or output_path + ".checkpoint.json"
+        self.chunk_days = chunk_days
+        self.workers = workers
+        self.checkpoint_interval = checkpoint_interval
+        self.max_attempts = max_attempts
+        self.signature = {
+            "source": source,
+            "dates": len(dates),
+            "first": dates[-1] if dates else None,
+            "last": dates[0] if dates else None,
+            "dates_sha1": hashlib.sha1(",".join(dates).encode()).hexdigest(),
+            "chunk_days": chunk_days,
+        }
+
+        self.counters = {"requests": 0, "rows": 0, "collapsed_dates": 0,
+                         "failed_dates": 0, "not_found_isins": 0, "chunks_done": 0}
+        self.status_counts: Dict[str, int] = {}
+        self.failures: List[Dict[str, Any]] = []
+        self.not_found: Set[str] = set()
+        self._completed_through = -1
+        self._done: Set[int] = set()
+        self._active: Dict[int, _Chunk] = {}
+        self._resume_cursors: Dict[int, int] = {}
+        self._resume_written: Dict[int, List[str]] = {}
+        self._csv_offset = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._file = None
+        self._writer = None
+
+    # ------------------------------------------------------------------
+    # Checkpointing
+    # ------------------------------------------------------------------
+
+    def _load_checkpoint(self) -> bool:
+        """Restore state from the checkpoint file; return True if resuming"""
+        if not os.path.exists(self.checkpoint_path):
+            return False
+        with open(self.checkpoint_path) as f:
+            state = json.load(f)
+        if state.get("version") != CHECKPOINT_VERSION or state.get("signature") != self.signature:
+            raise ValueError(f"Checkpoint {self.checkpoint_path} belongs to a different sweep; "
+                             f"remove it or use another output file")
+        self._completed_through = state["completed_through"]
+        self._done = set(state["done"])
+        self._resume_cursors = {int(seq): index for seq, index in state["partial"].items()}
+        self._resume_written = {int(seq): dates
+                                for seq, dates in state.get("partial_written", {}).items()}
+        self._csv_offset = state["csv_offset"]
+        self.counters.update(state["counters"])
+        self.status_counts = state["status_counts"]
+        self.not_found = set(state["not_found"])
+        return True
+
+    def _save_checkpoint(self):
+        """Atomically write the current progress; caller holds the lock"""
+        if self._file is not None:
+            self._file.flush()
+            self._csv_offset = self._file.tell()
+        partial = {str(seq): chunk.index for seq, chunk in self._active.items()}
+        written = {str(seq): sorted(chunk.written) for seq, chunk in self._active.items()}
+        for seq, index in self._resume_cursors.items():
+            partial.setdefault(str(seq), index)
+            written.setdefault(str(seq), self._resume_written.get(seq, []))
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "signature": self.signature,
+            "csv_offset": self._csv_offset,
+            "completed_through": self._completed_through,
+            "done": sorted(self._done),
+            "partial": partial,
+            "partial_written": written,
+            "counters": self.counters,
+            "status_counts": self.status_counts,
+            "not_found": sorted(self.not_found),
+        }
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _open_output(self, resuming: bool):
+        """Open the CSV, cutting it back to the checkpointed size when resuming"""
+        if resuming:
+            if not os.path.exists(self.output_path):
+                raise ValueError(f"Checkpoint {self.checkpoint_path} exists but {self.output_path} "
+                                 f"does not; remove the checkpoint to start over")
+            with open(self.output_path, "r+b") as f:
+                f.truncate(self._csv_offset)
+            self._file = open(self.output_path, "a", newline="")
+            self._writer = csv.writer(self._file)
+        else:
+            self._file = open(self.output_path, "w", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(CSV_COLUMNS)
+
+    # ------------------------------------------------------------------
+    # Work queue
+    # ------------------------------------------------------------------
+
+    def _work_items(self, isins: Iterable[str]) -> Iterator[_Chunk]:
+        """Expand ISINs into date chunks, skipping work the checkpoint marks done"""
+        starts = list(range(0, len(self.dates), self.chunk_days))
+        seq = -1
+        for isin in isins:
+            for position, start in enumerate(starts):
+                seq += 1
+                if seq <= self._completed_through or seq in self._done:
+                    continue
+                dates = self.dates[start:start + self.chunk_days]
+                end = start + self.chunk_days
+                lower = self.dates[end] if end < len(self.dates) else None
+                upper = dates[0] if position > 0 else None
+                yield _Chunk(seq, isin, dates, lower, upper, self._resume_cursors.get(seq, 0),
+                             self._resume_written.get(seq, ()))
+
+    def _mark_done(self, chunk: _Chunk):
+        """Record a finished chunk and advance the completed-through mark; lock held"""
+        self._active.pop(chunk.seq, None)
+        self._resume_cursors.pop(chunk.seq, None)
+        self._resume_written.pop(chunk.seq, None)
+        self._done.add(chunk.seq)
+        self.counters["chunks_done"] += 1
+        while self._completed_through + 1 in self._done:
+            self._completed_through += 1
+            self._done.discard(self._completed_through)
+
+    # ------------------------------------------------------------------
+    # Sweep
+    # ------------------------------------------------------------------
+
+    def _fetch(self, isin: str, day: str) -> Tuple[int, Any]:
+        """Request one date, retrying transient failures with backoff"""
+        for attempt in range(self.max_attempts):
+            status, response = self.client.request(
+                "GET", HISTORICAL_ENDPOINT, params={"isin": isin, "date": day},
+                use_cache=False, retry=False)
+            with self._lock:
+                self.counters["requests"] += 1
+                self.status_counts[str(status)] = self.status_counts.get(str(status), 0) + 1
+            if status not in RETRYABLE_STATUSES or attempt + 1 == self.max_attempts:
+                return status, response
+            if self._stop.wait(min(0.25 * 2 ** attempt, 10.0)):
+                break
+        return status, response
+
+    def _sweep(self, chunk: _Chunk):
+        """Walk one chunk newest date first, collapsing dates that share a price"""
+        dates = chunk.dates
+        while chunk.index < len(dates) and not self._stop.is_set():
+            if chunk.isin in self.not_found:
+                break
+            day = dates[chunk.index]
+            status, response = self._fetch(chunk.isin, day)
+            if self._stop.is_set() and status in RETRYABLE_STATUSES:
+                return
+
+            pricing = response.get("pricing") if isinstance(response, dict) else None
+            pricing_date = pricing.get("pricing_date") if isinstance(pricing, dict) else None
+            with self._lock:
+                if status == 404:
+                    if chunk.isin not in self.not_found:
+                        self.not_found.add(chunk.isin)
+                        self.counters["not_found_isins"] += 1
+                    break
+                if status != 200 or not isinstance(pricing_date, str):
+                    self.counters["failed_dates"] += 1
+                    if len(self.failures) < 50:
+                        self.failures.append({"isin": chunk.isin, "date": day, "status": status})
+                    chunk.index += 1
+                    continue
+
+                # Every sweep date from pricing_date up to this one resolves to
+                # the same price. A pricing_date after the requested date says
+                # nothing about older dates (it may only bridge a gap), so the
+                # sweep moves on by one date.
+                following = chunk.index + 1
+                if pricing_date <= day:
+                    while following < len(dates) and dates[following] >= pricing_date:
+                        following += 1
+                self.counters["collapsed_dates"] += following - chunk.index - 1
+                if chunk.owns(pricing_date) and pricing_date not in chunk.written:
+                    chunk.written.add(pricing_date)
+                    self._writer.writerow([chunk.isin, day, pricing_date,
+                                           pricing.get("price"), pricing.get("currency")])
+                    self.counters["rows"] += 1
+                chunk.index = following
+
+        with self._lock:
+            if chunk.index >= len(dates) or chunk.isin in self.not_found:
+                self._mark_done(chunk)
+
+    def run(self, isins: Iterable[str]) -> Dict[str, Any]:
+        """Sweep every ISIN across the dates and return the run report"""
+        resuming = self._load_checkpoint()
+        self._open_output(resuming)
+        queue = self._work_items(isins)
+        queue_lock = threading.Lock()
+        start = time.perf_counter()
+        requests_before = self.counters["requests"]
+        interrupted = False
+
+        def worker():
+            while not self._stop.is_set():
+                with queue_lock:
+                    chunk = next(queue, None)
+                if chunk is None:
+                    return
+                with self._lock:
+                    self._active[chunk.seq] = chunk
+                self._sweep(chunk)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            last_checkpoint = time.monotonic()
+            alive = threads
+            while alive:
+                alive[0].join(timeout=0.2)
+                alive = [thread for thread in alive if thread.is_alive()]
+                if time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                    with self._lock:
+                        self._save_checkpoint()
+                    last_checkpoint = time.monotonic()
+        except KeyboardInterrupt:
+            interrupted = True
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            with self._lock:
+                self._save_checkpoint()
+                self._file.close()
+                self._file = None
+
+        elapsed = time.perf_counter() - start
+        requests = self.counters["requests"] - requests_before
+        return {
+            "dates_per_isin": len(self.dates),
+            "first_date": self.signature["first"],
+            "last_date": self.signature["last"],
+            **self.counters,
+            "status_counts": dict(sorted(self.status_counts.items())),
+            "failures": self.failures,
+            "resumed": resuming,
+            "interrupted": interrupted,
+            "complete": not interrupted and not self._active and not self._resume_cursors,
+            "elapsed_s": round(elapsed, 3),
+            "requests_this_run": requests,
+            "requests_per_second": round(requests / elapsed, 2) if elapsed > 0 else 0.0,
+            "output": self.output_path,
+            "checkpoint": self.checkpoint_path,
+        }
+
+
+def print_backfill_report(report: Dict[str, Any]):
+    """Print a backfill report"""
+    print("\n" + "="*70)
+    print("HISTORICAL BACKFILL REPORT")
+    print("="*70)
+    print(f"Dates per ISIN: {report['dates_per_isin']} "
+          f"({report['first_date']} to {report['last_date']})")
+    state = "interrupted" if report["interrupted"] else ("complete" if report["complete"] else "partial")
+    print(f"Sweep: {state}{' (resumed from checkpoint)' if report['resumed'] else ''}, "
+          f"{report['chunks_done']} chunks done")
+    print(f"Rows written: {report['rows']}")
+    print(f"Requests: {report['requests']} total, {report['requests_this_run']} this run "
+          f"({report['requests_per_second']} requests/s)")
+    print(f"Dates collapsed onto an earlier pricing date: {report['collapsed_dates']}")
+    print(f"ISINs not found: {report['not_found_isins']}, failed dates: {report['failed_dates']}")
+    print(f"Status codes: {report['status_counts']}")
+    for failure in report["failures"][:10]:
+        print(f"  {failure['isin']} {failure['date']}: status {failure['status']}")
+    print(f"Elapsed: {report['elapsed_s']}s")
+    print(f"Results written to: {report['output']}")
+    print(f"Checkpoint: {report['checkpoint']}")
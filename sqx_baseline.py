@@ -0,0 +1,250 @@
+"""
+SQX Latency Baselines
+Append-only history of per-endpoint latency histograms, one JSONL record per
+run keyed by run id, environment, base URL and mode. A run is gated against
+a rolling baseline made by merging the histograms of the most recent
+passing runs with the same key: an endpoint regresses when a one-sided
+Mann-Whitney U test says it got slower and a percentile grew by more than
+the allowed threshold. A run with a baseline where no endpoint had enough
+samples to judge is flagged insufficient, not passed.
+"""
+
+import math
+import os
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from sqx_codec import DEFAULT_CODEC
+from sqx_histogram import LatencyHistogram
+
+# Exit status of a run that failed the regression gate
+REGRESSION_EXIT_CODE = 1
+
+# Percentiles whose deltas are compared
+COMPARED_PERCENTILES = (50.0, 90.0, 99.0)
+
+# Gate outcomes stored with each run; failed runs never join a baseline
+GATE_PASS = "pass"
+GATE_FAIL = "fail"
+GATE_INSUFFICIENT = "insufficient"
+
+
+def new_run_id() -> str:
+    """Return a sortable, unique run id"""
+    return f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class LatencyHistory:
+    """
+    Append-only JSONL store of run latency histograms.
+
+    Each record holds run_id, timestamp, environment, base_url, mode, the
+    suite checks run (None outside the suite), gate and an endpoint ->
+    LatencyHistogram.to_dict() mapping. Records are only
+    ever appended, so concurrent pipelines and crashes cannot corrupt
+    earlier runs; a final line cut short mid-write is ignored.
+    """
+
+    def __init__(self, path: str = "sqx_history.jsonl"):
+        self.path = path
+
+    def append(self, run_id: str, environment: str, base_url: str, mode: str,
+               histograms: Dict[str, LatencyHistogram], gate: Optional[str] = None,
+               checks: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Append one run, with the checks it ran if any, and return the stored record"""
+        record = {
+            "run_id": run_id,
+            "timestamp": datetime.now().isoformat(),
+            "environment": environment,
+            "base_url": base_url,
+            "mode": mode,
+            "checks": checks,
+            "gate": gate,
+            "endpoints": {endpoint: histogram.to_dict()
+                          for endpoint, histogram in sorted(histograms.items())},
+        }
+        line = (DEFAULT_CODEC.dumps(record) + "\n").encode()
+        with open(self.path, "ab+") as f:
+            # Start a fresh line after a record cut short by a crash
+            end = f.seek(0, os.SEEK_END)
+            if end > 0:
+                f.seek(end - 1)
+                if f.read(1) != b"\n":
+                    line = b"\n" + line
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        return record
+
+    def records(self, environment: str, base_url: str, mode: str,
+                checks: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Yield stored runs with the given key and checks, oldest first"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = DEFAULT_CODEC.loads(line)
+                except ValueError:
+                    continue
+                if (record.get("environment") == environment and record.get("base_url") == base_url
+                        and record.get("mode") == mode and record.get("checks") == checks):
+                    yield record
+
+    def baseline(self, environment: str, base_url: str, mode: str, runs: int = 10,
+                 exclude_run: Optional[str] = None,
+                 checks: Optional[List[str]] = None) -> Tuple[Dict[str, LatencyHistogram], List[str]]:
+        """
+        Merge the latest runs passing the gate into one histogram per endpoint.
+
+        Only runs of the same checks count, as another mix of checks makes
+        other requests. Returns (endpoint -> histogram, run ids merged).
+        """
+        window: "deque[Dict[str, Any]]" = deque(maxlen=runs)
+        for record in self.records(environment, base_url, mode, checks):
+            if record.get("gate") != GATE_FAIL and record.get("run_id") != exclude_run:
+                window.append(record)
+        merged: Dict[str, LatencyHistogram] = {}
+        for record in window:
+            for endpoint, data in record["endpoints"].items():
+                histogram = LatencyHistogram.from_dict(data)
+                if endpoint in merged:
+                    merged[endpoint].merge(histogram)
+                else:
+                    merged[endpoint] = histogram
+        return merged, [record["run_id"] for record in window]
+
+
+def mann_whitney_u(baseline: LatencyHistogram,
+                   current: LatencyHistogram) -> Tuple[float, float, float]:
+    """
+    One-sided Mann-Whitney U test that current is slower than baseline.
+
+    Works on bucket counts directly: both histograms bucket identically, so
+    samples sharing a bucket are ties and get the bucket's average rank.
+    Uses the normal approximation with tie and continuity corrections.
+    Returns (U for current, z, p-value).
+    """
+    if baseline.sub_bucket_bits != current.sub_bucket_bits:
+        raise ValueError("Cannot compare histograms with different precision")
+    n1, n2 = baseline.total_count, current.total_count
+    n = n1 + n2
+    if n1 == 0 or n2 == 0:
+        return 0.0, 0.0, 1.0
+    rank_sum = 0.0
+    ties = 0
+    below = 0
+    for index in sorted(set(baseline.counts) | set(current.counts)):
+        in_current = current.counts.get(index, 0)
+        tied = baseline.counts.get(index, 0) + in_current
+        rank_sum += in_current * (below + (tied + 1) / 2)
+        ties += tied ** 3 - tied
+        below += tied
+    u = rank_sum - n2 * (n2 + 1) / 2
+    mean = n1 * n2 / 2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return u, 0.0, 1.0
+    z = (u - mean - 0.5) / math.sqrt(variance)
+    return u, z, 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def compare_runs(baseline: Dict[str, LatencyHistogram], current: Dict[str, LatencyHistogram],
+                 baseline_runs: List[str], threshold_pct: float = 10.0, alpha: float = 0.01,
+                 min_samples: int = 20, min_delta_ms: float = 1.0) -> Dict[str, Any]:
+    """
+    Compare a run's endpoint histograms against a baseline.
+
+    An endpoint is a regression when the U test rejects "not slower" at
+    alpha and at least one compared percentile grew by threshold_pct or
+    more and by at least min_delta_ms, so jitter on very fast endpoints
+    is not flagged. Endpoints with fewer than min_samples on either side are reported
+    as insufficient rather than judged; when a baseline exists but no
+    endpoint could be judged, the gate itself is insufficient.
+    """
+    endpoints: Dict[str, Dict[str, Any]] = {}
+    for endpoint, histogram in sorted(current.items()):
+        reference = baseline.get(endpoint)
+        entry: Dict[str, Any] = {
+            "baseline_count": reference.total_count if reference else 0,
+            "current_count": histogram.total_count,
+        }
+        endpoints[endpoint] = entry
+        if reference is None:
+            entry["status"] = "new"
+            continue
+        deltas = {}
+        for percentile in COMPARED_PERCENTILES:
+            before = reference.percentile_us(percentile)
+            after = histogram.percentile_us(percentile)
+            deltas[f"p{percentile:g}"] = {
+                "baseline_ms": round(before / 1000, 3),
+                "current_ms": round(after / 1000, 3),
+                "delta_pct": round((after - before) / before * 100, 2) if before else None,
+            }
+        entry["percentiles"] = deltas
+        if min(reference.total_count, histogram.total_count) < min_samples:
+            entry["status"] = "insufficient"
+            continue
+        u, z, p_value = mann_whitney_u(reference, histogram)
+        entry["u"] = u
+        entry["z"] = round(z, 3)
+        entry["p_value"] = p_value
+        # Probability a current request is slower than a baseline one
+        entry["prob_slower"] = round(u / (reference.total_count * histogram.total_count), 4)
+        grew = any(delta["delta_pct"] is not None and delta["delta_pct"] >= threshold_pct
+                   and delta["current_ms"] - delta["baseline_ms"] >= min_delta_ms
+                   for delta in deltas.values())
+        entry["status"] = "regression" if p_value < alpha and grew else "ok"
+    regressions = [endpoint for endpoint, entry in endpoints.items()
+                   if entry["status"] == "regression"]
+    judged = any(entry["status"] in ("ok", "regression") for entry in endpoints.values())
+    if regressions:
+        gate = GATE_FAIL
+    elif judged or not baseline_runs:
+        gate = GATE_PASS
+    else:
+        gate = GATE_INSUFFICIENT
+    return {
+        "baseline_runs": list(baseline_runs),
+        "threshold_pct": threshold_pct,
+        "min_delta_ms": min_delta_ms,
+        "alpha": alpha,
+        "min_samples": min_samples,
+        "endpoints": endpoints,
+        "regressions": regressions,
+        "gate": gate,
+    }
+
+
+def print_comparison_report(report: Dict[str, Any]):
+    """Print percentile deltas and test results per endpoint"""
+    print("\n" + "="*70)
+    print("LATENCY REGRESSION GATE")
+    print("="*70)
+    print(f"Baseline: {len(report['baseline_runs'])} runs "
+          f"({report['baseline_runs'][0]} .. {report['baseline_runs'][-1]})"
+          if report["baseline_runs"] else "Baseline: no earlier runs")
+    print(f"Regression: p < {report['alpha']} and a percentile up >= {report['threshold_pct']}% "
+          f"and >= {report.get('min_delta_ms', 0)}ms")
+    print("-"*70)
+    print(f"{'Endpoint':<28}{'Status':<14}{'p50':>8}{'p90':>8}{'p99':>8}{'p-value':>10}")
+    print("-"*70)
+    for endpoint, entry in report["endpoints"].items():
+        deltas = entry.get("percentiles", {})
+        cells = []
+        for key in ("p50", "p90", "p99"):
+            delta = deltas.get(key, {}).get("delta_pct")
+            cells.append(f"{delta:+.1f}%" if delta is not None else "-")
+        p_value = f"{entry['p_value']:.2g}" if "p_value" in entry else "-"
+        print(f"{endpoint:<28}{entry['status']:<14}{cells[0]:>8}{cells[1]:>8}{cells[2]:>8}{p_value:>10}")
+    print("-"*70)
+    if report["regressions"]:
+        print(f"FAILED: latency regression on {', '.join(report['regressions'])}")
+    elif report["gate"] == GATE_INSUFFICIENT:
+        print(f"WARNING: nothing judged, no endpoint had {report['min_samples']} samples "
+              f"on both sides; run more requests or lower --regression-min-samples")
+    else:
+        print("PASSED: no significant latency regression")
@@ -0,0 +1,380 @@
+"""
+SQX Bulk Fetcher
+Prices an ISIN universe of any size through POST /price/byIsinBulk. ISINs are
+read lazily from a file, split into isin_list batches whose size and number
+in flight adapt to observed latency and errors, anything returned in
+"unprocessed" or left out of a response is resubmitted, and success/not_found
+entries are merged into a single JSONL output as batches complete.
+"""
+
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+from sqx_client import SQXClient
+from sqx_histogram import LatencyHistogram
+from sqx_isin import record_isin
+
+BULK_ENDPOINT = "/price/byIsinBulk"
+
+# Statuses after which a batch is resubmitted rather than abandoned
+RETRYABLE_STATUSES = {0, 408, 413, 429, 500, 502, 503, 504}
+
+# Throttling and server errors: the controller is already backing off, so
+# resubmits after these draw on a separate, larger per-ISIN budget
+BACKOFF_STATUSES = {429, 500, 502, 503, 504}
+
+# Statuses suggesting the batch itself was too large or slow to serve
+OVERSIZE_STATUSES = {0, 408, 413, 504}
+
+
+def read_isins(path: str) -> Iterator[str]:
+    """Yield ISINs from a file, one per line, skipping blanks and # comments"""
+    with open(path) as f:
+        for line in f:
+            isin = line.strip()
+            if isin and not isin.startswith("#"):
+                yield isin
+
+
+class BatchController:
+    """
+    Adapts batch size and in-flight batch count to the API's behavior.
+
+    Batch size grows while batches return well under target_latency and
+    shrinks when they run over it or fail in ways that suggest oversized
+    requests. A server ceiling shows as ceiling_confirmations batches in a
+    row of different sizes coming back mostly unprocessed with the same
+    number of ISINs processed, give or take 10%, or twice as many batches
+    of one size processing exactly the same number; that number then caps
+    the batch size, and only batches above it can lower it again. Randomly
+    unprocessed results shrink with the batch instead and never set a
+    ceiling. Each fully processed batch at the ceiling raises it by one, so
+    a wrong ceiling recovers. The in-flight
+    window grows additively with successful batches and is halved on any
+    failure.
+    """
+
+    def __init__(self, initial_batch: int = 50, min_batch: int = 1, max_batch: int = 500,
+                 initial_in_flight: int = 2, max_in_flight: int = 8,
+                 target_latency: float = 2.0, ceiling_confirmations: int = 3):
+        self.batch_size = initial_batch
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.window = float(initial_in_flight)
+        self.max_in_flight = max_in_flight
+        self.target_latency = target_latency
+        self.ceiling = max_batch
+        self.ceiling_confirmations = ceiling_confirmations
+        self.batch_sizes_used: List[int] = []
+        self._capped: Deque[Tuple[int, int]] = deque(maxlen=2 * ceiling_confirmations)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of batches allowed in flight"""
+        return max(1, int(self.window))
+
+    def next_batch_size(self) -> int:
+        """Return the size to use for the next batch"""
+        size = max(self.min_batch, min(self.batch_size, self.ceiling))
+        self.batch_sizes_used.append(size)
+        return size
+
+    def record_success(self, sent: int, processed: int, latency: float):
+        """Adjust after a 200 response that processed some of sent ISINs"""
+        if sent and (sent - processed) / sent > 0.25:
+            # Below a known ceiling, losses are random and say nothing new
+            if self.ceiling == self.max_batch or sent > self.ceiling:
+                self._capped.append((sent, processed))
+            if self._ceiling_confirmed():
+                self.ceiling = max(self.min_batch, max(count for _, count in self._capped))
+                self.batch_size = min(self.batch_size, self.ceiling)
+                self._capped.clear()
+        else:
+            self._capped.clear()
+            if processed == sent >= self.ceiling:
+                self.ceiling = min(self.max_batch, self.ceiling + 1)
+        if latency > self.target_latency:
+            self.batch_size = max(self.min_batch, int(self.batch_size * 0.7))
+        elif latency < self.target_latency / 2 and sent >= self.batch_size:
+            self.batch_size = min(self.ceiling, int(self.batch_size * 1.5) + 1)
+        if latency <= self.target_latency:
+            self.window = min(float(self.max_in_flight), self.window + 1 / self.window)
+
+    def _ceiling_confirmed(self) -> bool:
+        """Return True when the recent mostly-unprocessed batches point at a fixed ceiling"""
+        recent = list(self._capped)[-self.ceiling_confirmations:]
+        if len(recent) < self.ceiling_confirmations:
+            return False
+        sizes = [size for size, _ in recent]
+        counts = [count for _, count in recent]
+        # A flat processed count over batches of clearly different sizes
+        if max(counts) - min(counts) <= 0.1 * max(counts) and max(sizes) >= 1.25 * min(sizes):
+            return True
+        # Batches of one size can only tell by the count repeating exactly,
+        # twice as long, as random losses now and then repeat a count
+        return (len(self._capped) == self._capped.maxlen
+                and len({count for _, count in self._capped}) == 1)
+
+    def record_failure(self, status: int):
+        """Adjust after a failed batch"""
+        self.window = max(1.0, self.window / 2)
+        if status in OVERSIZE_STATUSES:
+            self.batch_size = max(self.min_batch, self.batch_size // 2)
+
+
+class BulkFetcher:
+    """
+    Drives /price/byIsinBulk over an ISIN stream.
+
+    Each ISIN is attempted at most max_attempts times across resubmissions,
+    not counting resubmits after throttling or server errors, of which it
+    gets up to max_backoff_resubmits. ISINs still unresolved after that are
+    written with status "failed".
+    Every snapshot_interval seconds, on_snapshot receives the report so far.
+    """
+
+    def __init__(self, client: SQXClient, output_path: str,
+                 controller: Optional[BatchController] = None, max_attempts: int = 5,
+                 max_backoff_resubmits: int = 100,
+                 snapshot_interval: Optional[float] = None,
+                 on_snapshot: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.client = client
+        self.output_path = output_path
+        self.controller = controller or BatchController()
+        self.max_attempts = max_attempts
+        self.max_backoff_resubmits = max_backoff_resubmits
+        self.snapshot_interval = snapshot_interval
+        self.on_snapshot = on_snapshot
+        self.histogram = LatencyHistogram()
+        self.requests = 0
+        self.resubmitted = 0
+        self.missing = 0
+        self.counts = {"success": 0, "not_found": 0, "failed": 0}
+        self.status_counts: Dict[str, int] = {}
+        self._pause_until = 0.0
+        self._consecutive_throttles = 0
+
+    def _send(self, batch: List[Tuple[str, int, int]]
+              ) -> Tuple[List[Tuple[str, int, int]], int, Any, float]:
+        """POST one batch; runs on a worker thread"""
+        start = time.perf_counter()
+        status, response = self.client.request(
+            "POST", BULK_ENDPOINT, json_data={"isin_list": [isin for isin, _, _ in batch]})
+        return batch, status, response, time.perf_counter() - start
+
+    def run(self, isins: Iterable[str]) -> Dict[str, Any]:
+        """Fetch prices for every ISIN and return the run report"""
+        source = iter(isins)
+        retry: Deque[Tuple[str, int, int]] = deque()
+        source_done = False
+        controller = self.controller
+        start = time.perf_counter()
+        next_snapshot = (start + self.snapshot_interval
+                         if self.on_snapshot and self.snapshot_interval else None)
+
+        def take(size: int) -> List[Tuple[str, int, int]]:
+            nonlocal source_done
+            batch = []
+            while retry and len(batch) < size:
+                batch.append(retry.popleft())
+            while not source_done and len(batch) < size:
+                try:
+                    batch.append((next(source), 0, 0))
+                except StopIteration:
+                    source_done = True
+            return batch
+
+        with open(self.output_path, "w") as out, \
+                ThreadPoolExecutor(max_workers=controller.max_in_flight) as executor:
+            pending = set()
+            while True:
+                while len(pending) < controller.in_flight and time.monotonic() >= self._pause_until:
+                    batch = take(controller.next_batch_size())
+                    if not batch:
+                        break
+                    pending.add(executor.submit(self._send, batch))
+                    self.requests += 1
+                if not pending:
+                    if time.monotonic() < self._pause_until:
+                        time.sleep(max(self._pause_until - time.monotonic(), 0))
+                        continue
+                    break
+
+                timeout = max(self._pause_until - time.monotonic(), 0) or None
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._handle(*future.result(), out=out, retry=retry)
+                if next_snapshot is not None and time.perf_counter() >= next_snapshot:
+                    out.flush()
+                    self.on_snapshot(self.report(time.perf_counter() - start))
+                    next_snapshot += self.snapshot_interval
+
+        return self.report(time.perf_counter() - start)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        """Return the run report after elapsed seconds"""
+        controller = self.controller
+        total = sum(self.counts.values())
+        sizes = controller.batch_sizes_used
+        return {
+            "isins": total,
+            **self.counts,
+            "requests": self.requests,
+            "resubmitted_isins": self.resubmitted,
+            "missing_isins": self.missing,
+            "status_counts": dict(sorted(self.status_counts.items())),
+            "elapsed_s": round(elapsed, 3),
+            "isins_per_second": round(total / elapsed, 1) if elapsed > 0 else 0.0,
+            "requests_per_second": round(self.requests / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency": self.histogram.summary(),
+            "histogram": self.histogram.to_dict(),
+            "batch_size": {
+                "batches": len(sizes),
+                "min": min(sizes, default=0),
+                "mean": round(sum(sizes) / len(sizes), 1) if sizes else 0,
+                "max": max(sizes, default=0),
+                "final": controller.batch_size,
+                "server_ceiling": controller.ceiling if controller.ceiling < controller.max_batch else None,
+            },
+            "final_in_flight": controller.in_flight,
+            "output": self.output_path,
+        }
+
+    def _handle(self, batch: List[Tuple[str, int, int]], status: int, response: Any,
+                latency: float, out, retry: Deque[Tuple[str, int, int]]):
+        """Write a completed batch's results and requeue what was not resolved"""
+        self.status_counts[str(status)] = self.status_counts.get(str(status), 0) + 1
+        self.histogram.record(latency)
+        attempts = {isin: (attempt, backoffs) for isin, attempt, backoffs in batch}
+
+        if status != 200 or not isinstance(response, dict):
+            self.controller.record_failure(status)
+            if status == 429:
+                self._consecutive_throttles += 1
+                self._pause_until = time.monotonic() + min(0.1 * 2 ** self._consecutive_throttles, 10)
+            retryable = status in RETRYABLE_STATUSES
+            backoff = status in BACKOFF_STATUSES
+            for isin, attempt, backoffs in batch:
+                self._requeue(isin, attempt, backoffs, retryable, backoff, out, retry,
+                              f"status {status}")
+            return
+
+        self._consecutive_throttles = 0
+        success = response.get("success") or []
+        not_found = response.get("not_found") or []
+        unprocessed = response.get("unprocessed") or []
+        answered = {record_isin(record) for record in success} | set(not_found) | set(unprocessed)
+        # ISINs the response left out of every array are resubmitted as unprocessed
+        missing = [isin for isin in attempts if isin not in answered]
+        self.missing += len(missing)
+        self.controller.record_success(len(attempts), len(attempts) - len(unprocessed) - len(missing),
+                                       latency)
+
+        for record in success:
+            isin = record_isin(record)
+            self._write(out, {"isin": isin, "status": "success", "record": record})
+            self.counts["success"] += 1
+        for isin in not_found:
+            self._write(out, {"isin": isin, "status": "not_found"})
+            self.counts["not_found"] += 1
+        for isin in unprocessed:
+            attempt, backoffs = attempts.get(isin, (0, 0))
+            self._requeue(isin, attempt, backoffs, True, False, out, retry, "unprocessed")
+        for isin in missing:
+            attempt, backoffs = attempts[isin]
+            self._requeue(isin, attempt, backoffs, True, False, out, retry, "missing from response")
+
+    def _requeue(self, isin: str, attempt: int, backoffs: int, retryable: bool, backoff: bool,
+                 out, retry: Deque[Tuple[str, int, int]], reason: str):
+        """Resubmit an ISIN, or record it as failed once out of attempts"""
+        if retryable and backoff and backoffs < self.max_backoff_resubmits:
+            retry.append((isin, attempt, backoffs + 1))
+            self.resubmitted += 1
+        elif retryable and not backoff and attempt + 1 < self.max_attempts:
+            retry.append((isin, attempt + 1, backoffs))
+            self.resubmitted += 1
+        else:
+            self._write(out, {"isin": isin, "status": "failed", "reason": reason})
+            self.counts["failed"] += 1
+
+    @staticmethod
+    def _write(out, entry: Dict[str, Any]):
+        out.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+def merge_bulk_reports(reports: List[Dict[str, Any]], output_path: str) -> Dict[str, Any]:
+    """
+    Merge bulk reports from processes that each priced a share of the ISINs.
+
+    Counts and latency histograms are added exactly; batch sizing is per
+    process, so the merged view gives the overall range and batch-weighted
+    mean, the largest final size and the smallest detected server ceiling.
+    """
+    elapsed = max(report["elapsed_s"] for report in reports)
+    merged: Dict[str, Any] = {key: sum(report[key] for report in reports)
+                              for key in ("isins", "success", "not_found", "failed",
+                                          "requests", "resubmitted_isins", "missing_isins")}
+    status_counts: Dict[str, int] = {}
+    histogram = LatencyHistogram()
+    for report in reports:
+        for status, count in report["status_counts"].items():
+            status_counts[status] = status_counts.get(status, 0) + count
+        histogram.merge(LatencyHistogram.from_dict(report["histogram"]))
+    sizes = [report["batch_size"] for report in reports]
+    batches = sum(size["batches"] for size in sizes)
+    ceilings = [size["server_ceiling"] for size in sizes if size["server_ceiling"] is not None]
+    merged.update({
+        "status_counts": dict(sorted(status_counts.items())),
+        "elapsed_s": elapsed,
+        "isins_per_second": round(merged["isins"] / elapsed, 1) if elapsed > 0 else 0.0,
+        "requests_per_second": round(merged["requests"] / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency": histogram.summary(),
+        "histogram": histogram.to_dict(),
+        "batch_size": {
+            "batches": batches,
+            "min": min((size["min"] for size in sizes if size["batches"]), default=0),
+            "mean": round(sum(size["mean"] * size["batches"] for size in sizes) / batches, 1)
+                    if batches else 0,
+            "max": max(size["max"] for size in sizes),
+            "final": max(size["final"] for size in sizes),
+            "server_ceiling": min(ceilings, default=None),
+        },
+        "final_in_flight": sum(report["final_in_flight"] for report in reports),
+        "output": output_path,
+        "processes": len(reports),
+        "workers": [{"isins": report["isins"], "requests": report["requests"],
+                     "isins_per_second": report["isins_per_second"]} for report in reports],
+    })
+    return merged
+
+
+def print_bulk_report(report: Dict[str, Any]):
+    """Print a bulk fetch report"""
+    print("\n" + "="*70)
+    print("BULK FETCH REPORT")
+    print("="*70)
+    print(f"ISINs: {report['isins']} (success {report['success']}, "
+          f"not found {report['not_found']}, failed {report['failed']})")
+    print(f"Requests: {report['requests']} ({report['resubmitted_isins']} ISINs resubmitted)")
+    if report["missing_isins"]:
+        print(f"ISINs missing from 200 responses: {report['missing_isins']} (resubmitted)")
+    print(f"Status codes: {report['status_counts']}")
+    print(f"Elapsed: {report['elapsed_s']}s")
+    print(f"Throughput: {report['isins_per_second']} ISINs/s, {report['requests_per_second']} requests/s")
+    if "workers" in report:
+        print(f"Processes: {report['processes']} "
+              f"(ISINs/s each: {[worker['isins_per_second'] for worker in report['workers']]})")
+    latency = report["latency"]
+    if latency["count"]:
+        print(f"Batch latency: p50 {latency['p50_ms']}ms, p99 {latency['p99_ms']}ms, "
+              f"max {latency['max_ms']}ms")
+    sizes = report["batch_size"]
+    print(f"Batch size: min {sizes['min']}, mean {sizes['mean']}, max {sizes['max']}, "
+          f"final {sizes['final']}")
+    if sizes["server_ceiling"] is not None:
+        print(f"Detected server batch ceiling: {sizes['server_ceiling']}")
+    print(f"Final in-flight batches: {report['final_in_flight']}")
+    print(f"Results written to: {report['output']}")
@@ -0,0 +1,138 @@
+"""
+SQX Response Cache
+Run-scoped memoization of idempotent requests. Entries expire after a TTL
+and are evicted least-recently-used beyond a size bound. Identical requests
+that arrive while the first is still in flight wait for and share its
+result instead of going to the network themselves.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Hashable, Optional, Tuple
+
+# Statuses never cached: transport errors, throttling and server errors
+UNCACHEABLE_STATUSES = {0, 429}
+
+
+def cache_key(method: str, url: str, headers: Optional[Dict] = None,
+              params: Optional[Dict] = None, body: Any = None) -> Hashable:
+    """Build a hashable key from every part of a request that affects the response"""
+    return (
+        method.upper(),
+        url,
+        tuple(sorted((str(k).lower(), str(v)) for k, v in (headers or {}).items())),
+        tuple(sorted((str(k), str(v)) for k, v in (params or {}).items())),
+        json.dumps(body, sort_keys=True, separators=(",", ":")) if body is not None else None,
+    )
+
+
+def is_cacheable(status: int) -> bool:
+    """Return True if a response with this status may be served from cache"""
+    return status not in UNCACHEABLE_STATUSES and status < 500
+
+
+class _InFlight:
+    """A request being fetched, which identical callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Tuple[int, Any]] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """
+    Thread-safe TTL + LRU cache of (status, response) tuples.
+
+    Cached responses are shared between callers and must be treated as
+    read-only.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Tuple[int, Any]]]" = OrderedDict()
+        self._inflight: Dict[Hashable, _InFlight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_or_fetch(self, key: Hashable,
+                     fetch: Callable[[], Tuple[int, Any]]) -> Tuple[Tuple[int, Any], str]:
+        """
+        Return (result, outcome) for key, calling fetch on a miss.
+
+        outcome is "hit" when served from cache, "coalesced" when another
+        thread's in-flight fetch was shared, and "miss" when fetch ran here.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result, "hit"
+                del self._entries[key]
+                self.expirations += 1
+
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                pending = self._inflight[key] = _InFlight()
+                self.misses += 1
+                leader = True
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.result, "coalesced"
+
+        try:
+            result = fetch()
+            pending.result = result
+        except BaseException as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if pending.error is None and is_cacheable(pending.result[0]):
+                    self._store(key, pending.result)
+            pending.done.set()
+        return result, "miss"
+
+    def _store(self, key: Hashable, result: Tuple[int, Any]):
+        """Insert an entry, evicting the least recently used beyond max_entries"""
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
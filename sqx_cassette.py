@@ -0,0 +1,235 @@
+"""
+SQX Cassettes
+Records request/response exchanges to a compact, indexed cassette file and
+replays them without touching the network. Credentials never reach the
+file: the API key header is replaced by a marker saying whether the
+configured key, another key or no key was sent, which is all matching
+needs. Cassettes are gzip-compressed JSON holding each distinct response
+body once, the exchanges in recorded order and an index from match keys
+to exchanges.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqx_codec import DEFAULT_CODEC
+
+CASSETTE_VERSION = 1
+
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+# strict: method, path, params and body must all be equal
+# lenient: exact match first, else the same method and path with the same
+#          param names and body keys (values such as dates may differ)
+MATCH_STRICT = "strict"
+MATCH_LENIENT = "lenient"
+MATCH_MODES = (MATCH_STRICT, MATCH_LENIENT)
+
+API_KEY_HEADER = "x-api-key"
+
+# Unmatched requests kept for the report
+MAX_UNMATCHED = 50
+
+
+def scrub_auth(headers: Optional[Dict], api_key: str) -> Optional[str]:
+    """Return a credential-free marker for the API key a request carried"""
+    for name, value in (headers or {}).items():
+        if name.lower() == API_KEY_HEADER:
+            if value == api_key:
+                return "<api-key>"
+            return f"<other-key:{hashlib.sha256(str(value).encode()).hexdigest()[:12]}>"
+    return None
+
+
+def _digest(parts: List[Any]) -> str:
+    text = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def match_keys(method: str, path: str, params: Optional[Dict], body: Any,
+               auth: Optional[str]) -> Tuple[str, str]:
+    """Return the (strict, lenient) index keys of a request"""
+    params = {str(name): str(value) for name, value in (params or {}).items()}
+    strict = _digest([method, path, params, body, auth])
+    shape = sorted(body) if isinstance(body, dict) else type(body).__name__
+    lenient = _digest([method, path, sorted(params), shape, auth])
+    return strict, lenient
+
+
+class CassetteRecorder:
+    """
+    Collects exchanges and writes them as a cassette on close().
+
+    The file is written atomically, so an interrupted run leaves any
+    earlier cassette at the same path intact.
+    """
+
+    mode = MODE_RECORD
+
+    def __init__(self, path: str, api_key: str, base_url: str = ""):
+        self.path = path
+        self.api_key = api_key
+        self.base_url = base_url
+        self._exchanges: List[Dict[str, Any]] = []
+        self._bodies: List[Any] = []
+        self._body_ids: Dict[str, int] = {}
+        self._index: Dict[str, Dict[str, List[int]]] = {MATCH_STRICT: {}, MATCH_LENIENT: {}}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def record(self, method: str, path: str, headers: Optional[Dict], params: Optional[Dict],
+               body: Any, status: int, response: Any, elapsed: float):
+        """Add one exchange"""
+        auth = scrub_auth(headers, self.api_key)
+        strict, lenient = match_keys(method, path, params, body, auth)
+        serialized = DEFAULT_CODEC.dumps(response)
+        with self._lock:
+            body_id = self._body_ids.get(serialized)
+            if body_id is None:
+                body_id = self._body_ids[serialized] = len(self._bodies)
+                self._bodies.append(response)
+            position = len(self._exchanges)
+            self._exchanges.append({
+                "method": method,
+                "path": path,
+                "auth": auth,
+                "params": params,
+                "body": body,
+                "status": status,
+                "response": body_id,
+                "elapsed_ms": round(elapsed * 1000, 3),
+            })
+            self._index[MATCH_STRICT].setdefault(strict, []).append(position)
+            self._index[MATCH_LENIENT].setdefault(lenient, []).append(position)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return recording counters"""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "path": self.path,
+                "exchanges": len(self._exchanges),
+                "distinct_responses": len(self._bodies),
+            }
+
+    def close(self):
+        """Write the cassette"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            cassette = {
+                "version": CASSETTE_VERSION,
+                "recorded_at": datetime.now().isoformat(),
+                "base_url": self.base_url,
+                "responses": self._bodies,
+                "exchanges": self._exchanges,
+                "index": self._index,
+            }
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(DEFAULT_CODEC.dumps(cassette).encode())
+        os.replace(tmp_path, self.path)
+
+
+class CassettePlayer:
+    """
+    Serves recorded responses by matching requests against a cassette.
+
+    Identical requests are answered in recorded order; once a key's
+    recordings are used up its last one is served again. Requests with no
+    recording get status 0 and are listed by stats().
+    """
+
+    mode = MODE_REPLAY
+
+    def __init__(self, path: str, api_key: str, match: str = MATCH_STRICT):
+        if match not in MATCH_MODES:
+            raise ValueError(f"Unknown match mode: {match}")
+        self.path = path
+        self.api_key = api_key
+        self.match = match
+        with gzip.open(path, "rb") as f:
+            cassette = DEFAULT_CODEC.loads(f.read())
+        if cassette.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version: {cassette.get('version')}")
+        self.recorded_at = cassette["recorded_at"]
+        self.base_url = cassette["base_url"]
+        self._responses = cassette["responses"]
+        self._exchanges = cassette["exchanges"]
+        self._index = cassette["index"]
+        self._served: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self.counts = {"exact": 0, "lenient": 0, "repeated": 0, "unmatched": 0}
+        self.unmatched: List[Dict[str, Any]] = []
+
+    def _take(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        positions = self._index[kind].get(key)
+        if not positions:
+            return None
+        served = self._served.get((kind, key), 0)
+        self._served[(kind, key)] = served + 1
+        if served >= len(positions):
+            self.counts["repeated"] += 1
+        return self._exchanges[positions[min(served, len(positions) - 1)]]
+
+    def play(self, method: str, path: str, headers: Optional[Dict], params: Optional[Dict],
+             body: Any) -> Tuple[int, Any]:
+        """Return the recorded (status, response) for a request"""
+        auth = scrub_auth(headers, self.api_key)
+        strict, lenient = match_keys(method, path, params, body, auth)
+        with self._lock:
+            exchange = self._take(MATCH_STRICT, strict)
+            if exchange is not None:
+                self.counts["exact"] += 1
+            elif self.match == MATCH_LENIENT:
+                exchange = self._take(MATCH_LENIENT, lenient)
+                if exchange is not None:
+                    self.counts["lenient"] += 1
+            if exchange is None:
+                self.counts["unmatched"] += 1
+                if len(self.unmatched) < MAX_UNMATCHED:
+                    self.unmatched.append({"method": method, "path": path, "auth": auth,
+                                           "params": params, "body": body})
+                return 0, {"error": f"No recorded response for {method} {path} ({self.match} match)"}
+        return exchange["status"], self._responses[exchange["response"]]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return match counters and the unmatched requests"""
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "path": self.path,
+                "match": self.match,
+                "recorded_at": self.recorded_at,
+                "exchanges": len(self._exchanges),
+                **self.counts,
+                "unmatched_requests": list(self.unmatched),
+            }
+
+    def close(self):
+        """Nothing to write; present so recorders and players close alike"""
+
+
+def print_cassette_report(stats: Dict[str, Any]):
+    """Print cassette recording or replay counters"""
+    print("\n" + "-"*70)
+    print(f"Cassette ({stats['mode']})")
+    print("-"*70)
+    if stats["mode"] == MODE_RECORD:
+        print(f"Recorded {stats['exchanges']} exchanges "
+              f"({stats['distinct_responses']} distinct responses) to {stats['path']}")
+        return
+    print(f"Replaying {stats['path']} (recorded {stats['recorded_at']}, {stats['match']} match)")
+    print(f"Served: {stats['exact']} exact, {stats['lenient']} lenient, "
+          f"{stats['repeated']} repeated recordings")
+    print(f"Unmatched requests: {stats['unmatched']}")
+    for request in stats["unmatched_requests"][:10]:
+        print(f"  {request['method']} {request['path']} params={request['params']} "
+              f"body={request['body']} auth={request['auth']}")
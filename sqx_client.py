@@ -0,0 +1,760 @@
+"""
+SQX API Client
+Pooled HTTP client shared by the test suite and the load/bulk drivers.
+Owns keep-alive connection pools so repeated checks against the API Gateway
+host reuse TCP+TLS connections instead of handshaking on every call, and
+times each request phase (DNS, connect, TLS, first byte, download, decode).
+"""
+
+import json
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError, ReadTimeoutError
+
+from sqx_cache import ResponseCache, cache_key
+from sqx_cassette import CassettePlayer, CassetteRecorder, MODE_REPLAY
+from sqx_coalesce import BulkCoalescer, SINGLE_ENDPOINT, BULK_ENDPOINT
+from sqx_codec import JsonCodec, DEFAULT_CODEC
+from sqx_histogram import LatencyHistogram
+from sqx_metrics import RequestMetrics
+from sqx_ratelimit import RateLimiter, parse_retry_after
+from sqx_retry import (RetryPolicy, HedgePolicy, ERROR_TIMEOUT, ERROR_CONNECTION,
+                       ERROR_OTHER)
+
+# Request phases recorded for every call, in wire order
+TIMING_PHASES = ("dns", "connect", "tls", "ttfb", "download", "decode", "total")
+
+# Split of each request's total time: on the network (resolving, connecting,
+# TLS, sending, waiting for and reading the response) versus in the client
+# (preparing the request, waiting for a pooled connection, building the
+# response object and decoding it)
+OVERHEAD_PHASES = ("wire", "client")
+
+# Per-thread state for the request currently in flight on that thread.
+# urllib3 opens sockets on the calling thread, so connection hooks can
+# report back to the request that triggered them through this.
+_request_context = threading.local()
+
+
+# ============================================================================
+# CONNECTION TRACKING
+# ============================================================================
+
+def _phases() -> Optional[Dict[str, float]]:
+    """Return the phase timings of the request in flight on this thread"""
+    return getattr(_request_context, "phases", None)
+
+
+def _timed_new_conn(conn: HTTPConnection, new_conn) -> socket.socket:
+    """
+    Open a socket for conn, timing name resolution and TCP connect apart.
+
+    The host is resolved once here and each address is handed to urllib3 as
+    an IP literal, so the lookup is not repeated inside create_connection.
+    """
+    phases = _phases()
+    host = conn._dns_host
+    start = time.perf_counter()
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(host, conn.port, 0, socket.SOCK_STREAM)]
+    except socket.gaierror:
+        addresses = []
+    resolved = time.perf_counter()
+
+    if not addresses:
+        # Let urllib3 repeat the lookup and raise its own resolution error
+        sock = new_conn()
+    else:
+        for i, address in enumerate(addresses):
+            conn._dns_host = address
+            try:
+                sock = new_conn()
+                break
+            except NewConnectionError:
+                if i == len(addresses) - 1:
+                    raise
+            finally:
+                conn._dns_host = host
+    connected = time.perf_counter()
+
+    _request_context.opened_connection = True
+    _request_context.opened_at = start
+    if phases is not None:
+        phases["dns"] = resolved - start
+        phases["connect"] = connected - resolved
+    return sock
+
+
+class _ExchangeTimingMixin:
+    """Marks when a request starts going out and when its response headers are in"""
+
+    def request(self, *args, **kwargs):
+        _request_context.sent_at = time.perf_counter()
+        return super().request(*args, **kwargs)
+
+    def getresponse(self):
+        response = super().getresponse()
+        _request_context.response_at = time.perf_counter()
+        return response
+
+
+class TimedHTTPConnection(_ExchangeTimingMixin, HTTPConnection):
+    """HTTP connection that times and reports every new socket it opens"""
+
+    def _new_conn(self):
+        return _timed_new_conn(self, super()._new_conn)
+
+
+class TimedHTTPSConnection(_ExchangeTimingMixin, HTTPSConnection):
+    """HTTPS connection that also times the TLS handshake"""
+
+    def _new_conn(self):
+        return _timed_new_conn(self, super()._new_conn)
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        phases = _phases()
+        if phases is not None:
+            elapsed = time.perf_counter() - start
+            phases["tls"] = max(elapsed - phases.get("dns", 0.0) - phases.get("connect", 0.0), 0.0)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools use the tracked connection classes"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+# ============================================================================
+# CLIENT
+# ============================================================================
+
+class SQXClient:
+    """
+    Thread-safe pooled client for the SQX API.
+
+    Each thread gets its own requests.Session (sessions carry cookie and
+    header state that is not safe to share), but all sessions mount the same
+    adapter, so the underlying urllib3 connection pools are shared.
+
+    pool_connections: number of distinct hosts to keep pools for
+    pool_maxsize:     maximum open connections per host
+    pool_block:       block when a host's pool is exhausted instead of
+                      opening throwaway connections beyond pool_maxsize
+    keep_alive:       reuse connections between requests
+    cache:            optional ResponseCache memoizing GET requests
+    limiter:          optional RateLimiter pacing requests that go to the wire
+    retry:            optional RetryPolicy for idempotent requests
+    hedge:            optional HedgePolicy duplicating slow GETs
+    timeout:          seconds to wait for a connection or a response
+    codec:            JsonCodec used to decode response bodies
+    cassette:         optional CassetteRecorder capturing every exchange, or
+                      CassettePlayer answering from a cassette instead of
+                      the network
+    coalescer:        optional BulkCoalescer folding concurrent single-ISIN
+                      lookups made with the configured key into bulk
+                      requests, for callers passing coalesce=True
+    metrics:          optional RequestMetrics counting requests live
+    """
+
+    def __init__(self, base_url: str, api_key: str, pool_connections: int = 4,
+                 pool_maxsize: int = 16, pool_block: bool = True,
+                 keep_alive: bool = True, timeout: float = 30,
+                 cache: Optional[ResponseCache] = None,
+                 limiter: Optional[RateLimiter] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 hedge: Optional[HedgePolicy] = None,
+                 codec: Optional[JsonCodec] = None,
+                 cassette: Optional[Union[CassetteRecorder, CassettePlayer]] = None,
+                 coalescer: Optional[BulkCoalescer] = None,
+                 metrics: Optional[RequestMetrics] = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.cache = cache
+        self.limiter = limiter
+        self.retry = retry
+        self.hedge = hedge
+        self.codec = codec or DEFAULT_CODEC
+        self.cassette = cassette
+        self.coalescer = coalescer
+        self.metrics = metrics
+
+        self._adapter = PooledAdapter(pool_connections=pool_connections,
+                                      pool_maxsize=pool_maxsize,
+                                      pool_block=pool_block)
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+        self._requests_sent = 0
+        self._connections_opened = 0
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._retry_counts = {"calls": 0, "attempts": 0, "retries": 0, "retried_calls": 0,
+                              "recovered": 0, "exhausted": 0, "hedges": 0, "hedges_won": 0,
+                              "hedge_saved_pending": 0}
+        self._hedge_saved = 0.0
+        self._decoded = 0
+        self._decoded_bytes = 0
+        self._decode_cpu = 0.0
+
+    def _session(self) -> requests.Session:
+        """Return the calling thread's session, creating it on first use"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            if not self.keep_alive:
+                session.headers["Connection"] = "close"
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def request(self, method: str, endpoint: str, headers: Dict = None,
+                params: Dict = None, json_data: Dict = None,
+                use_cache: bool = True, retry: bool = True,
+                coalesce: bool = False) -> Tuple[int, Any]:
+        """
+        Make HTTP request and return status code and response.
+
+        GET requests go through the response cache when one is configured,
+        unless use_cache is False. The retry and hedge policies apply unless
+        retry is False. With a cassette, exchanges are recorded, or answered
+        from the cassette without any network traffic. With metrics, every
+        request is counted while in flight and once completed. Single-ISIN
+        lookups go through the coalescer only when coalesce is True, so
+        checks always exercise the endpoint they name.
+        """
+        method = method.upper()
+        self._local.last_timing = None
+        if method not in ("GET", "POST"):
+            return 0, {"error": "Unsupported method"}
+
+        request_headers = {"x-api-key": self.api_key} if headers is None else headers
+        if self.metrics is None:
+            return self._serve(method, endpoint, request_headers, params, json_data, use_cache, retry,
+                               coalesce)
+
+        self.metrics.started(endpoint)
+        start = time.perf_counter()
+        status = 0
+        try:
+            status, response = self._serve(method, endpoint, request_headers, params, json_data,
+                                            use_cache, retry, coalesce)
+            return status, response
+        finally:
+            timing = self._local.last_timing
+            split = None
+            if timing is not None and "wire_ms" in timing:
+                split = {phase: timing[f"{phase}_ms"] / 1000 for phase in OVERHEAD_PHASES}
+            self.metrics.finished(endpoint, method, status, time.perf_counter() - start, split)
+
+    def _serve(self, method: str, endpoint: str, request_headers: Dict,
+               params: Optional[Dict], json_data: Optional[Dict], use_cache: bool,
+               retry: bool, coalesce: bool = False) -> Tuple[int, Any]:
+        """Answer a request from the cassette, or serve it and record it there"""
+        body = json_data if method == "POST" else None
+        if self.cassette is None:
+            return self._request(method, endpoint, request_headers, params, json_data, use_cache, retry,
+                                 coalesce)
+
+        start = time.perf_counter()
+        if self.cassette.mode == MODE_REPLAY:
+            result = self.cassette.play(method, endpoint, request_headers, params, body)
+            self._local.last_timing = {"cassette": "replay",
+                                       "total_ms": round((time.perf_counter() - start) * 1000, 3)}
+            return result
+        result = self._request(method, endpoint, request_headers, params, json_data, use_cache, retry,
+                               coalesce)
+        self.cassette.record(method, endpoint, request_headers, params, body, *result,
+                             time.perf_counter() - start)
+        return result
+
+    def _request(self, method: str, endpoint: str, request_headers: Dict,
+                 params: Optional[Dict], json_data: Optional[Dict], use_cache: bool,
+                 retry: bool, coalesce: bool = False) -> Tuple[int, Any]:
+        """Serve a request from the cache or the network"""
+        url = f"{self.base_url}{endpoint}"
+
+        def call() -> Tuple[int, Any]:
+            if coalesce and self._coalescible(method, endpoint, request_headers, params):
+                return self._coalesced(params["isin"], request_headers, retry)
+            return self._call(method, endpoint, url, request_headers, params, json_data, retry)
+
+        if self.cache is None or not use_cache or method != "GET":
+            return call()
+
+        start = time.perf_counter()
+        key = cache_key(method, url, request_headers, params)
+        result, outcome = self.cache.get_or_fetch(key, call)
+        if outcome == "miss":
+            self._local.last_timing["cache"] = outcome
+        else:
+            self._local.last_timing = {"cache": outcome,
+                                       "total_ms": round((time.perf_counter() - start) * 1000, 3)}
+        return result
+
+    # ------------------------------------------------------------------
+    # Retries and hedging
+    # ------------------------------------------------------------------
+
+    def _coalescible(self, method: str, endpoint: str, request_headers: Dict,
+                     params: Optional[Dict]) -> bool:
+        """Return True for a plain single-ISIN lookup the coalescer may batch"""
+        return (self.coalescer is not None and method == "GET" and endpoint == SINGLE_ENDPOINT
+                and request_headers == {"x-api-key": self.api_key}
+                and params is not None and list(params) == ["isin"]
+                and isinstance(params["isin"], str))
+
+    def _coalesced(self, isin: str, request_headers: Dict, retry: bool) -> Tuple[int, Any]:
+        """Serve a single-ISIN lookup through the coalescer"""
+        start = time.perf_counter()
+
+        def send_bulk(isins: List[str]) -> Tuple[int, Any, Optional[Dict[str, Any]]]:
+            status, response = self._call("POST", BULK_ENDPOINT, f"{self.base_url}{BULK_ENDPOINT}",
+                                          request_headers, None, {"isin_list": isins}, retry)
+            return status, response, self._local.last_timing
+
+        def send_single(single: str) -> Tuple[int, Any, Optional[Dict[str, Any]]]:
+            status, response = self._call("GET", SINGLE_ENDPOINT, f"{self.base_url}{SINGLE_ENDPOINT}",
+                                          request_headers, {"isin": single}, None, retry)
+            return status, response, self._local.last_timing
+
+        result, info = self.coalescer.lookup(isin, send_bulk, send_single)
+        if info["role"] != "bypass":
+            # The phases of the request that answered, shared with the batch
+            timing = dict(info["timing"] or {})
+            timing.update({"coalesce": info["role"], "queue_ms": info["queue_ms"],
+                           "batch_size": info["batch_size"],
+                           "total_ms": round((time.perf_counter() - start) * 1000, 3)})
+            self._local.last_timing = timing
+        return result
+
+    def _call(self, method: str, endpoint: str, url: str, request_headers: Dict,
+              params: Optional[Dict], json_data: Optional[Dict], retry: bool) -> Tuple[int, Any]:
+        """Send a request, retrying and hedging it as the policies allow"""
+        policy = self.retry if retry and self.retry is not None and self.retry.applies_to(method) else None
+        hedge = self.hedge if retry else None
+        if policy is None and hedge is None:
+            return self._send(method, endpoint, url, request_headers, params, json_data)
+
+        start = time.perf_counter()
+        attempts: List[Dict[str, Any]] = []
+        retries = 0
+        while True:
+            status, response, timing, retry_after, error_kind = self._attempt(
+                method, endpoint, url, request_headers, params, json_data, hedge, attempts,
+                retries + 1)
+            if (policy is None or retries + 1 >= policy.max_attempts
+                    or not policy.should_retry(status, error_kind)):
+                break
+            delay = policy.delay(retries, retry_after)
+            if delay is None:
+                # The server asked for a longer wait than the policy allows
+                attempts[-1]["retry_after_s"] = retry_after
+                break
+            attempts[-1]["backoff_ms"] = round(delay * 1000, 3)
+            time.sleep(delay)
+            retries += 1
+
+        timing = dict(timing or {})
+        timing["attempts"] = attempts
+        timing["retries"] = retries
+        timing["hedges"] = sum(1 for attempt in attempts if attempt["hedge"])
+        timing["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        self._local.last_timing = timing
+
+        with self._lock:
+            counts = self._retry_counts
+            counts["calls"] += 1
+            counts["attempts"] += len(attempts)
+            counts["retries"] += retries
+            if retries:
+                counts["retried_calls"] += 1
+                if policy.should_retry(status, error_kind):
+                    counts["exhausted"] += 1
+                else:
+                    counts["recovered"] += 1
+        return status, response
+
+    def _attempt(self, method: str, endpoint: str, url: str, request_headers: Dict,
+                 params: Optional[Dict], json_data: Optional[Dict],
+                 hedge: Optional[HedgePolicy], attempts: List[Dict[str, Any]],
+                 number: int) -> Tuple:
+        """
+        Make one attempt, hedged when it outlives the endpoint's hedge delay.
+
+        Returns the winning (status, response, timing, retry_after, error_kind)
+        and appends an entry per request sent to attempts. A losing request
+        is left to finish in the background, where its latency is recorded.
+        """
+        delay = hedge.delay(method, endpoint) if hedge is not None else None
+        args = (method, endpoint, url, request_headers, params, json_data)
+        if delay is None:
+            outcome = self._send_outcome(*args)
+            attempts.append(_attempt_entry(number, False, outcome))
+            self._observe(hedge, endpoint, outcome)
+            return outcome
+
+        pool = self._hedge_executor()
+        primary = pool.submit(self._send_outcome, *args)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            outcome = primary.result()
+            attempts.append(_attempt_entry(number, False, outcome))
+            self._observe(hedge, endpoint, outcome)
+            return outcome
+
+        second = pool.submit(self._send_outcome, *args)
+        done, _ = wait([primary, second], return_when=FIRST_COMPLETED)
+        won_at = time.perf_counter()
+        winner, loser = (primary, second) if primary in done else (second, primary)
+        outcome = winner.result()
+        self._observe(hedge, endpoint, outcome)
+        hedge_won = winner is second
+        with self._lock:
+            self._retry_counts["hedges"] += 1
+            if hedge_won:
+                self._retry_counts["hedges_won"] += 1
+                self._retry_counts["hedge_saved_pending"] += 1
+
+        attempts.append(_attempt_entry(number, False, primary.result() if primary.done() else None,
+                                       not hedge_won))
+        attempts.append(_attempt_entry(number, True, second.result() if second.done() else None,
+                                       hedge_won))
+        attempts[-1]["sent_after_ms"] = round(delay * 1000, 3)
+
+        def settle(future: Future):
+            # Once the slower request finishes, it is known how much tail
+            # latency the hedge removed (or that it removed none)
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._observe(hedge, endpoint, future.result())
+            if hedge_won:
+                with self._lock:
+                    self._hedge_saved += time.perf_counter() - won_at
+                    self._retry_counts["hedge_saved_pending"] -= 1
+
+        loser.add_done_callback(settle)
+        return outcome
+
+    def _send_outcome(self, method: str, endpoint: str, url: str, request_headers: Dict,
+                      params: Optional[Dict], json_data: Optional[Dict]) -> Tuple:
+        """Send once and return (status, response, timing, retry_after, error_kind)"""
+        status, response = self._send(method, endpoint, url, request_headers, params, json_data)
+        return status, response, self._local.last_timing, self._local.retry_after, self._local.error_kind
+
+    def _observe(self, hedge: Optional[HedgePolicy], endpoint: str, outcome: Tuple):
+        """Feed a completed attempt's latency to the hedge policy"""
+        status, _, timing = outcome[:3]
+        if hedge is not None and status and timing is not None:
+            hedge.observe(endpoint, timing["total_ms"] / 1000)
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=self.pool_maxsize * 2,
+                                                      thread_name_prefix="sqx-hedge")
+            return self._hedge_pool
+
+    # ------------------------------------------------------------------
+    # Sending
+    # ------------------------------------------------------------------
+
+    def _send(self, method: str, endpoint: str, url: str, request_headers: Dict,
+              params: Optional[Dict], json_data: Optional[Dict]) -> Tuple[int, Any]:
+        """Send one request over the pooled session, recording its timing"""
+        if self.limiter is None:
+            return self._send_timed(method, url, request_headers, params, json_data)
+
+        permit, waited = self.limiter.acquire(endpoint)
+        status, response, retry_after, timed_out = 0, None, None, False
+        try:
+            status, response = self._send_timed(method, url, request_headers, params, json_data)
+            retry_after = self._local.retry_after
+            timed_out = self._local.error_kind == ERROR_TIMEOUT
+            return status, response
+        finally:
+            self.limiter.release(permit, endpoint, status, retry_after, timed_out)
+            timing = self._local.last_timing
+            if timing is not None:
+                timing["limiter_wait_ms"] = round(waited * 1000, 3)
+
+    def _send_timed(self, method: str, url: str, request_headers: Dict,
+                    params: Optional[Dict], json_data: Optional[Dict]) -> Tuple[int, Any]:
+        """Send over the pooled session and time each phase"""
+        self._local.retry_after = None
+        self._local.error_kind = None
+        phases: Dict[str, float] = {}
+        _request_context.phases = phases
+        _request_context.opened_connection = False
+        _request_context.opened_at = None
+        _request_context.sent_at = None
+        _request_context.response_at = None
+        start = time.perf_counter()
+        try:
+            response = self._session().request(
+                method, url, headers=request_headers,
+                params=params if method == "GET" else None,
+                json=json_data if method == "POST" else None,
+                timeout=self.timeout, stream=True)
+            headers_received = time.perf_counter()
+            body = response.content
+            downloaded = time.perf_counter()
+        except requests.exceptions.RequestException as e:
+            self._local.error_kind = _error_kind(e)
+            self._finish_timing(phases, start, None, None)
+            return 0, {"error": str(e)}
+        finally:
+            _request_context.phases = None
+            self._record_request()
+
+        self._local.retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        cpu_start = time.thread_time()
+        try:
+            result = response.status_code, self.codec.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            result = response.status_code, {"raw_response": response.text}
+        decoded = time.perf_counter()
+        with self._lock:
+            self._decoded += 1
+            self._decoded_bytes += len(body)
+            self._decode_cpu += time.thread_time() - cpu_start
+
+        phases["ttfb"] = max(headers_received - start - phases.get("dns", 0.0)
+                             - phases.get("connect", 0.0) - phases.get("tls", 0.0), 0.0)
+        phases["download"] = downloaded - headers_received
+        phases["decode"] = decoded - downloaded
+        sent_at = getattr(_request_context, "sent_at", None)
+        response_at = getattr(_request_context, "response_at", None)
+        if sent_at is not None and response_at is not None:
+            wire = response_at - sent_at + phases["download"]
+            # HTTPS sockets are set up before the request is written, plain
+            # HTTP ones while it is
+            opened_at = getattr(_request_context, "opened_at", None)
+            if opened_at is not None and opened_at < sent_at:
+                wire += phases.get("dns", 0.0) + phases.get("connect", 0.0) + phases.get("tls", 0.0)
+            phases["wire"] = wire
+        self._finish_timing(phases, start, response, body)
+        return result
+
+    def _finish_timing(self, phases: Dict[str, float], start: float,
+                       response: Optional[requests.Response], body: Optional[bytes]):
+        """Store the completed timing record as this thread's last_timing"""
+        phases["total"] = time.perf_counter() - start
+        timing: Dict[str, Any] = {f"{phase}_ms": round(phases.get(phase, 0.0) * 1000, 3)
+                                  for phase in TIMING_PHASES}
+        if "wire" in phases:
+            timing["wire_ms"] = round(phases["wire"] * 1000, 3)
+            timing["client_ms"] = round(max(phases["total"] - phases["wire"], 0.0) * 1000, 3)
+        timing["new_connection"] = bool(getattr(_request_context, "opened_connection", False))
+        timing["status"] = response.status_code if response is not None else 0
+        if response is not None:
+            timing["request_bytes"] = _request_size(response.request)
+            timing["response_bytes"] = _response_size(response, body)
+        self._local.last_timing = timing
+
+    def last_timing(self) -> Optional[Dict[str, Any]]:
+        """Return the timing record of the calling thread's most recent request"""
+        return getattr(self._local, "last_timing", None)
+
+    def _record_request(self):
+        """Update connection reuse counters for the request just sent"""
+        opened = getattr(_request_context, "opened_connection", False)
+        with self._lock:
+            self._requests_sent += 1
+            if opened:
+                self._connections_opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return connection reuse counters"""
+        with self._lock:
+            sent = self._requests_sent
+            opened = self._connections_opened
+        return {
+            "requests": sent,
+            "connections_opened": opened,
+            "connections_reused": max(sent - opened, 0),
+            "pool_maxsize": self.pool_maxsize,
+            "keep_alive": self.keep_alive,
+        }
+
+    def decode_stats(self) -> Dict[str, Any]:
+        """Return the codec in use and the CPU time spent decoding responses"""
+        with self._lock:
+            return {
+                "codec": self.codec.name,
+                "responses": self._decoded,
+                "bytes": self._decoded_bytes,
+                "cpu_ms": round(self._decode_cpu * 1000, 3),
+                "mean_us": round(self._decode_cpu / self._decoded * 1e6, 3) if self._decoded else 0.0,
+            }
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Return response cache counters, or None when caching is off"""
+        return self.cache.stats() if self.cache is not None else None
+
+    def retry_stats(self) -> Optional[Dict[str, Any]]:
+        """Return retry and hedge counters, or None when neither policy is set"""
+        if self.retry is None and self.hedge is None:
+            return None
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._retry_counts)
+            stats["hedge_saved_ms"] = round(self._hedge_saved * 1000, 3)
+        stats["hedge_thresholds_ms"] = self.hedge.thresholds_ms() if self.hedge is not None else None
+        return stats
+
+    def coalesce_stats(self) -> Optional[Dict[str, Any]]:
+        """Return coalescing counters, or None when coalescing is off"""
+        return self.coalescer.stats() if self.coalescer is not None else None
+
+    def limiter_stats(self) -> Optional[Dict[str, Any]]:
+        """Return rate limiter state, or None when no limiter is configured"""
+        return self.limiter.stats() if self.limiter is not None else None
+
+    def close(self):
+        """Close every session and the shared connection pools"""
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False, cancel_futures=True)
+        for session in sessions:
+            session.close()
+        self._adapter.close()
+
+
+# ============================================================================
+# TIMING HELPERS
+# ============================================================================
+
+def _error_kind(error: requests.exceptions.RequestException) -> str:
+    """Classify a transport error, including read timeouts hit while streaming"""
+    cause = error.args[0] if error.args else None
+    if isinstance(error, requests.exceptions.Timeout) or \
+            isinstance(cause, (ReadTimeoutError, ConnectTimeoutError)):
+        return ERROR_TIMEOUT
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return ERROR_CONNECTION
+    return ERROR_OTHER
+
+
+def _attempt_entry(number: int, hedge: bool, outcome: Optional[Tuple],
+                   won: Optional[bool] = None) -> Dict[str, Any]:
+    """Summarize one request of a call for its timing record; won is set for hedged pairs"""
+    entry: Dict[str, Any] = {"attempt": number, "hedge": hedge}
+    if won is not None:
+        entry["won"] = won
+    if outcome is None:
+        entry["status"] = None
+        entry["outstanding"] = True
+        return entry
+    status, _, timing, _, error_kind = outcome
+    entry["status"] = status
+    if timing is not None:
+        entry["total_ms"] = timing["total_ms"]
+    if error_kind is not None:
+        entry["error"] = error_kind
+    return entry
+
+
+def _headers_size(headers) -> int:
+    """Approximate on-the-wire size of a header block"""
+    return sum(len(name) + len(value) + 4 for name, value in headers.items()) + 2
+
+
+def _request_size(request: requests.PreparedRequest) -> int:
+    """Approximate bytes sent for a prepared request"""
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode()
+    request_line = len(request.method) + len(request.path_url) + 12
+    return request_line + _headers_size(request.headers) + len(body)
+
+
+def _response_size(response: requests.Response, body: bytes) -> int:
+    """Approximate bytes received, counting the body as transferred"""
+    try:
+        body_size = response.raw.tell() or len(body)
+    except (AttributeError, OSError):
+        body_size = len(body)
+    status_line = len(response.reason or "") + 15
+    return status_line + _headers_size(response.headers) + body_size
+
+
+class EndpointTimings:
+    """
+    Per-endpoint aggregation of request timing records.
+
+    served holds the total latency of 2xx responses alone, free of fast
+    validation errors and failures.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self.served: Dict[str, LatencyHistogram] = {}
+        self.sizes: Dict[str, Dict[str, List[int]]] = {}
+        self.overhead: Dict[str, Dict[str, LatencyHistogram]] = {}
+
+    def add(self, endpoint: str, timing: Dict[str, Any]):
+        """Add one timing record; responses served from cache, a cassette or a batch are skipped"""
+        if timing.get("cache") in ("hit", "coalesced") or "cassette" in timing or "coalesce" in timing:
+            return
+        histograms = self.phases.setdefault(
+            endpoint, {phase: LatencyHistogram() for phase in TIMING_PHASES})
+        for phase in TIMING_PHASES:
+            histograms[phase].record(timing.get(f"{phase}_ms", 0.0) / 1000)
+        if 200 <= timing.get("status", 0) < 300:
+            self.served.setdefault(endpoint, LatencyHistogram()).record(timing["total_ms"] / 1000)
+        if "wire_ms" in timing:
+            split = self.overhead.setdefault(
+                endpoint, {phase: LatencyHistogram() for phase in OVERHEAD_PHASES})
+            for phase in OVERHEAD_PHASES:
+                split[phase].record(timing[f"{phase}_ms"] / 1000)
+        sizes = self.sizes.setdefault(endpoint, {})
+        for key in ("request_bytes", "response_bytes"):
+            if key in timing:
+                # [min, total, max, count]
+                stat = sizes.setdefault(key, [timing[key], 0, timing[key], 0])
+                stat[0] = min(stat[0], timing[key])
+                stat[1] += timing[key]
+                stat[2] = max(stat[2], timing[key])
+                stat[3] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Return min/mean/percentiles for each phase and sizes per endpoint"""
+        result = {}
+        for endpoint, histograms in self.phases.items():
+            entry: Dict[str, Any] = {phase: histograms[phase].summary() for phase in TIMING_PHASES}
+            for phase, histogram in self.overhead.get(endpoint, {}).items():
+                entry[phase] = histogram.summary()
+            for key, (low, total, high, count) in self.sizes.get(endpoint, {}).items():
+                entry[key] = {"min": low, "mean": round(total / count, 1), "max": high}
+            result[endpoint] = entry
+        return result
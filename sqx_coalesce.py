@@ -0,0 +1,231 @@
+"""
+SQX Request Coalescing
+Folds concurrent single-ISIN lookups into bulk requests. The first lookup
+of a batch waits up to a short window for others to join, or until the
+batch is full, then sends one POST /price/byIsinBulk and hands every caller
+the (status, response) that GET /price/byIsin would have returned: the
+price record with 200, or a 404 "ISIN not found" message. ISINs a
+successful bulk response left out are looked up singly. A failed bulk
+request (throttled, 5xx, no response) hands its status to every caller, so
+the usual retry and rate-limit handling applies rather than a burst of
+single requests. Malformed ISINs skip coalescing so they still get the
+single endpoint's own 400. Each caller also gets the timing record of the
+request that answered it, so its wire and client time are the shared bulk
+request's rather than missing.
+"""
+
+import threading
+import time
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from sqx_histogram import LatencyHistogram
+from sqx_isin import ISIN_PATTERN, record_isin
+
+SINGLE_ENDPOINT = "/price/byIsin"
+BULK_ENDPOINT = "/price/byIsinBulk"
+
+# What a send function returns: status, response and its timing record
+Sent = Tuple[int, Any, Optional[Dict[str, Any]]]
+
+
+def not_found_response(isin: str) -> Tuple[int, Dict[str, str]]:
+    """Return the single endpoint's answer for an unknown ISIN"""
+    return 404, {"message": f"ISIN not found: {isin}"}
+
+
+class _Lookup:
+    """One caller waiting for its ISIN's share of a bulk response"""
+
+    def __init__(self):
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result: Optional[Tuple[int, Any]] = None
+        self.timing: Optional[Dict[str, Any]] = None
+        self.queue_s = 0.0
+        self.batch_size = 0
+
+
+class _Batch:
+    """Lookups collected for one bulk request, by ISIN"""
+
+    def __init__(self):
+        self.lookups: Dict[str, List[_Lookup]] = {}
+        self.full = threading.Event()
+
+
+class BulkCoalescer:
+    """
+    Thread-safe batcher of single-ISIN lookups.
+
+    window:    seconds the first lookup of a batch waits for others
+    max_batch: distinct ISINs per bulk request; a full batch is sent at once
+
+    Lookups for the same ISIN within a batch share one bulk entry and one
+    response object, which callers must treat as read-only.
+    """
+
+    def __init__(self, window: float = 0.005, max_batch: int = 100):
+        if window < 0:
+            raise ValueError("window must not be negative")
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.window = window
+        self.max_batch = max_batch
+        self._open: Optional[_Batch] = None
+        self._lock = threading.Lock()
+        self.queue_latency = LatencyHistogram()
+        self.lookups = 0
+        self.bypassed = 0
+        self.bulk_requests = 0
+        self.bulk_failures = 0
+        self.isins_sent = 0
+        self.fallback_requests = 0
+
+    def lookup(self, isin: str, send_bulk: Callable[[List[str]], Sent],
+               send_single: Callable[[str], Sent]) -> Tuple[Tuple[int, Any], Dict[str, Any]]:
+        """
+        Return ((status, response), info) for a single-ISIN lookup.
+
+        send_bulk(isins) performs the bulk request and send_single(isin) the
+        single one, each returning (status, response, timing record). info
+        holds how the lookup was served: "role" (leader, follower or
+        bypass), "queue_ms", "batch_size" and the "timing" record of the
+        request that answered it.
+        """
+        if not ISIN_PATTERN.fullmatch(isin):
+            with self._lock:
+                self.bypassed += 1
+            status, response, timing = send_single(isin)
+            return (status, response), {"role": "bypass", "queue_ms": 0.0, "batch_size": 0,
+                                        "timing": timing}
+
+        lookup = _Lookup()
+        with self._lock:
+            self.lookups += 1
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            batch.lookups.setdefault(isin, []).append(lookup)
+            if len(batch.lookups) >= self.max_batch:
+                self._open = None
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            self._flush(batch, send_bulk, send_single)
+        else:
+            lookup.done.wait()
+        return lookup.result, {"role": "leader" if leader else "follower",
+                               "queue_ms": round(lookup.queue_s * 1000, 3),
+                               "batch_size": lookup.batch_size,
+                               "timing": lookup.timing}
+
+    def _flush(self, batch: _Batch, send_bulk: Callable[[List[str]], Sent],
+               send_single: Callable[[str], Sent]):
+        """Send a closed batch and fan the results out to its lookups"""
+        sent = time.perf_counter()
+        isins = list(batch.lookups)
+        results: Dict[str, Tuple[int, Any]] = {}
+        timings: Dict[str, Optional[Dict[str, Any]]] = {}
+        fallbacks = 0
+        status, response, timing = 0, None, None
+        try:
+            status, response, timing = send_bulk(isins)
+            if status != 200 or not isinstance(response, dict):
+                # A failed bulk request fails every lookup in it, leaving
+                # retries to the callers' own retry and rate-limit handling
+                results = {isin: (status, response) for isin in isins}
+            else:
+                for record in response.get("success") or []:
+                    isin = record_isin(record)
+                    if isin in batch.lookups:
+                        results[isin] = (200, record)
+                for isin in response.get("not_found") or []:
+                    if isin in batch.lookups:
+                        results.setdefault(isin, not_found_response(isin))
+                # ISINs the bulk response left out get the single endpoint's answer
+                for isin in isins:
+                    if isin not in results:
+                        fallbacks += 1
+                        single_status, single_response, timings[isin] = send_single(isin)
+                        results[isin] = (single_status, single_response)
+        finally:
+            with self._lock:
+                self.bulk_requests += 1
+                self.isins_sent += len(isins)
+                self.fallback_requests += fallbacks
+                if status != 200 or not isinstance(response, dict):
+                    self.bulk_failures += 1
+                for isin, lookups in batch.lookups.items():
+                    for lookup in lookups:
+                        lookup.queue_s = sent - lookup.enqueued
+                        self.queue_latency.record(lookup.queue_s)
+            for isin, lookups in batch.lookups.items():
+                result = results.get(isin, (0, {"error": "Coalesced bulk request failed"}))
+                for lookup in lookups:
+                    lookup.result = result
+                    lookup.timing = timings.get(isin, timing)
+                    lookup.batch_size = len(isins)
+                    lookup.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batching counters, requests saved and added queueing latency"""
+        with self._lock:
+            requests = self.bulk_requests + self.fallback_requests
+            return {
+                "window_ms": round(self.window * 1000, 3),
+                "max_batch": self.max_batch,
+                "lookups": self.lookups,
+                "bypassed": self.bypassed,
+                "bulk_requests": self.bulk_requests,
+                "bulk_failures": self.bulk_failures,
+                "fallback_requests": self.fallback_requests,
+                "isins_sent": self.isins_sent,
+                "requests_saved": self.lookups - requests,
+                "mean_batch": round(self.isins_sent / self.bulk_requests, 2) if self.bulk_requests else 0.0,
+                "mean_lookups_per_batch": (round(self.lookups / self.bulk_requests, 2)
+                                           if self.bulk_requests else 0.0),
+                "queue_latency": self.queue_latency.summary(),
+                "queue_histogram": self.queue_latency.to_dict(),
+            }
+
+
+def merge_coalesce_stats(stats: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Add up coalescer stats from several processes"""
+    merged = dict(stats[0])
+    for key in ("lookups", "bypassed", "bulk_requests", "bulk_failures", "fallback_requests",
+                "isins_sent", "requests_saved"):
+        merged[key] = sum(entry[key] for entry in stats)
+    bulk_requests = merged["bulk_requests"]
+    merged["mean_batch"] = round(merged["isins_sent"] / bulk_requests, 2) if bulk_requests else 0.0
+    merged["mean_lookups_per_batch"] = (round(merged["lookups"] / bulk_requests, 2)
+                                        if bulk_requests else 0.0)
+    histogram = LatencyHistogram.from_dict(stats[0]["queue_histogram"])
+    for entry in stats[1:]:
+        histogram.merge(LatencyHistogram.from_dict(entry["queue_histogram"]))
+    merged["queue_latency"] = histogram.summary()
+    merged["queue_histogram"] = histogram.to_dict()
+    return merged
+
+
+def print_coalesce_report(stats: Dict[str, Any]):
+    """Print how many requests coalescing saved and the latency it added"""
+    print("\n" + "-"*70)
+    print(f"Request coalescing (window {stats['window_ms']}ms, max batch {stats['max_batch']})")
+    print("-"*70)
+    sent = stats["bulk_requests"] + stats["fallback_requests"]
+    print(f"Single lookups coalesced: {stats['lookups']} -> {sent} requests "
+          f"({stats['bulk_requests']} bulk, {stats['fallback_requests']} single fallbacks), "
+          f"{stats['requests_saved']} saved")
+    print(f"Mean batch: {stats['mean_batch']} ISINs, {stats['mean_lookups_per_batch']} lookups"
+          + (f"; {stats['bulk_failures']} bulk requests failed" if stats["bulk_failures"] else ""))
+    if stats["bypassed"]:
+        print(f"Malformed ISINs sent singly: {stats['bypassed']}")
+    queue = stats.get("queue_latency") or {}
+    if queue.get("count"):
+        print(f"Added queueing latency: mean {queue['mean_ms']}ms, p50 {queue['p50_ms']}ms, "
+              f"p99 {queue['p99_ms']}ms, max {queue['max_ms']}ms")
@@ -0,0 +1,66 @@
+"""
+SQX JSON Codec
+Pluggable JSON decoding and encoding. orjson is used when it is installed
+and the standard library otherwise. Both decoders raise json.JSONDecodeError
+(orjson's error subclasses it), so callers handle a single exception type
+whichever codec is active.
+"""
+
+import json
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Names accepted by get_codec; "auto" prefers orjson when available
+CODEC_NAMES = ("auto", "orjson", "json")
+
+
+class JsonCodec:
+    """
+    A named loads/dumps pair.
+
+    loads accepts bytes or str; dumps returns compact text, passing objects
+    it cannot serialize to default.
+    """
+
+    def __init__(self, name: str, loads: Callable[[Any], Any],
+                 dumps: Callable[[Any, Optional[Callable[[Any], Any]]], str]):
+        self.name = name
+        self.loads = loads
+        self._dumps = dumps
+
+    def dumps(self, obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+        """Serialize obj without whitespace"""
+        return self._dumps(obj, default)
+
+
+def _json_dumps(obj: Any, default: Optional[Callable[[Any], Any]]) -> str:
+    return json.dumps(obj, separators=(",", ":"), default=default)
+
+
+def _orjson_dumps(obj: Any, default: Optional[Callable[[Any], Any]]) -> str:
+    return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+JSON_CODEC = JsonCodec("json", json.loads, _json_dumps)
+ORJSON_CODEC = JsonCodec("orjson", orjson.loads, _orjson_dumps) if orjson is not None else None
+
+
+def get_codec(name: str = "auto") -> JsonCodec:
+    """Return the codec with the given name; "auto" picks the fastest installed"""
+    if name == "auto":
+        return ORJSON_CODEC or JSON_CODEC
+    if name == "json":
+        return JSON_CODEC
+    if name == "orjson":
+        if ORJSON_CODEC is None:
+            raise ValueError("orjson is not installed")
+        return ORJSON_CODEC
+    raise ValueError(f"Unknown JSON codec: {name}")
+
+
+# Codec used when none is configured
+DEFAULT_CODEC = get_codec()
@@ -0,0 +1,149 @@
+"""
+SQX Latency Histogram
+HDR-style log-linear histogram for latency recording. Values are stored as
+integer microseconds in buckets whose width grows with magnitude, giving a
+bounded relative error at any scale while keeping memory independent of the
+number of samples. Histograms with the same precision merge exactly.
+"""
+
+from typing import Dict, Any, Optional
+
+# Percentiles reported by summary()
+REPORTED_PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+class LatencyHistogram:
+    """
+    Log-linear latency histogram.
+
+    sub_bucket_bits controls precision: each power-of-two range is split into
+    2**(sub_bucket_bits - 1) linear buckets, so the default of 8 keeps the
+    recorded value within ~0.4% of the true latency.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 8):
+        self.sub_bucket_bits = sub_bucket_bits
+        self._sub_bucket_count = 1 << sub_bucket_bits
+        self._half_count = self._sub_bucket_count >> 1
+        self.counts: Dict[int, int] = {}
+        self.total_count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us: Optional[int] = None
+
+    # ------------------------------------------------------------------
+    # Bucket arithmetic
+    # ------------------------------------------------------------------
+
+    def _index(self, value_us: int) -> int:
+        """Return the bucket index holding value_us"""
+        if value_us < self._sub_bucket_count:
+            return value_us
+        shift = value_us.bit_length() - self.sub_bucket_bits
+        top = value_us >> shift
+        return self._sub_bucket_count + (shift - 1) * self._half_count + (top - self._half_count)
+
+    def _bucket_bounds(self, index: int):
+        """Return the [low, high) microsecond range covered by a bucket"""
+        if index < self._sub_bucket_count:
+            return index, index + 1
+        offset = index - self._sub_bucket_count
+        shift = offset // self._half_count + 1
+        top = offset % self._half_count + self._half_count
+        return top << shift, (top + 1) << shift
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record(self, seconds: float):
+        """Record a latency given in seconds"""
+        self.record_us(int(seconds * 1_000_000))
+
+    def record_us(self, value_us: int, count: int = 1):
+        """Record a latency given in integer microseconds"""
+        if value_us < 0:
+            value_us = 0
+        index = self._index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += count
+        self.total_us += value_us * count
+        if self.min_us is None or value_us < self.min_us:
+            self.min_us = value_us
+        if self.max_us is None or value_us > self.max_us:
+            self.max_us = value_us
+
+    def merge(self, other: "LatencyHistogram"):
+        """Add every sample recorded in other into this histogram"""
+        if other.sub_bucket_bits != self.sub_bucket_bits:
+            raise ValueError("Cannot merge histograms with different precision")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total_count += other.total_count
+        self.total_us += other.total_us
+        if other.min_us is not None and (self.min_us is None or other.min_us < self.min_us):
+            self.min_us = other.min_us
+        if other.max_us is not None and (self.max_us is None or other.max_us > self.max_us):
+            self.max_us = other.max_us
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def percentile_us(self, percentile: float) -> int:
+        """Return the value at the given percentile (0-100) in microseconds"""
+        if self.total_count == 0:
+            return 0
+        rank = max(1, -(-self.total_count * percentile // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = self._bucket_bounds(index)
+                value = (low + high - 1) // 2
+                return max(self.min_us, min(value, self.max_us))
+        return self.max_us
+
+    def mean_us(self) -> float:
+        """Return the mean recorded value in microseconds"""
+        return self.total_us / self.total_count if self.total_count else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """Return count, min, mean, reported percentiles and max in milliseconds"""
+        if self.total_count == 0:
+            return {"count": 0}
+        result = {
+            "count": self.total_count,
+            "min_ms": round(self.min_us / 1000, 3),
+            "mean_ms": round(self.mean_us() / 1000, 3),
+        }
+        for percentile in REPORTED_PERCENTILES:
+            result[f"p{percentile:g}_ms"] = round(self.percentile_us(percentile) / 1000, 3)
+        result["max_ms"] = round(self.max_us / 1000, 3)
+        return result
+
+    # ------------------------------------------------------------------
+    # Serialization
+    # ------------------------------------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable representation"""
+        return {
+            "sub_bucket_bits": self.sub_bucket_bits,
+            "counts": {str(index): count for index, count in self.counts.items()},
+            "total_count": self.total_count,
+            "total_us": self.total_us,
+            "min_us": self.min_us,
+            "max_us": self.max_us,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        """Rebuild a histogram from to_dict() output"""
+        histogram = cls(data["sub_bucket_bits"])
+        histogram.counts = {int(index): count for index, count in data["counts"].items()}
+        histogram.total_count = data["total_count"]
+        histogram.total_us = data["total_us"]
+        histogram.min_us = data["min_us"]
+        histogram.max_us = data["max_us"]
+        return histogram
@@ -0,0 +1,351 @@
+"""
+SQX ISIN Validation
+Local ISO 6166 ISIN validation: 12-character format, country prefix and
+mod-10 (Luhn) check digit.
+
+validate_batch() is vectorized without numpy: a batch is joined into one
+fixed-stride byte string, each of the 12 character positions is sliced out
+as a column, and per-row work is done with bytes.translate lookups and
+big-integer arithmetic where every byte is an independent lane. This keeps
+the per-ISIN Python overhead to a couple of list operations, so files with
+millions of identifiers can be screened before any network I/O.
+"""
+
+import re
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+ISIN_LENGTH = 12
+ISIN_PATTERN = re.compile(r"[A-Z]{2}[A-Z0-9]{9}[0-9]")
+
+# ISO 3166-1 alpha-2 country codes
+ISO_COUNTRIES = frozenset("""
+AD AE AF AG AI AL AM AO AQ AR AS AT AU AW AX AZ BA BB BD BE BF BG BH BI BJ BL
+BM BN BO BQ BR BS BT BV BW BY BZ CA CC CD CF CG CH CI CK CL CM CN CO CR CU CV
+CW CX CY CZ DE DJ DK DM DO DZ EC EE EG EH ER ES ET FI FJ FK FM FO FR GA GB GD
+GE GF GG GH GI GL GM GN GP GQ GR GS GT GU GW GY HK HM HN HR HT HU ID IE IL IM
+IN IO IQ IR IS IT JE JM JO JP KE KG KH KI KM KN KP KR KW KY KZ LA LB LC LI LK
+LR LS LT LU LV LY MA MC MD ME MF MG MH MK ML MM MN MO MP MQ MR MS MT MU MV MW
+MX MY MZ NA NC NE NF NG NI NL NO NP NR NU NZ OM PA PE PF PG PH PK PL PM PN PR
+PS PT PW PY QA RE RO RS RU RW SA SB SC SD SE SG SH SI SJ SK SL SM SN SO SR SS
+ST SV SX SY SZ TC TD TF TG TH TJ TK TL TM TN TO TR TT TV TW TZ UA UG UM US UY
+UZ VA VC VE VG VI VN VU WF WS YE YT ZA ZM ZW
+""".split())
+
+# Non-country prefixes issued by numbering agencies: international
+# securities (XS), EU institutions (EU), CUSIP international (XA-XD) and
+# legacy codes still found on outstanding issues (AN, CS, YU)
+SPECIAL_PREFIXES = frozenset({"XS", "EU", "XA", "XB", "XC", "XD", "AN", "CS", "YU"})
+
+VALID_PREFIXES = ISO_COUNTRIES | SPECIAL_PREFIXES
+
+# Rejection reasons, in the order they are checked
+REASON_LENGTH = "length"
+REASON_FORMAT = "format"
+REASON_COUNTRY = "country"
+REASON_CHECK_DIGIT = "check_digit"
+
+_DIGITS = b"0123456789"
+_LETTERS = bytes(range(ord("A"), ord("Z") + 1))
+_ALNUM = _DIGITS + _LETTERS
+
+
+def _table(mapping: Dict[int, int], default: int) -> bytes:
+    """256-byte translate table with the given entries and a default"""
+    return bytes(mapping.get(byte, default) for byte in range(256))
+
+
+# Luhn contribution of each character once letters expand to two digits
+# (A=10 ... Z=35): digits at odd distance from the right end are doubled
+# and their digit sum taken. _LUHN_EVEN applies when the character's last
+# digit sits at an even distance, _LUHN_ODD when odd; non-alphanumerics
+# contribute 0 and are caught by the format check.
+def _luhn_points(digit: int, doubled: bool) -> int:
+    return (2 * digit if digit < 5 else 2 * digit - 9) if doubled else digit
+
+
+def _luhn_table(odd: bool) -> bytes:
+    points = {b: _luhn_points(b - 48, odd) for b in _DIGITS}
+    for b in _LETTERS:
+        tens, ones = divmod(b - 55, 10)
+        points[b] = _luhn_points(ones, odd) + _luhn_points(tens, not odd)
+    return _table(points, 0)
+
+
+_LUHN_EVEN = _luhn_table(False)
+_LUHN_ODD = _luhn_table(True)
+_IS_LETTER = _table({b: 1 for b in _LETTERS}, 0)
+_NOT_MOD10 = _table({v: 0 for v in range(0, 256, 10)}, 1)
+
+# Per-position "character not allowed here" tables
+_BAD_IF_NOT_LETTER = _table({b: 0 for b in _LETTERS}, 1)
+_BAD_IF_NOT_ALNUM = _table({b: 0 for b in _ALNUM}, 1)
+_BAD_IF_NOT_DIGIT = _table({b: 0 for b in _DIGITS}, 1)
+_POSITION_RULES = [_BAD_IF_NOT_LETTER] * 2 + [_BAD_IF_NOT_ALNUM] * 9 + [_BAD_IF_NOT_DIGIT]
+
+# Prefix check as (first letter, table flagging invalid second letters) pairs
+_IS_BYTE = {b: _table({b: 1}, 0) for b in _LETTERS}
+_PREFIX_RULES = [
+    (_IS_BYTE[first], _table({second: 0 for second in _LETTERS
+                              if bytes((first, second)).decode() in VALID_PREFIXES}, 1))
+    for first in _LETTERS
+]
+_NONZERO = re.compile(rb"[^\x00]")
+
+# Scalar letter expansion, used by validate_isin
+_EXPAND = str.maketrans({chr(code): str(code - 55) for code in range(ord("A"), ord("Z") + 1)})
+_DOUBLE = bytes.maketrans(b"0123456789", b"0246813579")
+
+
+def _luhn_ok(isin: str) -> bool:
+    """Mod-10 check over the letter-expanded ISIN, check digit included"""
+    digits = isin.translate(_EXPAND).encode()[::-1]
+    kept = digits[0::2]
+    doubled = digits[1::2].translate(_DOUBLE)
+    return (sum(kept) + sum(doubled) - 48 * len(digits)) % 10 == 0
+
+
+def validate_isin(isin: str) -> Optional[str]:
+    """Return None if isin is valid, otherwise the reason it was rejected"""
+    if len(isin) != ISIN_LENGTH:
+        return REASON_LENGTH
+    if not ISIN_PATTERN.fullmatch(isin):
+        return REASON_FORMAT
+    if isin[:2] not in VALID_PREFIXES:
+        return REASON_COUNTRY
+    if not _luhn_ok(isin):
+        return REASON_CHECK_DIGIT
+    return None
+
+
+def is_valid_isin(isin: str) -> bool:
+    """Return True if isin passes format, country and check-digit validation"""
+    return validate_isin(isin) is None
+
+
+def record_isin(record: Any) -> Optional[str]:
+    """Return the ISIN of a price record or bulk success entry"""
+    if isinstance(record, dict):
+        for section in ("reference", "pricing"):
+            value = record.get(section)
+            if isinstance(value, dict) and "isin" in value:
+                return value["isin"]
+        return record.get("isin")
+    return None
+
+
+def _lanes(column: bytes, table: bytes) -> int:
+    """Translate a column and pack it into an int with one byte lane per row"""
+    return int.from_bytes(column.translate(table), "big")
+
+
+def _column_checks(data: bytes, rows: int) -> Tuple[bytes, bytes, bytes]:
+    """
+    Return per-row (format_bad, prefix_bad, luhn_bad) flags for rows of 12
+    characters.
+
+    Lane sums never exceed 255 (at most 12 format violations, at most
+    12 * 18 Luhn points), so adding lanes as big integers never carries
+    between rows.
+    """
+    columns = [data[k::ISIN_LENGTH] for k in range(ISIN_LENGTH)]
+
+    format_bad = 0
+    for column, rule in zip(columns, _POSITION_RULES):
+        format_bad += _lanes(column, rule)
+
+    # Lanes are 0 or 1 here, so & and | act row by row
+    prefix_bad = 0
+    for is_first, bad_second in _PREFIX_RULES:
+        prefix_bad |= _lanes(columns[0], is_first) & _lanes(columns[1], bad_second)
+
+    # Walk from the check digit leftwards tracking, per row, whether an odd
+    # number of expanded digits lies to the right. A digit adds one expanded
+    # digit and flips that parity; a letter adds two and keeps it.
+    luhn_sum = 0
+    one_per_row = int.from_bytes(b"\x01" * rows, "big")
+    odd = 0
+    for column in reversed(columns):
+        odd_mask = odd * 0xFF
+        even = _lanes(column, _LUHN_EVEN)
+        luhn_sum += even ^ ((even ^ _lanes(column, _LUHN_ODD)) & odd_mask)
+        odd ^= one_per_row ^ _lanes(column, _IS_LETTER)
+
+    return (format_bad.to_bytes(rows, "big"),
+            prefix_bad.to_bytes(rows, "big"),
+            luhn_sum.to_bytes(rows, "big").translate(_NOT_MOD10))
+
+
+def validate_batch(isins: List[str]) -> List[Optional[str]]:
+    """Validate a batch of ISINs, returning a rejection reason (or None) for each"""
+    reasons: List[Optional[str]] = [None] * len(isins)
+    if set(map(len, isins)) <= {ISIN_LENGTH}:
+        rows: Sequence[int] = range(len(isins))
+        candidates = isins
+    else:
+        rows = []
+        for i, isin in enumerate(isins):
+            if len(isin) == ISIN_LENGTH:
+                rows.append(i)
+            else:
+                reasons[i] = REASON_LENGTH
+        candidates = [isins[i] for i in rows]
+    if not candidates:
+        return reasons
+
+    # Non-ASCII characters become a single "?" each, keeping the stride at 12
+    data = "".join(candidates).encode("ascii", "replace")
+    format_bad, prefix_bad, luhn_bad = _column_checks(data, len(candidates))
+
+    # Only rows failing some check need a per-row look
+    any_bad = (int.from_bytes(format_bad, "big") | int.from_bytes(prefix_bad, "big")
+               | int.from_bytes(luhn_bad, "big")).to_bytes(len(candidates), "big")
+    for match in _NONZERO.finditer(any_bad):
+        row = match.start()
+        if format_bad[row]:
+            reason = REASON_FORMAT
+        elif prefix_bad[row]:
+            reason = REASON_COUNTRY
+        else:
+            reason = REASON_CHECK_DIGIT
+        reasons[rows[row]] = reason
+    return reasons
+
+
+class IsinFilter:
+    """
+    Streams ISINs through validation, passing valid ones on and counting
+    rejections by reason. A sample of rejected ISINs is kept for the report,
+    and all rejections can be written to a file.
+    """
+
+    def __init__(self, batch_size: int = 65536, sample_size: int = 10,
+                 rejects_path: Optional[str] = None):
+        self.batch_size = batch_size
+        self.sample_size = sample_size
+        self.rejects_path = rejects_path
+        self.checked = 0
+        self.rejected: Dict[str, int] = {}
+        self.samples: List[Tuple[str, str]] = []
+
+    @property
+    def invalid(self) -> int:
+        """Number of ISINs rejected so far"""
+        return sum(self.rejected.values())
+
+    def filter(self, isins: Iterable[str]) -> Iterator[str]:
+        """Yield the valid ISINs from isins, validating in batches"""
+        rejects = open(self.rejects_path, "w") if self.rejects_path else None
+        try:
+            batch: List[str] = []
+            for isin in isins:
+                batch.append(isin)
+                if len(batch) >= self.batch_size:
+                    yield from self._process(batch, rejects)
+                    batch = []
+            if batch:
+                yield from self._process(batch, rejects)
+        finally:
+            if rejects is not None:
+                rejects.close()
+
+    def _process(self, batch: List[str], rejects) -> List[str]:
+        valid = []
+        for isin, reason in zip(batch, validate_batch(batch)):
+            if reason is None:
+                valid.append(isin)
+                continue
+            self.rejected[reason] = self.rejected.get(reason, 0) + 1
+            if len(self.samples) < self.sample_size:
+                self.samples.append((isin, reason))
+            if rejects is not None:
+                rejects.write(f"{isin}\t{reason}\n")
+        self.checked += len(batch)
+        return valid
+
+    def report(self) -> Dict[str, object]:
+        """Return validation counts"""
+        return {
+            "checked": self.checked,
+            "valid": self.checked - self.invalid,
+            "invalid": self.invalid,
+            "rejected_by_reason": dict(sorted(self.rejected.items())),
+            "samples": [{"isin": isin, "reason": reason} for isin, reason in self.samples],
+        }
+
+
+
+def merge_validation_reports(reports: List[Dict[str, Any]], sample_size: int = 10) -> Dict[str, Any]:
+    """Add up IsinFilter reports from filters that each saw part of a stream"""
+    rejected: Dict[str, int] = {}
+    for report in reports:
+        for reason, count in report["rejected_by_reason"].items():
+            rejected[reason] = rejected.get(reason, 0) + count
+    checked = sum(report["checked"] for report in reports)
+    invalid = sum(rejected.values())
+    return {
+        "checked": checked,
+        "valid": checked - invalid,
+        "invalid": invalid,
+        "rejected_by_reason": dict(sorted(rejected.items())),
+        "samples": [sample for report in reports for sample in report["samples"]][:sample_size],
+    }
+
+
+def screen_targets(targets: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    Remove invalid ISINs from make_request-style targets before any request.
+
+    Invalid entries are dropped from a json_data isin_list, or from the
+    "isins" a target's isin param cycles through. A target is dropped
+    entirely when its isin param is invalid or when every entry of its list
+    was. Returns the screened targets and what was removed.
+    """
+    screened: Dict[str, Dict[str, Any]] = {}
+    rejected: Dict[str, List[Dict[str, str]]] = {}
+    dropped: List[str] = []
+    for name, spec in targets.items():
+        isin = (spec.get("params") or {}).get("isin")
+        isin_list = (spec.get("json_data") or {}).get("isin_list")
+        keep = True
+        if spec.get("isins"):
+            reasons = validate_batch([str(item) for item in spec["isins"]])
+            bad = [{"isin": item, "reason": reason}
+                   for item, reason in zip(spec["isins"], reasons) if reason is not None]
+            if bad:
+                rejected[name] = bad
+                valid = [item for item, reason in zip(spec["isins"], reasons) if reason is None]
+                spec = {**spec, "isins": valid}
+                keep = bool(valid)
+        elif isin is not None:
+            reason = validate_isin(str(isin))
+            if reason is not None:
+                rejected[name] = [{"isin": isin, "reason": reason}]
+                keep = False
+        elif isinstance(isin_list, list) and isin_list:
+            reasons = validate_batch([str(item) for item in isin_list])
+            bad = [{"isin": item, "reason": reason}
+                   for item, reason in zip(isin_list, reasons) if reason is not None]
+            if bad:
+                rejected[name] = bad
+                valid = [item for item, reason in zip(isin_list, reasons) if reason is None]
+                spec = {**spec, "json_data": {**spec["json_data"], "isin_list": valid}}
+                keep = bool(valid)
+        if keep:
+            screened[name] = spec
+        else:
+            dropped.append(name)
+    return screened, {"rejected": rejected, "dropped_targets": dropped}
+
+
+def print_validation_report(report: Dict[str, Any]):
+    """Print an ISIN validation report"""
+    print("\n" + "="*70)
+    print("ISIN PRE-VALIDATION")
+    print("="*70)
+    print(f"Checked: {report['checked']}, valid: {report['valid']}, invalid: {report['invalid']}")
+    if report["rejected_by_reason"]:
+        print(f"Rejected by reason: {report['rejected_by_reason']}")
+    for sample in report["samples"]:
+        print(f"  {sample['isin']!r}: {sample['reason']}")
+    if "requests_saved" in report:
+        print(f"Requests saved: ~{report['requests_saved']}")
@@ -0,0 +1,247 @@
+"""
+SQX Load Generator
+Open-loop load generation against the pricing endpoints. Requests are
+dispatched on a fixed schedule derived from the target rate, independent of
+how quickly earlier requests complete, and latency is measured from each
+request's scheduled start so that queueing behind a slow API is counted
+rather than hidden (no coordinated omission).
+"""
+
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
+
+from sqx_client import SQXClient, OVERHEAD_PHASES
+from sqx_histogram import LatencyHistogram
+
+# Parts of each request's latency: waiting for a free worker, then the
+# client's own wire and overhead split
+LATENCY_PARTS = ("queue",) + OVERHEAD_PHASES
+
+
+class LoadStats:
+    """Latency histogram and status-code counts for one load target"""
+
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.status_counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.parts = {part: LatencyHistogram() for part in LATENCY_PARTS}
+
+    def record(self, latency: float, status: int, response: Any, queued: float = 0.0,
+               timing: Optional[Dict[str, Any]] = None):
+        """Record one completed request, with the client's timing record when it has one"""
+        self.histogram.record(latency)
+        self.parts["queue"].record(queued)
+        if timing is not None and "wire_ms" in timing:
+            for part in OVERHEAD_PHASES:
+                self.parts[part].record(timing[f"{part}_ms"] / 1000)
+        key = str(status)
+        self.status_counts[key] = self.status_counts.get(key, 0) + 1
+        if status == 0:
+            error = response.get("error", "unknown") if isinstance(response, dict) else "unknown"
+            error_type = error.split(":", 1)[0][:80]
+            self.errors[error_type] = self.errors.get(error_type, 0) + 1
+
+    def merge(self, other: "LoadStats"):
+        """Add other's samples and counts into this one"""
+        self.histogram.merge(other.histogram)
+        for part, histogram in other.parts.items():
+            self.parts[part].merge(histogram)
+        for key, count in other.status_counts.items():
+            self.status_counts[key] = self.status_counts.get(key, 0) + count
+        for key, count in other.errors.items():
+            self.errors[key] = self.errors.get(key, 0) + count
+
+    @classmethod
+    def from_report(cls, row: Dict[str, Any]) -> "LoadStats":
+        """Rebuild the stats behind one entry of a load report"""
+        stats = cls()
+        stats.histogram = LatencyHistogram.from_dict(row["histogram"])
+        stats.status_counts = dict(row["status_counts"])
+        stats.errors = dict(row["connection_errors"])
+        stats.parts = {part: LatencyHistogram.from_dict(data)
+                       for part, data in row["part_histograms"].items()}
+        return stats
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        """Return latency percentiles, throughput and error breakdown"""
+        total = self.histogram.total_count
+        failed = sum(count for status, count in self.status_counts.items()
+                     if not status.startswith("2"))
+        return {
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency": self.histogram.summary(),
+            "status_counts": dict(sorted(self.status_counts.items())),
+            "error_rate": round(failed / total, 4) if total else 0.0,
+            "connection_errors": self.errors,
+            "histogram": self.histogram.to_dict(),
+            "latency_parts": {part: histogram.summary() for part, histogram in self.parts.items()},
+            "part_histograms": {part: histogram.to_dict() for part, histogram in self.parts.items()},
+        }
+
+
+def run_load(client: SQXClient, targets: Dict[str, Dict[str, Any]], rps: float,
+             duration: float, concurrency: int = 16, start_offset: float = 0.0,
+             snapshot_interval: Optional[float] = None,
+             on_snapshot: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Drive an open-loop request rate against one or more endpoints.
+
+    targets maps a name to make_request keyword arguments (method, endpoint,
+    params, json_data). A target may also carry "isins", a list its
+    requests' isin parameter cycles through, "coalesce" to let the client's
+    coalescer batch its lookups, and a "label" naming its endpoint in the
+    report's config. Requests are spread round-robin across targets at
+    rps requests per second for duration seconds, with at most concurrency
+    requests in flight. When every worker is busy, scheduled requests queue
+    and their wait counts toward latency.
+
+    start_offset delays the whole schedule, so several processes sharing a
+    rate can interleave their sends. Every snapshot_interval seconds while
+    dispatching, on_snapshot receives the report so far.
+    """
+    names = list(targets)
+    stats = {name: LoadStats() for name in names}
+    sends = {name: itertools.count() for name in names}
+    lock = threading.Lock()
+    total_requests = int(rps * duration)
+    interval = 1.0 / rps
+    max_dispatch_lag = 0.0
+
+    def send(name: str, scheduled: float):
+        spec = targets[name]
+        params = spec.get("params")
+        if spec.get("isins"):
+            isins = spec["isins"]
+            params = {**(params or {}), "isin": isins[next(sends[name]) % len(isins)]}
+        started = time.perf_counter()
+        status, response = client.request(spec["method"], spec["endpoint"], params=params,
+                                          json_data=spec.get("json_data"),
+                                          use_cache=False, retry=False,
+                                          coalesce=spec.get("coalesce", False))
+        latency = time.perf_counter() - scheduled
+        timing = client.last_timing()
+        with lock:
+            stats[name].record(latency, status, response, max(started - scheduled, 0.0), timing)
+
+    def build_report(elapsed: float) -> Dict[str, Any]:
+        with lock:
+            overall = LoadStats()
+            for target_stats in stats.values():
+                overall.merge(target_stats)
+            endpoints = {name: stats[name].report(elapsed) for name in names}
+        return {
+            "config": {
+                "target_rps": rps,
+                "duration_s": duration,
+                "concurrency": concurrency,
+                "endpoints": names,
+                "labels": {name: targets[name].get("label", targets[name]["endpoint"])
+                           for name in names},
+            },
+            "elapsed_s": round(elapsed, 3),
+            "max_dispatch_lag_ms": round(max_dispatch_lag * 1000, 3),
+            "overall": overall.report(elapsed),
+            "endpoints": endpoints,
+        }
+
+    start = time.perf_counter() + start_offset
+    next_snapshot = start + snapshot_interval if on_snapshot and snapshot_interval else None
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i in range(total_requests):
+            scheduled = start + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                max_dispatch_lag = max(max_dispatch_lag, -delay)
+            executor.submit(send, names[i % len(names)], scheduled)
+            if next_snapshot is not None and scheduled >= next_snapshot:
+                on_snapshot(build_report(time.perf_counter() - start))
+                next_snapshot += snapshot_interval
+    return build_report(time.perf_counter() - start)
+
+
+def merge_load_reports(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge load reports from processes that ran side by side.
+
+    Histograms and counters are added exactly; rates and throughput are
+    summed and the run lasts as long as the slowest process.
+    """
+    elapsed = max(report["elapsed_s"] for report in reports)
+    names: List[str] = []
+    stats: Dict[str, LoadStats] = {}
+    for report in reports:
+        for name, row in report["endpoints"].items():
+            if name not in stats:
+                names.append(name)
+                stats[name] = LoadStats()
+            stats[name].merge(LoadStats.from_report(row))
+    overall = LoadStats()
+    for target_stats in stats.values():
+        overall.merge(target_stats)
+    return {
+        "config": {
+            "target_rps": sum(report["config"]["target_rps"] for report in reports),
+            "duration_s": reports[0]["config"]["duration_s"],
+            "concurrency": sum(report["config"]["concurrency"] for report in reports),
+            "endpoints": names,
+            "labels": {name: label for report in reports
+                       for name, label in report["config"].get("labels", {}).items()},
+            "processes": len(reports),
+        },
+        "elapsed_s": elapsed,
+        "max_dispatch_lag_ms": max(report["max_dispatch_lag_ms"] for report in reports),
+        "overall": overall.report(elapsed),
+        "endpoints": {name: stats[name].report(elapsed) for name in names},
+        "workers": [{"requests": report["overall"]["requests"],
+                     "throughput_rps": report["overall"]["throughput_rps"],
+                     "max_dispatch_lag_ms": report["max_dispatch_lag_ms"]}
+                    for report in reports],
+    }
+
+
+def print_load_report(report: Dict[str, Any]):
+    """Print a load report as a table"""
+    config = report["config"]
+    print("\n" + "="*70)
+    print("LOAD TEST REPORT")
+    print("="*70)
+    processes = f", {config['processes']} processes" if config.get("processes", 1) > 1 else ""
+    print(f"Target: {config['target_rps']} req/s for {config['duration_s']}s "
+          f"(concurrency {config['concurrency']}{processes})")
+    print(f"Elapsed: {report['elapsed_s']}s, max dispatch lag: {report['max_dispatch_lag_ms']}ms")
+    if "workers" in report:
+        print(f"Per-process throughput (req/s): "
+              f"{[worker['throughput_rps'] for worker in report['workers']]}")
+
+    rows: List[tuple] = [("overall", report["overall"])]
+    rows += list(report["endpoints"].items())
+    print("\n" + "-"*70)
+    print(f"{'Endpoint':<12}{'Reqs':>7}{'RPS':>9}{'p50':>9}{'p90':>9}"
+          f"{'p99':>9}{'p99.9':>9}{'Err%':>7}")
+    print("-"*70)
+    for name, row in rows:
+        latency = row["latency"]
+        print(f"{name:<12}{row['requests']:>7}{row['throughput_rps']:>9.1f}"
+              f"{latency.get('p50_ms', 0):>9.1f}{latency.get('p90_ms', 0):>9.1f}"
+              f"{latency.get('p99_ms', 0):>9.1f}{latency.get('p99.9_ms', 0):>9.1f}"
+              f"{row['error_rate']*100:>7.1f}")
+    print("-"*70)
+    print("Latencies in ms, measured from scheduled send time")
+    print(f"{'Mean / p99':<12}" + "".join(f"{part:>16}" for part in LATENCY_PARTS))
+    for name, row in rows:
+        parts = row.get("latency_parts", {})
+        print(f"{name:<12}" + "".join(
+            f"{parts[part].get('mean_ms', 0):>8.1f}/{parts[part].get('p99_ms', 0):<7.1f}"
+            for part in LATENCY_PARTS if part in parts))
+
+    for name, row in rows[1:]:
+        print(f"\n{name} status codes: {row['status_counts']}")
+        if row["connection_errors"]:
+            print(f"{name} connection errors: {row['connection_errors']}")
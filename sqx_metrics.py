@@ -0,0 +1,201 @@
+"""
+SQX Live Metrics
+Request counters, in-flight gauges and latency histograms kept by the client
+while a run is in progress, and a small HTTP endpoint serving them in the
+Prometheus text exposition format so long soak and load runs can be
+watched and scraped live. Histograms use fixed cumulative buckets, as
+Prometheus expects, rather than the run's own LatencyHistogram.
+"""
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+
+# Upper bounds in seconds of the request duration histogram buckets
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def is_error(status: int) -> bool:
+    """Return True for responses counted as errors: transport failures, throttling, 5xx"""
+    return status == 0 or status == 429 or status >= 500
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(pairs: List[Tuple[str, Any]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Histogram:
+    """Cumulative-bucket histogram in seconds"""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(DURATION_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(DURATION_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class RequestMetrics:
+    """
+    Thread-safe live request metrics, by endpoint.
+
+    The client calls started() and finished() around every request. labels
+    are constant labels (run id, environment) added to every sample.
+    """
+
+    def __init__(self, labels: Optional[Dict[str, str]] = None):
+        self.labels = sorted((labels or {}).items())
+        self._lock = threading.Lock()
+        self._requests: Dict[Tuple[str, str, str], int] = {}
+        self._errors: Dict[str, int] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._durations: Dict[str, _Histogram] = {}
+        self._split: Dict[Tuple[str, str], float] = {}
+
+    def started(self, endpoint: str):
+        """Count a request going out"""
+        with self._lock:
+            self._in_flight[endpoint] = self._in_flight.get(endpoint, 0) + 1
+
+    def finished(self, endpoint: str, method: str, status: int, elapsed: float,
+                 split: Optional[Dict[str, float]] = None):
+        """Count a completed request with its duration and its phase -> seconds split, if any"""
+        with self._lock:
+            self._in_flight[endpoint] -= 1
+            key = (endpoint, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if is_error(status):
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+            histogram = self._durations.get(endpoint)
+            if histogram is None:
+                histogram = self._durations[endpoint] = _Histogram()
+            histogram.observe(elapsed)
+            for phase, seconds in (split or {}).items():
+                key = (endpoint, phase)
+                self._split[key] = self._split.get(key, 0.0) + seconds
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text format"""
+        with self._lock:
+            requests = dict(self._requests)
+            errors = dict(self._errors)
+            in_flight = dict(self._in_flight)
+            durations = {endpoint: (list(h.counts), h.sum, h.count)
+                         for endpoint, h in self._durations.items()}
+            split = dict(self._split)
+        lines: List[str] = []
+
+        def sample(name: str, pairs: List[Tuple[str, Any]], value: float):
+            lines.append(f"{name}{_labels(self.labels + pairs)} {_number(value)}")
+
+        lines += ["# HELP sqx_requests_total Requests completed, by endpoint, method and status "
+                  "(0 = no response)",
+                  "# TYPE sqx_requests_total counter"]
+        for (endpoint, method, status), count in sorted(requests.items()):
+            sample("sqx_requests_total",
+                   [("endpoint", endpoint), ("method", method), ("status", status)], count)
+
+        lines += ["# HELP sqx_request_errors_total Requests that failed: no response, 429 or 5xx",
+                  "# TYPE sqx_request_errors_total counter"]
+        totals: Dict[str, int] = {}
+        for (endpoint, _, _), count in requests.items():
+            totals[endpoint] = totals.get(endpoint, 0) + count
+        for endpoint in sorted(totals):
+            sample("sqx_request_errors_total", [("endpoint", endpoint)], errors.get(endpoint, 0))
+
+        lines += ["# HELP sqx_request_error_ratio Share of requests failed since the run started",
+                  "# TYPE sqx_request_error_ratio gauge"]
+        for endpoint, total in sorted(totals.items()):
+            sample("sqx_request_error_ratio", [("endpoint", endpoint)],
+                   round(errors.get(endpoint, 0) / total, 6))
+
+        lines += ["# HELP sqx_requests_in_flight Requests sent and not yet completed",
+                  "# TYPE sqx_requests_in_flight gauge"]
+        for endpoint, count in sorted(in_flight.items()):
+            sample("sqx_requests_in_flight", [("endpoint", endpoint)], count)
+
+        lines += ["# HELP sqx_request_duration_seconds Request duration as seen by the caller",
+                  "# TYPE sqx_request_duration_seconds histogram"]
+        for endpoint, (counts, total_s, count) in sorted(durations.items()):
+            cumulative = 0
+            for bound, bucket in zip(DURATION_BUCKETS, counts):
+                cumulative += bucket
+                sample("sqx_request_duration_seconds_bucket",
+                       [("endpoint", endpoint), ("le", _number(bound))], cumulative)
+            sample("sqx_request_duration_seconds_bucket", [("endpoint", endpoint), ("le", "+Inf")], count)
+            sample("sqx_request_duration_seconds_sum", [("endpoint", endpoint)], total_s)
+            sample("sqx_request_duration_seconds_count", [("endpoint", endpoint)], count)
+
+        lines += ["# HELP sqx_request_phase_seconds_total Time requests spent on the wire "
+                  "versus in the client",
+                  "# TYPE sqx_request_phase_seconds_total counter"]
+        for (endpoint, phase), total_s in sorted(split.items()):
+            sample("sqx_request_phase_seconds_total", [("endpoint", endpoint), ("phase", phase)],
+                   total_s)
+        return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves GET /metrics; the metrics live on self.server.metrics"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        data = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MetricsServer:
+    """Background HTTP server exposing RequestMetrics at /metrics"""
+
+    def __init__(self, metrics: RequestMetrics, port: int, host: str = "127.0.0.1"):
+        self.metrics = metrics
+        self._httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.metrics = metrics
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self) -> str:
+        """Serve in a background thread and return the metrics URL"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        name="sqx-metrics-server", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        """Stop serving and release the port"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
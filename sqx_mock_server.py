@@ -0,0 +1,539 @@
+"""
+SQX Mock Server
+Local stand-in for the SQX pricing API. Implements /price/byIsin,
+/price/byIsinHistorical and /price/byIsinBulk with the response shapes the
+test suite checks, enforces the API Gateway 401/403 API-key behavior, and
+can inject latency, errors and throttling so the harness can be exercised
+and benchmarked offline and reproducibly.
+
+Run standalone:
+    python sqx_mock_server.py --port 8080 --api-key test-key --latency lognormal:20,0.5
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+ISIN_FORMAT = re.compile(r"^[A-Z]{2}[A-Z0-9]{9}[0-9]$")
+DATE_FORMAT = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# Securities served by the default dataset: ISIN -> (name, currency, base price)
+DEFAULT_SECURITIES = {
+    "AED01656C257": ("Emirates Development Bond 2027", "AED", 101.25),
+    "AR0047526246": ("Argentina Treasury Bond 2028", "ARS", 87.40),
+    "US95040QAJ31": ("Welltower Inc 4.25% 2028", "USD", 97.80),
+    "US517834AF40": ("Las Vegas Sands 3.9% 2029", "USD", 93.15),
+    "US25389JAT34": ("Digital Realty Trust 3.6% 2029", "USD", 95.60),
+}
+
+# First date with prices in the default dataset
+DEFAULT_HISTORY_START = date(2021, 1, 4)
+
+
+# ============================================================================
+# DATASET
+# ============================================================================
+
+class MockDataset:
+    """
+    ISIN reference data and daily prices served by the mock.
+
+    Prices are stored per ISIN as a sorted list of (date, price). Requests
+    for a date without a price resolve to the closest earlier pricing date,
+    or the first available one when the date precedes the history.
+    When synthetic is set, every well-formed ISIN is treated as known and
+    priced deterministically, which allows bulk runs over large universes.
+    """
+
+    def __init__(self, securities: Dict[str, Dict[str, Any]] = None, synthetic: bool = False):
+        self.reference: Dict[str, Dict[str, Any]] = {}
+        self.dates: Dict[str, List[str]] = {}
+        self.prices: Dict[str, List[float]] = {}
+        self.synthetic = synthetic
+        for isin, entry in (securities or {}).items():
+            self.add(isin, entry.get("reference", {}), entry.get("prices", {}))
+
+    def add(self, isin: str, reference: Dict[str, Any], prices: Dict[str, float]):
+        """Add a security with its reference data and date -> price mapping"""
+        self.reference[isin] = {"isin": isin, **reference}
+        ordered = sorted(prices.items())
+        self.dates[isin] = [day for day, _ in ordered]
+        self.prices[isin] = [price for _, price in ordered]
+
+    @classmethod
+    def default(cls, synthetic: bool = False) -> "MockDataset":
+        """Build the dataset covering the ISINs used by the test suite"""
+        dataset = cls(synthetic=synthetic)
+        for isin, (name, currency, base) in DEFAULT_SECURITIES.items():
+            dataset.add(isin, {"name": name, "currency": currency},
+                        _generate_prices(isin, base, DEFAULT_HISTORY_START, date.today()))
+        return dataset
+
+    @classmethod
+    def from_file(cls, path: str, synthetic: bool = False) -> "MockDataset":
+        """
+        Load a dataset from JSON shaped as
+        {"ISIN": {"reference": {...}, "prices": {"YYYY-MM-DD": price}}}
+        """
+        with open(path) as f:
+            return cls(json.load(f), synthetic=synthetic)
+
+    def lookup(self, isin: str, requested: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return the {reference, pricing} record for an ISIN, or None if unknown"""
+        if isin not in self.reference:
+            if self.synthetic and ISIN_FORMAT.match(isin):
+                return _synthetic_record(isin, requested)
+            return None
+
+        dates = self.dates[isin]
+        prices = self.prices[isin]
+        if not dates:
+            return {"reference": self.reference[isin], "pricing": {"message": "No pricing available"}}
+        if requested is None:
+            index = len(dates) - 1
+        else:
+            index = max(bisect.bisect_right(dates, requested) - 1, 0)
+        return _record(self.reference[isin], prices[index], dates[index], requested)
+
+
+def _record(reference: Dict[str, Any], price: float, pricing_date: str,
+            requested: Optional[str]) -> Dict[str, Any]:
+    """Build a {reference, pricing} response record"""
+    pricing = {
+        "isin": reference["isin"],
+        "price": price,
+        "pricing_date": pricing_date,
+        "currency": reference.get("currency"),
+    }
+    if requested is not None and pricing_date != requested:
+        pricing["message"] = f"No price on {requested}; returned closest available date {pricing_date}"
+    return {"reference": reference, "pricing": pricing}
+
+
+def _synthetic_record(isin: str, requested: Optional[str]) -> Dict[str, Any]:
+    """Deterministic record for an ISIN outside the dataset, computed on demand"""
+    reference = {"isin": isin, "name": f"Synthetic Security {isin}", "currency": "USD"}
+    today = date.today()
+    if requested is None:
+        day = today
+    else:
+        day = min(max(date.fromisoformat(requested), DEFAULT_HISTORY_START), today)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    if day < DEFAULT_HISTORY_START:
+        day = DEFAULT_HISTORY_START
+    base = 50 + _stable_fraction(isin) * 100
+    price = round(base * (0.9 + _stable_fraction(isin + day.isoformat()) * 0.2), 4)
+    return _record(reference, price, day.isoformat(), requested)
+
+
+def _stable_fraction(text: str) -> float:
+    """Deterministic value in [0, 1) derived from text"""
+    return int(hashlib.md5(text.encode()).hexdigest()[:8], 16) / 0x100000000
+
+
+def _generate_prices(isin: str, base: float, start: date, end: date) -> Dict[str, float]:
+    """Deterministic weekday random walk of prices for an ISIN"""
+    rng = random.Random(isin)
+    prices = {}
+    price = base
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            price = max(price * (1 + rng.gauss(0, 0.004)), 1.0)
+            prices[day.isoformat()] = round(price, 4)
+        day += timedelta(days=1)
+    return prices
+
+
+# ============================================================================
+# FAULT INJECTION
+# ============================================================================
+
+class LatencyModel:
+    """
+    Response delay distribution, parsed from a spec string:
+        none                  no added delay
+        fixed:MS              constant delay
+        uniform:LOW,HIGH      uniform between LOW and HIGH ms
+        lognormal:MEDIAN,SIGMA
+        exponential:MEAN
+    """
+
+    def __init__(self, spec: str = "none"):
+        self.spec = spec
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(value) for value in args.split(",") if value]
+        expected = {"none": 0, "fixed": 1, "uniform": 2, "lognormal": 2, "exponential": 1}
+        if kind not in expected or len(self.args) != expected[kind]:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+
+    def sample(self, rng: random.Random) -> float:
+        """Return a delay in seconds"""
+        if self.kind == "fixed":
+            ms = self.args[0]
+        elif self.kind == "uniform":
+            ms = rng.uniform(self.args[0], self.args[1])
+        elif self.kind == "lognormal":
+            median, sigma = self.args
+            ms = median * rng.lognormvariate(0, sigma)
+        elif self.kind == "exponential":
+            ms = rng.expovariate(1 / self.args[0])
+        else:
+            ms = 0.0
+        return ms / 1000
+
+
+class FaultConfig:
+    """
+    Injected behavior applied to authenticated requests.
+
+    latency:          LatencyModel applied to every endpoint, or a dict of
+                      endpoint path -> LatencyModel ("*" as the fallback)
+    error_rate:       fraction of requests answered with 500
+    throttle_rps:     sustained request rate before answering 429 (0 = off)
+    throttle_burst:   token bucket size for throttling
+    max_batch:        bulk ISINs processed per request; the rest are returned
+                      in "unprocessed"
+    unprocessed_rate: fraction of bulk ISINs randomly returned unprocessed
+    seed:             random seed, for reproducible runs
+    """
+
+    def __init__(self, latency=None, error_rate: float = 0.0, throttle_rps: float = 0.0,
+                 throttle_burst: float = 10.0, max_batch: int = 100,
+                 unprocessed_rate: float = 0.0, seed: Optional[int] = None):
+        if latency is None:
+            latency = LatencyModel()
+        self.latency = latency if isinstance(latency, dict) else {"*": latency}
+        self.error_rate = error_rate
+        self.throttle_rps = throttle_rps
+        self.throttle_burst = throttle_burst
+        self.max_batch = max_batch
+        self.unprocessed_rate = unprocessed_rate
+        self.seed = seed
+
+
+class _ThrottleBucket:
+    """Token bucket deciding when the mock answers 429"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> Tuple[bool, float]:
+        """Consume a token; return (allowed, seconds until a token is available)"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True, 0.0
+            return False, (1 - self.tokens) / self.rate
+
+
+# ============================================================================
+# HTTP SERVER
+# ============================================================================
+
+class _MockHandler(BaseHTTPRequestHandler):
+    """Request handler; server state lives on self.server.mock"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.mock.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str):
+        mock: MockSQXServer = self.server.mock
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        route = next((path for path in ROUTES if url.path.endswith(path)), None)
+        if route is None:
+            status, payload, headers = 404, {"message": "Not Found"}, {}
+        elif ROUTES[route][0] != method:
+            status, payload, headers = 405, {"message": "Method Not Allowed"}, {}
+        else:
+            status, payload, headers = mock.handle(route, self.headers.get("x-api-key"),
+                                                   parse_qs(url.query), body)
+        mock.count(route or url.path, status)
+        self._send(status, payload, headers)
+
+    def _send(self, status: int, payload: Any, headers: Dict[str, str]):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockSQXServer:
+    """
+    In-process mock of the SQX API.
+
+    Use as a context manager or call start()/stop(). start() returns the base
+    URL to use in place of BASE_URL, including a /Dev stage prefix like the
+    real API Gateway deployment.
+    """
+
+    def __init__(self, api_key: str, dataset: MockDataset = None, faults: FaultConfig = None,
+                 host: str = "127.0.0.1", port: int = 0, stage: str = "/Dev",
+                 verbose: bool = False):
+        self.api_key = api_key
+        self.dataset = dataset or MockDataset.default()
+        self.faults = faults or FaultConfig()
+        self.stage = stage
+        self.verbose = verbose
+        self._rng = random.Random(self.faults.seed)
+        self._rng_lock = threading.Lock()
+        self._throttle = (_ThrottleBucket(self.faults.throttle_rps, self.faults.throttle_burst)
+                          if self.faults.throttle_rps > 0 else None)
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._counts_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _MockHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{self.stage}"
+
+    def start(self) -> str:
+        """Serve in a background thread and return the base URL"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        name="sqx-mock-server", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def serve_forever(self):
+        """Serve on the calling thread until interrupted"""
+        self._httpd.serve_forever()
+
+    def stop(self):
+        """Stop serving and release the port"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockSQXServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # Request handling
+    # ------------------------------------------------------------------
+
+    def _random(self) -> float:
+        with self._rng_lock:
+            return self._rng.random()
+
+    def _delay(self, route: str) -> float:
+        model = self.faults.latency.get(route, self.faults.latency.get("*"))
+        if model is None:
+            return 0.0
+        with self._rng_lock:
+            return model.sample(self._rng)
+
+    def count(self, route: str, status: int):
+        """Count a served request by route and status"""
+        with self._counts_lock:
+            by_status = self._counts.setdefault(route, {})
+            by_status[str(status)] = by_status.get(str(status), 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return request counts by route and status"""
+        with self._counts_lock:
+            return {route: dict(counts) for route, counts in self._counts.items()}
+
+    def handle(self, route: str, api_key: Optional[str], query: Dict[str, List[str]],
+               body: bytes) -> Tuple[int, Any, Dict[str, str]]:
+        """Apply auth and faults, then produce (status, payload, headers) for a route"""
+        if api_key is None:
+            return 401, {"message": "Unauthorized"}, {}
+        if api_key != self.api_key:
+            return 403, {"message": "Forbidden"}, {}
+
+        if self._throttle is not None:
+            allowed, wait = self._throttle.take()
+            if not allowed:
+                return 429, {"message": "Too Many Requests"}, {"Retry-After": str(max(1, round(wait)))}
+
+        delay = self._delay(route)
+        if delay > 0:
+            time.sleep(delay)
+        if self.faults.error_rate and self._random() < self.faults.error_rate:
+            return 500, {"message": "Internal server error"}, {}
+
+        handler = ROUTES[route][1]
+        status, payload = handler(self, query, body)
+        return status, payload, {}
+
+    def _single(self, query: Dict[str, List[str]], body: bytes) -> Tuple[int, Any]:
+        isin = query.get("isin", [""])[0]
+        if not isin:
+            return 400, {"message": "Missing required query parameter: isin"}
+        if not ISIN_FORMAT.match(isin):
+            return 400, {"message": f"Invalid ISIN format: {isin}"}
+        record = self.dataset.lookup(isin)
+        if record is None:
+            return 404, {"message": f"ISIN not found: {isin}"}
+        return 200, record
+
+    def _historical(self, query: Dict[str, List[str]], body: bytes) -> Tuple[int, Any]:
+        isin = query.get("isin", [""])[0]
+        requested = query.get("date", [""])[0]
+        if not isin:
+            return 400, {"message": "Missing required query parameter: isin"}
+        if not requested:
+            return 400, {"message": "Missing required query parameter: date"}
+        if not DATE_FORMAT.match(requested):
+            return 400, {"message": "Invalid date format, expected YYYY-MM-DD"}
+        try:
+            datetime.strptime(requested, "%Y-%m-%d")
+        except ValueError:
+            return 400, {"message": f"Invalid date: {requested}"}
+        if not ISIN_FORMAT.match(isin):
+            return 400, {"message": f"Invalid ISIN format: {isin}"}
+        record = self.dataset.lookup(isin, requested)
+        if record is None:
+            return 404, {"message": f"ISIN not found: {isin}"}
+        return 200, record
+
+    def _bulk(self, query: Dict[str, List[str]], body: bytes) -> Tuple[int, Any]:
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            return 400, {"message": "Request body must be valid JSON"}
+        if not isinstance(request, dict) or "isin_list" not in request:
+            return 400, {"message": "Missing required field: isin_list"}
+        isin_list = request["isin_list"]
+        if not isinstance(isin_list, list) or not all(isinstance(isin, str) for isin in isin_list):
+            return 400, {"message": "isin_list must be a list of strings"}
+
+        result = {"success": [], "not_found": [], "unprocessed": []}
+        for position, isin in enumerate(isin_list):
+            if position >= self.faults.max_batch or (
+                    self.faults.unprocessed_rate and self._random() < self.faults.unprocessed_rate):
+                result["unprocessed"].append(isin)
+                continue
+            record = self.dataset.lookup(isin) if ISIN_FORMAT.match(isin) else None
+            if record is None:
+                result["not_found"].append(isin)
+            else:
+                result["success"].append(record)
+        return 200, result
+
+
+# Route suffix -> (method, handler)
+ROUTES = {
+    "/price/byIsinHistorical": ("GET", MockSQXServer._historical),
+    "/price/byIsinBulk": ("POST", MockSQXServer._bulk),
+    "/price/byIsin": ("GET", MockSQXServer._single),
+}
+
+
+# ============================================================================
+# MAIN EXECUTION
+# ============================================================================
+
+def add_fault_arguments(parser: argparse.ArgumentParser, prefix: str = ""):
+    """Add the fault-injection options to a parser, optionally prefixed"""
+    parser.add_argument(f"--{prefix}latency", default="none",
+                        help="latency spec: none, fixed:MS, uniform:LOW,HIGH, "
+                             "lognormal:MEDIAN,SIGMA or exponential:MEAN")
+    parser.add_argument(f"--{prefix}error-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 500")
+    parser.add_argument(f"--{prefix}throttle-rps", type=float, default=0.0,
+                        help="requests/second before answering 429 (0 = unlimited)")
+    parser.add_argument(f"--{prefix}throttle-burst", type=float, default=10.0,
+                        help="burst size allowed before throttling")
+    parser.add_argument(f"--{prefix}max-batch", type=int, default=100,
+                        help="bulk ISINs processed per request before returning unprocessed")
+    parser.add_argument(f"--{prefix}unprocessed-rate", type=float, default=0.0,
+                        help="fraction of bulk ISINs randomly returned unprocessed")
+    parser.add_argument(f"--{prefix}seed", type=int, default=None,
+                        help="random seed for reproducible fault injection")
+
+
+def faults_from_args(args: argparse.Namespace, prefix: str = "") -> FaultConfig:
+    """Build a FaultConfig from options added by add_fault_arguments"""
+    prefix = prefix.replace("-", "_")
+
+    def option(name: str):
+        return getattr(args, prefix + name)
+
+    return FaultConfig(latency=LatencyModel(option("latency")),
+                       error_rate=option("error_rate"),
+                       throttle_rps=option("throttle_rps"),
+                       throttle_burst=option("throttle_burst"),
+                       max_batch=option("max_batch"),
+                       unprocessed_rate=option("unprocessed_rate"),
+                       seed=option("seed"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock of the SQX pricing API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--api-key", default="test-key",
+                        help="API key accepted by the server")
+    parser.add_argument("--dataset", default=None,
+                        help="JSON dataset file (defaults to the test suite's ISINs)")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="price every well-formed ISIN, for large bulk runs")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        faults = faults_from_args(args)
+    except ValueError as e:
+        parser.error(str(e))
+    dataset = (MockDataset.from_file(args.dataset, synthetic=args.synthetic) if args.dataset
+               else MockDataset.default(synthetic=args.synthetic))
+    server = MockSQXServer(args.api_key, dataset, faults, host=args.host, port=args.port,
+                           verbose=args.verbose)
+    print(f"SQX mock server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(json.dumps(server.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+SQX Harness Profiling
+Profiles the harness itself, one run phase at a time, to tell a slow API
+apart from a slow harness (result printing, report serialization, lock and
+pool contention). Two modes:
+
+  cprofile: deterministic profile of the thread running the phase, saved
+            as a pstats .prof file
+  sample:   wall-clock stack sampling of every thread, saved as folded
+            stacks (one "thread;frame;...;frame count" line per stack) that
+            flame graph tools read directly
+
+Threads serving the in-process mock server and metrics endpoint are left
+out of samples, so only the harness's own threads are profiled.
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+PROFILE_MODES = ("cprofile", "sample")
+
+# Stacks with a frame from one of these files belong to the HTTP servers
+SERVER_FILES = ("socketserver.py",)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _Sampler:
+    """Background thread recording the stacks of every other thread"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Dict[Tuple[str, ...], int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sqx-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack: List[str] = []
+                skip = False
+                while frame is not None:
+                    code = frame.f_code
+                    if code.co_filename.endswith(SERVER_FILES):
+                        skip = True
+                        break
+                    stack.append(_frame_label(code))
+                    frame = frame.f_back
+                if skip or not stack:
+                    continue
+                stack.append(names.get(ident, f"thread-{ident}"))
+                key = tuple(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+
+class PhaseProfiler:
+    """
+    Profiles named run phases when a mode is set; a no-op otherwise.
+
+    Each phase is written to output_dir as sqx_profile_<phase>.prof or
+    .folded and summarized by report() with its top functions.
+    """
+
+    def __init__(self, mode: Optional[str] = None, output_dir: str = ".",
+                 interval: float = 0.005, top: int = 15):
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.interval = interval
+        self.top = top
+        self.phases: List[Dict[str, Any]] = []
+
+    def _path(self, name: str, extension: str) -> str:
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+        return os.path.join(self.output_dir, f"sqx_profile_{safe}.{extension}")
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Profile the enclosed block as one phase"""
+        if self.mode is None:
+            yield
+            return
+        start = time.perf_counter()
+        if self.mode == "cprofile":
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                self.phases.append(self._cprofile_entry(name, profile, time.perf_counter() - start))
+        else:
+            sampler = _Sampler(self.interval)
+            sampler.start()
+            try:
+                yield
+            finally:
+                sampler.stop()
+                self.phases.append(self._sample_entry(name, sampler, time.perf_counter() - start))
+
+    def _cprofile_entry(self, name: str, profile: cProfile.Profile, wall: float) -> Dict[str, Any]:
+        path = self._path(name, "prof")
+        profile.dump_stats(path)
+        stats = pstats.Stats(profile).stats
+        rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:self.top]
+        return {
+            "phase": name,
+            "wall_s": round(wall, 3),
+            "output": path,
+            "functions": [{
+                "function": f"{function} ({os.path.basename(filename)}:{line})",
+                "calls": calls,
+                "self_s": round(own, 4),
+                "cumulative_s": round(cumulative, 4),
+            } for (filename, line, function), (_, calls, own, cumulative, _) in rows],
+        }
+
+    def _sample_entry(self, name: str, sampler: _Sampler, wall: float) -> Dict[str, Any]:
+        path = self._path(name, "folded")
+        with open(path, "w") as f:
+            for stack, count in sorted(sampler.stacks.items()):
+                f.write(f"{';'.join(stack)} {count}\n")
+        own: Dict[str, int] = {}
+        total: Dict[str, int] = {}
+        for stack, count in sampler.stacks.items():
+            own[stack[-1]] = own.get(stack[-1], 0) + count
+            for label in set(stack[1:]):
+                total[label] = total.get(label, 0) + count
+        samples = sum(sampler.stacks.values())
+        top = sorted(own.items(), key=lambda item: item[1], reverse=True)[:self.top]
+        return {
+            "phase": name,
+            "wall_s": round(wall, 3),
+            "output": path,
+            "ticks": sampler.samples,
+            "samples": samples,
+            "threads": len({stack[0] for stack in sampler.stacks}),
+            "functions": [{
+                "function": label,
+                "self_pct": round(count / samples * 100, 2),
+                "total_pct": round(total[label] / samples * 100, 2),
+            } for label, count in top],
+        }
+
+    def report(self) -> Optional[Dict[str, Any]]:
+        """Return every profiled phase, or None when profiling is off"""
+        if self.mode is None:
+            return None
+        return {"mode": self.mode, "phases": list(self.phases)}
+
+
+def print_profile_report(report: Dict[str, Any]):
+    """Print the top functions of each profiled phase"""
+    print("\n" + "="*70)
+    print(f"HARNESS PROFILE ({report['mode']})")
+    print("="*70)
+    for entry in report["phases"]:
+        print("\n" + "-"*70)
+        if report["mode"] == "cprofile":
+            print(f"{entry['phase']}: {entry['wall_s']}s wall, saved to {entry['output']}")
+            print("-"*70)
+            print(f"{'self s':>9}{'cum s':>9}{'calls':>9}  function")
+            for row in entry["functions"]:
+                print(f"{row['self_s']:>9.4f}{row['cumulative_s']:>9.4f}{row['calls']:>9}  {row['function']}")
+        else:
+            print(f"{entry['phase']}: {entry['wall_s']}s wall, {entry['samples']} samples from "
+                  f"{entry['threads']} threads, saved to {entry['output']}")
+            print("-"*70)
+            print(f"{'self %':>8}{'total %':>9}  function")
+            for row in entry["functions"]:
+                print(f"{row['self_pct']:>8.1f}{row['total_pct']:>9.1f}  {row['function']}")
@@ -0,0 +1,267 @@
+"""
+SQX Rate Limiting
+Client-side pacing shared by every thread using a client. Each endpoint
+draws from its own token bucket, the number of requests in flight is capped
+by an AIMD limit (additive increase on success, multiplicative decrease on
+throttling), and a Retry-After from the API pauses all sending until it has
+elapsed.
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+# Statuses that signal the API is shedding load
+THROTTLE_STATUSES = {429, 503, 504}
+
+# Longest Retry-After honored, so a bad header cannot stall a run
+MAX_RETRY_AFTER = 60.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Return a Retry-After header (delta-seconds or HTTP-date) in seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class TokenBucket:
+    """Token bucket refilled at rate tokens per second, holding at most burst"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = max(self._updated - now, 0.0) + (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+    def hold(self, until: float):
+        """Empty the bucket and stop refilling it until the given monotonic time"""
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = max(self._updated, until)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD cap on requests in flight.
+
+    The limit grows by 1/limit per successful request (about one per round
+    of requests) and is multiplied by decrease on throttling. Requests that
+    were already in flight when the limit last dropped saw the same
+    congestion, so their throttles do not shrink it again.
+    """
+
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 64,
+                 decrease: float = 0.5):
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.in_flight = 0
+        self.lowest = self.limit
+        self.decreases = 0
+        self._epoch = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> int:
+        """Wait for a free slot; return the epoch to pass back to release"""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            return self._epoch
+
+    def release(self, epoch: int, throttled: bool) -> bool:
+        """Free a slot and adjust the limit; return True if it was decreased"""
+        with self._cond:
+            self.in_flight -= 1
+            decreased = False
+            if not throttled:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            elif epoch == self._epoch:
+                self.limit = max(float(self.minimum), self.limit * self.decrease)
+                self.lowest = min(self.lowest, self.limit)
+                self.decreases += 1
+                self._epoch += 1
+                decreased = True
+            self._cond.notify_all()
+            return decreased
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the current, lowest and maximum limits"""
+        with self._cond:
+            return {
+                "limit": int(self.limit),
+                "lowest_limit": int(self.lowest),
+                "max_limit": self.maximum,
+                "decreases": self.decreases,
+                "in_flight": self.in_flight,
+            }
+
+
+class RateLimiter:
+    """
+    Per-endpoint token buckets plus optional adaptive concurrency.
+
+    rates:        endpoint path -> requests/second
+    default_rate: budget for endpoints not in rates (None = unlimited)
+    burst:        bucket size for every endpoint (default: one second's worth)
+    concurrency:  AdaptiveConcurrency shared by all endpoints, or None
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None,
+                 default_rate: Optional[float] = None, burst: Optional[float] = None,
+                 concurrency: Optional[AdaptiveConcurrency] = None, max_events: int = 100):
+        self.rates = dict(rates or {})
+        self.default_rate = default_rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.max_events = max_events
+        self._buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._lock = threading.Lock()
+        self._pause_until = 0.0
+        self._started = time.monotonic()
+        self.events: List[Dict[str, Any]] = []
+        self.throttles: Dict[str, int] = {}
+        self.retry_after_pauses = 0
+        self.paused_s = 0.0
+        self.waited_s = 0.0
+        self.permits = 0
+
+    def _bucket(self, endpoint: str) -> Optional[TokenBucket]:
+        with self._lock:
+            if endpoint not in self._buckets:
+                rate = self.rates.get(endpoint, self.default_rate)
+                self._buckets[endpoint] = TokenBucket(rate, self.burst) if rate else None
+            return self._buckets[endpoint]
+
+    def _wait_for_pause(self):
+        while True:
+            with self._lock:
+                remaining = self._pause_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def acquire(self, endpoint: str) -> Tuple[Optional[int], float]:
+        """
+        Block until a request to endpoint may be sent.
+
+        Returns (permit, seconds waited); pass the permit to release.
+        """
+        start = time.monotonic()
+        self._wait_for_pause()
+        bucket = self._bucket(endpoint)
+        if bucket is not None:
+            bucket.acquire()
+        permit = self.concurrency.acquire() if self.concurrency is not None else None
+        # A Retry-After may have arrived while this request was queued
+        self._wait_for_pause()
+        waited = time.monotonic() - start
+        with self._lock:
+            self.permits += 1
+            self.waited_s += waited
+        return permit, waited
+
+    def release(self, permit: Optional[int], endpoint: str, status: int,
+                retry_after: Optional[float] = None, timed_out: bool = False):
+        """Report a request's outcome, adjusting concurrency and pausing as told"""
+        cause = "timeout" if timed_out else (str(status) if status in THROTTLE_STATUSES else None)
+        decreased = False
+        if self.concurrency is not None:
+            decreased = self.concurrency.release(permit, cause is not None)
+        if cause is None:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            self.throttles[cause] = self.throttles.get(cause, 0) + 1
+            if retry_after:
+                until = now + retry_after
+                if until > self._pause_until:
+                    self.paused_s += until - max(self._pause_until, now)
+                    self._pause_until = until
+                    self.retry_after_pauses += 1
+                    # Resume at the budgeted rate rather than with a burst
+                    for bucket in self._buckets.values():
+                        if bucket is not None:
+                            bucket.hold(until)
+            if len(self.events) < self.max_events:
+                self.events.append({
+                    "t_s": round(now - self._started, 3),
+                    "endpoint": endpoint,
+                    "cause": cause,
+                    "retry_after_s": retry_after,
+                    "concurrency_limit": int(self.concurrency.limit) if self.concurrency else None,
+                    "decreased": decreased,
+                })
+
+    def stats(self) -> Dict[str, Any]:
+        """Return limits, throttle counts and time spent waiting"""
+        with self._lock:
+            rates = {endpoint: (bucket.rate if bucket else None)
+                     for endpoint, bucket in sorted(self._buckets.items())}
+            return {
+                "default_rate": self.default_rate,
+                "endpoint_rates": {**self.rates, **rates},
+                "concurrency": self.concurrency.stats() if self.concurrency else None,
+                "throttle_events": sum(self.throttles.values()),
+                "throttles_by_cause": dict(sorted(self.throttles.items())),
+                "retry_after_pauses": self.retry_after_pauses,
+                "paused_s": round(self.paused_s, 3),
+                "permits": self.permits,
+                "mean_wait_ms": round(self.waited_s / self.permits * 1000, 3) if self.permits else 0.0,
+                "events": list(self.events),
+            }
+
+
+def print_limiter_report(stats: Dict[str, Any]):
+    """Print rate limiter state and throttle events"""
+    print("\n" + "-"*70)
+    print("Client rate limiting")
+    print("-"*70)
+    rates = {endpoint: rate for endpoint, rate in stats["endpoint_rates"].items() if rate}
+    if rates:
+        print(f"Endpoint budgets (req/s): {rates}")
+    concurrency = stats["concurrency"]
+    if concurrency:
+        print(f"Concurrency limit: {concurrency['limit']} now, lowest {concurrency['lowest_limit']}, "
+              f"max {concurrency['max_limit']} ({concurrency['decreases']} decreases)")
+    causes = f" {stats['throttles_by_cause']}" if stats["throttles_by_cause"] else ""
+    print(f"Throttle events: {stats['throttle_events']}{causes}")
+    print(f"Retry-After pauses: {stats['retry_after_pauses']} ({stats['paused_s']}s paused)")
+    print(f"Mean limiter wait: {stats['mean_wait_ms']}ms over {stats['permits']} requests")
+    for event in stats["events"][:10]:
+        limit = event["concurrency_limit"]
+        print(f"  +{event['t_s']:.3f}s {event['endpoint']} {event['cause']}"
+              + (f", retry after {event['retry_after_s']}s" if event["retry_after_s"] else "")
+              + (f", limit -> {limit}" if event["decreased"] else ""))
@@ -0,0 +1,162 @@
+"""
+SQX Result Streaming
+Streams test results to a JSONL file as they are produced and keeps only
+running aggregates in memory: status counters, per-endpoint status counts
+and timing histograms, and a bounded sample of failures. A crash loses at
+most the record being written, and a summary can be rebuilt from the file
+at any time without loading the whole run.
+"""
+
+import json
+import threading
+from typing import Dict, Any, IO, Iterator, List, Optional
+
+from sqx_client import EndpointTimings
+from sqx_codec import JsonCodec, DEFAULT_CODEC
+
+# Payload retention policies for response_data
+RETAIN_ALL = "all"
+RETAIN_FAILURES = "failures"
+RETAIN_NONE = "none"
+RETAIN_POLICIES = (RETAIN_ALL, RETAIN_FAILURES, RETAIN_NONE)
+
+
+class ResultAggregator:
+    """
+    Constant-memory running summary of test results.
+
+    Only the first max_failures failing results are kept for the report;
+    everything else is folded into counters and histograms.
+    """
+
+    def __init__(self, max_failures: int = 50):
+        self.max_failures = max_failures
+        self.total = 0
+        self.passed = 0
+        self.failed = 0
+        self.errors = 0
+        self.endpoint_statuses: Dict[str, Dict[str, int]] = {}
+        self.timings = EndpointTimings()
+        self.failures: List[Dict[str, Any]] = []
+
+    def add(self, result: Dict[str, Any]):
+        """Fold one result record into the aggregates"""
+        status = result["status"]
+        self.total += 1
+        if status == "PASS":
+            self.passed += 1
+        elif status == "FAIL":
+            self.failed += 1
+        else:
+            self.errors += 1
+
+        statuses = self.endpoint_statuses.setdefault(result["endpoint"], {})
+        statuses[status] = statuses.get(status, 0) + 1
+        if "timing" in result:
+            self.timings.add(result["endpoint"], result["timing"])
+        if status != "PASS" and len(self.failures) < self.max_failures:
+            self.failures.append(result)
+
+    def summary(self) -> Dict[str, Any]:
+        """Return counters, per-endpoint statuses and timing summaries"""
+        return {
+            "total": self.total,
+            "passed": self.passed,
+            "failed": self.failed,
+            "errors": self.errors,
+            "endpoints": self.endpoint_statuses,
+            "timings": self.timings.summary(),
+        }
+
+
+def apply_retention(result: Dict[str, Any], policy: str = RETAIN_ALL,
+                    max_payload_bytes: Optional[int] = None,
+                    codec: JsonCodec = DEFAULT_CODEC) -> Dict[str, Any]:
+    """
+    Return result with response_data dropped or truncated per the policy.
+
+    Truncated payloads are replaced by their serialized size and a prefix
+    of the serialized text.
+    """
+    payload = result.get("response_data")
+    if payload is None:
+        return result
+    if policy == RETAIN_NONE or (policy == RETAIN_FAILURES and result["status"] == "PASS"):
+        return {**result, "response_data": None}
+    if max_payload_bytes is not None:
+        text = codec.dumps(payload)
+        if len(text) > max_payload_bytes:
+            return {**result, "response_data": {"truncated": True, "bytes": len(text),
+                                                "preview": text[:max_payload_bytes]}}
+    return result
+
+
+class ResultSink:
+    """
+    Appends each result to a JSONL file and updates running aggregates.
+
+    path:              JSONL output file (None to aggregate without writing)
+    retain_payloads:   "all", "failures" or "none" - which response_data to keep
+    max_payload_bytes: truncate retained payloads beyond this serialized size
+    codec:             JsonCodec used to serialize records
+    """
+
+    def __init__(self, path: Optional[str] = "test_results.jsonl",
+                 retain_payloads: str = RETAIN_ALL, max_payload_bytes: Optional[int] = None,
+                 max_failures: int = 50, codec: JsonCodec = DEFAULT_CODEC):
+        if retain_payloads not in RETAIN_POLICIES:
+            raise ValueError(f"Unknown payload retention policy: {retain_payloads}")
+        self.path = path
+        self.retain_payloads = retain_payloads
+        self.max_payload_bytes = max_payload_bytes
+        self.codec = codec
+        self.aggregator = ResultAggregator(max_failures)
+        self._lock = threading.Lock()
+        self._file: Optional[IO[str]] = open(path, "w") if path else None
+
+    def write(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Stream one result and return it with the retention policy applied"""
+        result = apply_retention(result, self.retain_payloads, self.max_payload_bytes, self.codec)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(self.codec.dumps(result, default=str) + "\n")
+                self._file.flush()
+            self.aggregator.add(result)
+        return result
+
+    def close(self):
+        """Close the output file"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield result records from a JSONL file one at a time.
+
+    A final line cut short by a crash mid-write is skipped.
+    """
+    truncated = None
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if truncated is not None:
+                raise truncated
+            try:
+                record = DEFAULT_CODEC.loads(line)
+            except json.JSONDecodeError as e:
+                truncated = e
+                continue
+            yield record
+
+
+def summarize_jsonl(path: str, max_failures: int = 50) -> ResultAggregator:
+    """Rebuild the run aggregates from a JSONL results file in constant memory"""
+    aggregator = ResultAggregator(max_failures)
+    for result in iter_jsonl(path):
+        aggregator.add(result)
+    return aggregator
@@ -0,0 +1,152 @@
+"""
+SQX Retry and Hedging Policies
+Retries idempotent requests that fail transiently, with exponential backoff
+and full jitter, and hedges slow GETs: once a request has been outstanding
+longer than the endpoint's observed p95, a duplicate is sent and whichever
+answers first is used.
+"""
+
+import random
+import threading
+from typing import Dict, Any, Iterable, Optional
+
+from sqx_histogram import LatencyHistogram
+
+# Statuses worth another attempt: throttling, gateway errors and timeouts
+DEFAULT_RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+# Transport failures (status 0) worth another attempt, by error kind
+ERROR_TIMEOUT = "timeout"
+ERROR_CONNECTION = "connection"
+ERROR_OTHER = "other"
+DEFAULT_RETRY_ERRORS = frozenset({ERROR_TIMEOUT, ERROR_CONNECTION})
+
+# Methods that are safe to send more than once
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before retrying a request.
+
+    max_attempts:   total attempts per call, including the first
+    backoff_base:   delay cap for the first retry, doubling per retry
+    backoff_max:    upper bound on any single backoff delay
+    retry_after_max: longest Retry-After honored; a server asking for a
+                    longer wait makes the call give up instead
+    retry_statuses: HTTP statuses that are retried
+    retry_errors:   transport error kinds ("timeout", "connection") retried
+    methods:        methods retried; only idempotent methods are allowed
+    """
+
+    def __init__(self, max_attempts: int = 3, backoff_base: float = 0.2,
+                 backoff_max: float = 5.0, retry_after_max: float = 60.0,
+                 retry_statuses: Iterable[int] = DEFAULT_RETRY_STATUSES,
+                 retry_errors: Iterable[str] = DEFAULT_RETRY_ERRORS,
+                 methods: Iterable[str] = ("GET",)):
+        methods = frozenset(method.upper() for method in methods)
+        if not methods <= IDEMPOTENT_METHODS:
+            raise ValueError(f"Refusing to retry non-idempotent methods: "
+                             f"{', '.join(sorted(methods - IDEMPOTENT_METHODS))}")
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_errors = frozenset(retry_errors)
+        self.methods = methods
+
+    def applies_to(self, method: str) -> bool:
+        """Return True if calls with this method may be retried"""
+        return method in self.methods and self.max_attempts > 1
+
+    def should_retry(self, status: int, error_kind: Optional[str]) -> bool:
+        """Return True if an attempt ending this way is worth repeating"""
+        if status == 0:
+            return error_kind in self.retry_errors
+        return status in self.retry_statuses
+
+    def delay(self, retry: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Seconds to wait before retry number retry (0 for the first retry),
+        or None to give up.
+
+        Full jitter: uniform between 0 and the exponential cap, so clients
+        retrying together spread out instead of arriving in waves. A
+        Retry-After from the server is honored in full as a lower bound, up
+        to retry_after_max; retrying sooner would only spend attempts on
+        more throttled responses, so a longer one gives up.
+        """
+        if retry_after is not None and retry_after > self.retry_after_max:
+            return None
+        cap = min(self.backoff_max, self.backoff_base * 2 ** retry)
+        delay = random.uniform(0, cap)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class HedgePolicy:
+    """
+    Tracks per-endpoint latency and decides when to send a hedge.
+
+    A hedge is sent once a request has been outstanding for the endpoint's
+    percentile latency, and only after min_samples responses have been
+    observed so the percentile means something.
+    """
+
+    def __init__(self, percentile: float = 95.0, min_samples: int = 20,
+                 min_delay: float = 0.01, methods: Iterable[str] = ("GET",)):
+        methods = frozenset(method.upper() for method in methods)
+        if not methods <= IDEMPOTENT_METHODS:
+            raise ValueError(f"Refusing to hedge non-idempotent methods: "
+                             f"{', '.join(sorted(methods - IDEMPOTENT_METHODS))}")
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.methods = methods
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint: str, seconds: float):
+        """Record the latency of a completed attempt"""
+        with self._lock:
+            histogram = self._histograms.get(endpoint)
+            if histogram is None:
+                histogram = self._histograms[endpoint] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def delay(self, method: str, endpoint: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None if this call is not hedged"""
+        if method not in self.methods:
+            return None
+        with self._lock:
+            histogram = self._histograms.get(endpoint)
+            if histogram is None or histogram.total_count < self.min_samples:
+                return None
+            return max(histogram.percentile_us(self.percentile) / 1e6, self.min_delay)
+
+    def thresholds_ms(self) -> Dict[str, Optional[float]]:
+        """Return the current hedge delay per endpoint (None until enough samples)"""
+        with self._lock:
+            return {endpoint: (round(max(histogram.percentile_us(self.percentile) / 1e6,
+                                         self.min_delay) * 1000, 3)
+                               if histogram.total_count >= self.min_samples else None)
+                    for endpoint, histogram in self._histograms.items()}
+
+
+def print_retry_report(stats: Dict[str, Any]):
+    """Print retry and hedge counters"""
+    print("\n" + "-"*70)
+    print("Retries and hedging")
+    print("-"*70)
+    print(f"Calls: {stats['calls']}, attempts: {stats['attempts']}")
+    print(f"Retries: {stats['retries']} over {stats['retried_calls']} calls "
+          f"({stats['recovered']} recovered, {stats['exhausted']} gave up)")
+    if stats["hedge_thresholds_ms"] is not None:
+        print(f"Hedges sent: {stats['hedges']}, won: {stats['hedges_won']}")
+        print(f"Tail latency removed by hedges: {stats['hedge_saved_ms']}ms total "
+              f"({stats['hedge_saved_pending']} losers still outstanding)")
+        print(f"Hedge thresholds (ms): {stats['hedge_thresholds_ms']}")
@@ -0,0 +1,232 @@
+"""
+SQX Response Schemas
+Declarative schemas for the three price endpoints, compiled once into
+nested closures. A compiled check allocates nothing for a valid value and
+only builds error paths on the way back up from a failure, so validating
+every record of a large bulk response stays cheap. Validators count the
+thread CPU time they spend.
+"""
+
+import threading
+import time
+from typing import Dict, Any, Callable, FrozenSet, List, Optional, Tuple
+
+# Schema "type" -> accepted Python types (None accepts anything). Types are
+# matched exactly, as decoders only produce these, which also keeps bool out
+# of number.
+_TYPES: Dict[str, Optional[FrozenSet[type]]] = {
+    "object": frozenset({dict}),
+    "array": frozenset({list}),
+    "string": frozenset({str}),
+    "number": frozenset({int, float}),
+    "boolean": frozenset({bool}),
+    "any": None,
+}
+
+# A compiled check returns None when valid, else (path, message) pairs
+# with paths relative to the checked value
+Check = Callable[[Any], Optional[List[Tuple[str, str]]]]
+
+# (accepted types or None, schema type name, check for nested fields or None)
+_Field = Tuple[Optional[FrozenSet[type]], str, Optional[Check]]
+
+
+def _type_name(value: Any) -> str:
+    if value is None:
+        return "null"
+    for name, types in _TYPES.items():
+        if types is not None and type(value) in types:
+            return name
+    return type(value).__name__
+
+
+def _compile_field(schema: Dict[str, Any], max_errors: int) -> _Field:
+    """Split a schema into a type test done inline by the parent and a nested check"""
+    kind = schema.get("type", "any")
+    if kind not in _TYPES:
+        raise ValueError(f"Unknown schema type: {kind}")
+    accepted = _TYPES[kind]
+    if accepted is not None and schema.get("nullable", False):
+        accepted = accepted | {type(None)}
+    nested = None
+    if "required" in schema or "optional" in schema or "items" in schema:
+        nested = _compile_nested(schema, max_errors)
+    return accepted, kind, nested
+
+
+def _compile_nested(schema: Dict[str, Any], max_errors: int) -> Check:
+    """Compile the field and element checks of an already type-checked value"""
+    required = [(name, *_compile_field(sub, max_errors))
+                for name, sub in schema.get("required", {}).items()]
+    optional = [(name, *_compile_field(sub, max_errors))
+                for name, sub in schema.get("optional", {}).items()]
+    items = _compile_field(schema["items"], max_errors) if "items" in schema else None
+
+    def check(value: Any) -> Optional[List[Tuple[str, str]]]:
+        if value is None:
+            return None
+        errors = None
+        for name, accepted, kind, nested in required:
+            if name not in value:
+                errors = (errors or []) + [(f".{name}", "missing")]
+                continue
+            field = value[name]
+            if accepted is not None and type(field) not in accepted:
+                errors = (errors or []) + [(f".{name}", f"expected {kind}, got {_type_name(field)}")]
+            elif nested is not None:
+                failed = nested(field)
+                if failed:
+                    errors = (errors or []) + [(f".{name}{path}", message) for path, message in failed]
+        for name, accepted, kind, nested in optional:
+            if name not in value:
+                continue
+            field = value[name]
+            if accepted is not None and type(field) not in accepted:
+                errors = (errors or []) + [(f".{name}", f"expected {kind}, got {_type_name(field)}")]
+            elif nested is not None:
+                failed = nested(field)
+                if failed:
+                    errors = (errors or []) + [(f".{name}{path}", message) for path, message in failed]
+        if items is not None:
+            accepted, kind, nested = items
+            failures = 0
+            for index, item in enumerate(value):
+                if accepted is not None and type(item) not in accepted:
+                    failed = [("", f"expected {kind}, got {_type_name(item)}")]
+                elif nested is not None:
+                    failed = nested(item)
+                    if not failed:
+                        continue
+                else:
+                    continue
+                errors = (errors or []) + [(f"[{index}]{path}", message) for path, message in failed]
+                failures += 1
+                if failures >= max_errors:
+                    break
+        return errors
+
+    return check
+
+
+def compile_schema(schema: Dict[str, Any], max_errors: int = 10) -> Check:
+    """
+    Compile a schema into a check function.
+
+    Schema keys:
+      type:     object, array, string, number, boolean or any (default any)
+      nullable: accept None as well
+      required: object fields that must be present, name -> schema
+      optional: object fields checked only when present, name -> schema
+      items:    schema every array element must match
+
+    Leaf fields are type-tested inline by their parent rather than through
+    a call of their own. Array checks stop after max_errors failing elements.
+    """
+    accepted, kind, nested = _compile_field(schema, max_errors)
+
+    def check(value: Any) -> Optional[List[Tuple[str, str]]]:
+        if accepted is not None and type(value) not in accepted:
+            return [("", f"expected {kind}, got {_type_name(value)}")]
+        return nested(value) if nested is not None else None
+
+    return check
+
+
+class Validator:
+    """
+    A compiled schema with usage counters.
+
+    Calling it returns a list of "path: message" errors, empty when the
+    value is valid. Thread-safe; CPU time is measured per calling thread.
+    """
+
+    def __init__(self, name: str, schema: Dict[str, Any], max_errors: int = 10):
+        self.name = name
+        self.max_errors = max_errors
+        self._check = compile_schema(schema, max_errors)
+        self._lock = threading.Lock()
+        self.validations = 0
+        self.failures = 0
+        self.cpu_s = 0.0
+
+    def __call__(self, value: Any) -> List[str]:
+        start = time.thread_time()
+        failed = self._check(value)
+        elapsed = time.thread_time() - start
+        with self._lock:
+            self.validations += 1
+            self.cpu_s += elapsed
+            if failed:
+                self.failures += 1
+        if not failed:
+            return []
+        return [f"${path}: {message}" for path, message in failed[:self.max_errors]]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return validation counts and CPU time spent"""
+        with self._lock:
+            return {
+                "validations": self.validations,
+                "failures": self.failures,
+                "cpu_ms": round(self.cpu_s * 1000, 3),
+                "mean_us": round(self.cpu_s / self.validations * 1e6, 3) if self.validations else 0.0,
+            }
+
+
+# ============================================================================
+# ENDPOINT SCHEMAS
+# ============================================================================
+
+# {reference, pricing} record returned by the single and historical endpoints
+# and by each element of the bulk success array. pricing may hold only a
+# message when no price is available.
+PRICE_RECORD_SCHEMA = {
+    "type": "object",
+    "required": {
+        "reference": {"type": "object", "required": {"isin": {"type": "string"}}},
+        "pricing": {
+            "type": "object",
+            "optional": {
+                "isin": {"type": "string"},
+                "price": {"type": "number", "nullable": True},
+                "pricing_date": {"type": "string"},
+                "currency": {"type": "string", "nullable": True},
+                "message": {"type": "string"},
+            },
+        },
+    },
+}
+
+BULK_RESPONSE_SCHEMA = {
+    "type": "object",
+    "required": {
+        "success": {"type": "array", "items": PRICE_RECORD_SCHEMA},
+        "not_found": {"type": "array", "items": {"type": "string"}},
+        "unprocessed": {"type": "array", "items": {"type": "string"}},
+    },
+}
+
+SINGLE_PRICE_VALIDATOR = Validator("/price/byIsin", PRICE_RECORD_SCHEMA)
+HISTORICAL_PRICE_VALIDATOR = Validator("/price/byIsinHistorical", PRICE_RECORD_SCHEMA)
+BULK_PRICES_VALIDATOR = Validator("/price/byIsinBulk", BULK_RESPONSE_SCHEMA)
+
+VALIDATORS = {validator.name: validator for validator in
+              (SINGLE_PRICE_VALIDATOR, HISTORICAL_PRICE_VALIDATOR, BULK_PRICES_VALIDATOR)}
+
+
+def validation_stats() -> Dict[str, Dict[str, Any]]:
+    """Return stats for every endpoint validator"""
+    return {name: validator.stats() for name, validator in VALIDATORS.items()}
+
+
+def print_codec_report(decode: Dict[str, Any], validation: Dict[str, Dict[str, Any]]):
+    """Print JSON decode and schema validation CPU time"""
+    print("\n" + "-"*70)
+    print("JSON decode and validation")
+    print("-"*70)
+    print(f"Decoder: {decode['codec']}, {decode['responses']} responses, "
+          f"{decode['bytes']} bytes, {decode['cpu_ms']}ms CPU ({decode['mean_us']}us mean)")
+    for name, stats in validation.items():
+        if stats["validations"]:
+            print(f"  {name}: {stats['validations']} validated, {stats['failures']} invalid, "
+                  f"{stats['cpu_ms']}ms CPU ({stats['mean_us']}us mean)")
@@ -0,0 +1,231 @@
+"""
+SQX Process Pool
+Runs the load and bulk drivers across worker processes so sending requests
+and decoding responses are not serialized on a single interpreter's GIL.
+Each worker builds its own client, and so its own sessions and connection
+pools, from a picklable factory and takes an even share of the target rate
+or ISIN set. Workers report cumulative snapshots over a queue; the
+coordinator merges the latest snapshot of every worker, so merged
+histograms and counters are exact during the run as well as at the end.
+"""
+
+import multiprocessing
+import os
+import queue
+import shutil
+from typing import Dict, Any, Callable, List, Optional
+
+from sqx_bulk import BulkFetcher, BatchController, read_isins, merge_bulk_reports
+from sqx_client import SQXClient
+from sqx_coalesce import merge_coalesce_stats
+from sqx_isin import IsinFilter, merge_validation_reports
+from sqx_load import run_load, merge_load_reports
+
+# Seconds between coordinator checks for workers that died without reporting
+_POLL_INTERVAL = 1.0
+
+
+def part_path(path: str, index: int) -> str:
+    """Return the per-worker file a worker writes in place of path"""
+    return f"{path}.part{index}"
+
+
+def _concatenate(parts: List[str], path: str):
+    """Join worker part files into path in worker order, removing the parts"""
+    with open(path, "wb") as out:
+        for part in parts:
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out)
+            os.remove(part)
+
+
+def _run_worker(index: int, results: "multiprocessing.Queue", barrier, work: Callable, *args):
+    """Process entry point: run work, forwarding snapshots and the result"""
+    try:
+        report = work(index, barrier, lambda snapshot: results.put(("snapshot", index, snapshot)),
+                      *args)
+        results.put(("final", index, report))
+    except BaseException as e:
+        results.put(("error", index, f"{type(e).__name__}: {e}"))
+        raise
+
+
+def _coordinate(processes: int, work: Callable, args: tuple,
+                merge: Callable[[List[Dict[str, Any]]], Dict[str, Any]],
+                on_progress: Optional[Callable[[Dict[str, Any]], None]]) -> List[Dict[str, Any]]:
+    """Start the workers, relay merged progress and return their final reports"""
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    barrier = context.Barrier(processes)
+    workers = [context.Process(target=_run_worker, args=(index, results, barrier, work, *args),
+                               name=f"sqx-worker-{index}", daemon=True)
+               for index in range(processes)]
+    for worker in workers:
+        worker.start()
+
+    latest: Dict[int, Dict[str, Any]] = {}
+    finals: Dict[int, Dict[str, Any]] = {}
+    # Snapshots received per worker; progress is reported once every worker
+    # has sent the next one, so the merged view lines up in time
+    rounds = [0] * processes
+    reported = 0
+    try:
+        while len(finals) < processes:
+            try:
+                kind, index, payload = results.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                for index, worker in enumerate(workers):
+                    if index not in finals and worker.exitcode not in (None, 0):
+                        raise RuntimeError(f"Worker {index} exited with status {worker.exitcode}")
+                continue
+            if kind == "error":
+                raise RuntimeError(f"Worker {index} failed: {payload}")
+            latest[index] = payload
+            if kind == "final":
+                finals[index] = payload
+                continue
+            rounds[index] += 1
+            if on_progress is not None and min(rounds) > reported:
+                reported = min(rounds)
+                on_progress(merge([latest[i] for i in range(processes)]))
+    finally:
+        for worker in workers:
+            if worker.is_alive() and len(finals) < processes:
+                worker.terminate()
+            worker.join()
+    return [finals[index] for index in range(processes)]
+
+
+# ============================================================================
+# LOAD
+# ============================================================================
+
+def split_concurrency(concurrency: int, processes: int) -> List[int]:
+    """Split a concurrency limit exactly: the first concurrency % processes workers get one more"""
+    share, extra = divmod(concurrency, processes)
+    return [share + (1 if index < extra else 0) for index in range(processes)]
+
+
+def _load_work(index: int, barrier, on_snapshot: Callable, processes: int,
+               client_factory: Callable[[], SQXClient], targets: Dict[str, Dict[str, Any]],
+               rps: float, duration: float, concurrency: List[int],
+               snapshot_interval: float) -> Dict[str, Any]:
+    client = client_factory()
+    try:
+        # Rotate the round-robin start so workers cover the targets evenly,
+        # and offset each schedule so the combined sends stay evenly spaced
+        names = list(targets)
+        shift = index % len(names)
+        rotated = {name: targets[name] for name in names[shift:] + names[:shift]}
+        barrier.wait()
+        report = run_load(client, rotated, rps=rps / processes, duration=duration,
+                          concurrency=concurrency[index], start_offset=index / rps,
+                          snapshot_interval=snapshot_interval, on_snapshot=on_snapshot)
+        report["endpoints"] = {name: report["endpoints"][name] for name in names}
+        report["config"]["endpoints"] = names
+        coalesce_stats = client.coalesce_stats()
+        if coalesce_stats is not None:
+            report["coalesce"] = coalesce_stats
+        return report
+    finally:
+        client.close()
+
+
+def run_load_processes(client_factory: Callable[[], SQXClient],
+                       targets: Dict[str, Dict[str, Any]], rps: float, duration: float,
+                       concurrency: int, processes: int, snapshot_interval: float = 5.0,
+                       on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Run the open-loop load generator across processes.
+
+    Each worker sends rps / processes requests per second with its share of
+    concurrency, which must be at least processes; the shares add up to
+    concurrency exactly. Returns the merged report, shaped like run_load's
+    plus a per-worker breakdown.
+    """
+    if concurrency < processes:
+        raise ValueError("concurrency must be at least the number of processes")
+    shares = split_concurrency(concurrency, processes)
+    reports = _coordinate(processes, _load_work,
+                          (processes, client_factory, targets, rps, duration, shares,
+                           snapshot_interval),
+                          merge_load_reports, on_progress)
+    report = merge_load_reports(reports)
+    if all("coalesce" in part for part in reports):
+        report["coalesce"] = merge_coalesce_stats([part["coalesce"] for part in reports])
+    return report
+
+
+# ============================================================================
+# BULK
+# ============================================================================
+
+def _bulk_work(index: int, barrier, on_snapshot: Callable, processes: int,
+               client_factory: Callable[[], SQXClient], isin_path: str, output_path: str,
+               controller_options: Dict[str, Any], fetcher_options: Dict[str, Any], validate: bool,
+               rejects_path: Optional[str], snapshot_interval: float) -> Dict[str, Any]:
+    client = client_factory()
+    try:
+        # Deal lines round-robin so every worker gets an even share without
+        # the coordinator reading the universe first
+        isins = (isin for position, isin in enumerate(read_isins(isin_path))
+                 if position % processes == index)
+        isin_filter = None
+        if validate:
+            isin_filter = IsinFilter(rejects_path=part_path(rejects_path, index) if rejects_path else None)
+            isins = isin_filter.filter(isins)
+        fetcher = BulkFetcher(client, part_path(output_path, index),
+                              BatchController(**controller_options), **fetcher_options,
+                              snapshot_interval=snapshot_interval, on_snapshot=on_snapshot)
+        barrier.wait()
+        report = fetcher.run(isins)
+        if isin_filter is not None:
+            report["isin_validation"] = isin_filter.report()
+        return report
+    finally:
+        client.close()
+
+
+def run_bulk_processes(client_factory: Callable[[], SQXClient], isin_path: str,
+                       output_path: str, controller_options: Dict[str, Any], processes: int,
+                       validate: bool = True, rejects_path: Optional[str] = None,
+                       snapshot_interval: float = 5.0,
+                       fetcher_options: Optional[Dict[str, Any]] = None,
+                       on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Price an ISIN file with one BulkFetcher per process.
+
+    Worker i takes every processes-th ISIN starting at line i, with its own
+    BatchController built from controller_options and BulkFetcher keyword
+    arguments from fetcher_options. Worker outputs (and
+    rejects) are concatenated into output_path (and rejects_path) at the end.
+    Returns the merged report, with the merged ISIN validation report under
+    "isin_validation" when validate is set.
+    """
+    reports = _coordinate(processes, _bulk_work,
+                          (processes, client_factory, isin_path, output_path, controller_options,
+                           fetcher_options or {}, validate, rejects_path, snapshot_interval),
+                          lambda parts: merge_bulk_reports(parts, output_path),
+                          on_progress)
+    _concatenate([part_path(output_path, index) for index in range(processes)], output_path)
+    if rejects_path:
+        _concatenate([part_path(rejects_path, index) for index in range(processes)], rejects_path)
+    report = merge_bulk_reports(reports, output_path)
+    if validate:
+        report["isin_validation"] = merge_validation_reports(
+            [part["isin_validation"] for part in reports])
+    return report
+
+
+def print_progress(report: Dict[str, Any]):
+    """Print one progress line from a merged load or bulk snapshot"""
+    if "overall" in report:
+        overall = report["overall"]
+        latency = overall["latency"]
+        print(f"  [+{report['elapsed_s']:.1f}s] {overall['requests']} requests, "
+              f"{overall['throughput_rps']} req/s, p50 {latency.get('p50_ms', 0)}ms, "
+              f"p99 {latency.get('p99_ms', 0)}ms, errors {overall['error_rate']*100:.1f}%")
+    else:
+        print(f"  [+{report['elapsed_s']:.1f}s] {report['isins']} ISINs "
+              f"({report['isins_per_second']}/s), {report['requests']} requests, "
+              f"{report['failed']} failed")
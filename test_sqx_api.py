@@ -4,10 +4,40 @@ Tests all three endpoints with various scenarios including authentication,
 valid/invalid inputs, error handling, and response validation.
 """
 
-import requests
+import argparse
+import functools
 import json
-from datetime import datetime, timedelta
-from typing import Dict, Any, List, Tuple
+import math
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from sqx_backfill import (BackfillSweeper, CALENDARS, read_holidays, sweep_dates,
+                          print_backfill_report)
+from sqx_baseline import (LatencyHistory, compare_runs, new_run_id, print_comparison_report,
+                          GATE_FAIL, REGRESSION_EXIT_CODE)
+from sqx_bulk import BulkFetcher, BatchController, read_isins, print_bulk_report
+from sqx_cache import ResponseCache
+from sqx_cassette import (CassettePlayer, CassetteRecorder, MATCH_MODES, MATCH_STRICT,
+                          print_cassette_report)
+from sqx_client import SQXClient, TIMING_PHASES
+from sqx_coalesce import BulkCoalescer, print_coalesce_report
+from sqx_codec import CODEC_NAMES, get_codec
+from sqx_histogram import LatencyHistogram
+from sqx_isin import IsinFilter, screen_targets, print_validation_report
+from sqx_load import run_load, print_load_report
+from sqx_metrics import RequestMetrics, MetricsServer
+from sqx_mock_server import MockSQXServer, MockDataset, add_fault_arguments, faults_from_args
+from sqx_profile import PhaseProfiler, PROFILE_MODES, print_profile_report
+from sqx_ratelimit import RateLimiter, AdaptiveConcurrency, print_limiter_report
+from sqx_retry import RetryPolicy, HedgePolicy, DEFAULT_RETRY_STATUSES, print_retry_report
+from sqx_results import ResultSink, ResultAggregator, RETAIN_POLICIES, summarize_jsonl
+from sqx_schema import (SINGLE_PRICE_VALIDATOR, HISTORICAL_PRICE_VALIDATOR, BULK_PRICES_VALIDATOR,
+                        validation_stats, print_codec_report)
+from sqx_workers import run_load_processes, run_bulk_processes, print_progress
 
 # API Configuration
 BASE_URL = "https://iw4w1pr906.execute-api.us-east-2.amazonaws.com/Dev"
@@ -16,6 +46,39 @@ API_KEY = "FEb05PgvKG8iMzI2T9S698opZyEVz9Q63TNRdpmx"
 # Test Results Storage
 test_results: List[Dict[str, Any]] = []
 
+# Every result passes through the sink, which streams it to JSONL (when a path
+# is configured) and keeps the running aggregates generate_summary reports.
+# With retain_results off, test_results stays empty and memory stays constant.
+results_sink = ResultSink(path=None)
+retain_results = True
+
+
+def configure_results(path: str = None, retain_payloads: str = "all",
+                      max_payload_bytes: int = None, retain: bool = True) -> ResultSink:
+    """Replace the result sink and set whether results are also kept in memory"""
+    global results_sink, retain_results
+    results_sink.close()
+    results_sink = ResultSink(path, retain_payloads, max_payload_bytes, codec=client.codec)
+    retain_results = retain
+    return results_sink
+
+# Timing of the most recent make_request call on each thread, consumed by log_test
+_last_request = threading.local()
+
+# Shared pooled client; replaced by configure_client() when CLI options differ
+client = SQXClient(BASE_URL, API_KEY)
+
+
+def configure_client(**options) -> SQXClient:
+    """Replace the shared client with one built from the given pool and cache options"""
+    global client
+    client.close()
+    client = SQXClient(BASE_URL, API_KEY, **options)
+    return client
+
+# Profiles run phases when --profile is set; a no-op otherwise
+profiler = PhaseProfiler()
+
 
 def log_test(test_name: str, endpoint: str, method: str, status: str, 
              details: str = "", response_data: Any = None):
@@ -29,68 +92,189 @@ def log_test(test_name: str, endpoint: str, method: str, status: str,
         "response_data": response_data,
         "timestamp": datetime.now().isoformat()
     }
-    test_results.append(result)
+    # Attach the timing breakdown of the request this check just made
+    timing = getattr(_last_request, "timing", None)
+    if timing is not None:
+        result["timing"] = timing
+        _last_request.timing = None
+    buffer = getattr(_capture, "buffer", None)
+    if buffer is not None:
+        buffer.append(result)
+    else:
+        emit_result(result)
+
+
+def emit_result(result: Dict[str, Any]):
+    """Record a logged result and print it"""
+    result = results_sink.write(result)
+    if retain_results:
+        test_results.append(result)
+    status = result["status"]
+    test_name = result["test_name"]
+    details = result["details"]
     status_symbol = "[PASS]" if status == "PASS" else "[FAIL]" if status == "FAIL" else "[ERROR]"
     print(f"{status_symbol} {test_name}: {details}")
 
 
 def make_request(method: str, endpoint: str, headers: Dict = None, 
-                params: Dict = None, json_data: Dict = None) -> Tuple[int, Any]:
+                params: Dict = None, json_data: Dict = None,
+                use_cache: bool = True) -> Tuple[int, Any]:
     """Make HTTP request and return status code and response"""
-    url = f"{BASE_URL}{endpoint}"
-    default_headers = {"x-api-key": API_KEY} if headers is None else headers
-    
-    try:
-        if method.upper() == "GET":
-            response = requests.get(url, headers=default_headers, params=params, timeout=30)
-        elif method.upper() == "POST":
-            response = requests.post(url, headers=default_headers, json=json_data, timeout=30)
-        else:
-            return 0, {"error": "Unsupported method"}
-        
-        try:
-            return response.status_code, response.json()
-        except json.JSONDecodeError:
-            return response.status_code, {"raw_response": response.text}
-    except requests.exceptions.RequestException as e:
-        return 0, {"error": str(e)}
+    status, response = client.request(method, endpoint, headers=headers,
+                                      params=params, json_data=json_data,
+                                      use_cache=use_cache)
+    _last_request.timing = client.last_timing()
+    return status, response
 
 
 # ============================================================================
-# AUTHENTICATION TESTS
+# TEST DATA
 # ============================================================================
 
-def test_authentication():
-    """Test authentication scenarios"""
+SINGLE_TEST_ISIN = "AED01656C257"
+HISTORICAL_TEST_ISIN = "AR0047526246"
+BULK_TEST_ISINS = ["US95040QAJ31", "US517834AF40", "US25389JAT34"]
+NON_EXISTENT_ISIN = "US1234567890"
+
+
+def historical_test_dates() -> Dict[str, str]:
+    """Return the past/future/old dates used by the historical checks"""
+    today = datetime.now()
+    return {
+        "past": (today - timedelta(days=30)).strftime("%Y-%m-%d"),
+        "future": (today + timedelta(days=30)).strftime("%Y-%m-%d"),
+        "old": "2020-01-01",
+    }
+
+
+def endpoint_requests() -> Dict[str, Dict[str, Any]]:
+    """Return a valid make_request call for each endpoint, keyed by short name"""
+    return {
+        "single": {"method": "GET", "endpoint": "/price/byIsin",
+                   "params": {"isin": SINGLE_TEST_ISIN}},
+        "historical": {"method": "GET", "endpoint": "/price/byIsinHistorical",
+                       "params": {"isin": HISTORICAL_TEST_ISIN,
+                                  "date": historical_test_dates()["past"]}},
+        "bulk": {"method": "POST", "endpoint": "/price/byIsinBulk",
+                 "json_data": {"isin_list": BULK_TEST_ISINS}},
+    }
+
+
+# ============================================================================
+# CHECK REGISTRY AND SCHEDULER
+# ============================================================================
+
+# Registered checks in declaration order: (suite title, check function)
+CHECKS: List[Tuple[str, Callable[[], None]]] = []
+
+# When a check runs on a scheduler worker, log_test buffers its results here
+# so they can be emitted in registration order once earlier checks finish.
+_capture = threading.local()
+
+
+def check(suite: str):
+    """Register a function as an individual check belonging to a suite"""
+    def decorator(func: Callable[[], None]) -> Callable[[], None]:
+        CHECKS.append((suite, func))
+        return func
+    return decorator
+
+
+def print_suite_header(suite: str):
+    """Print the section banner for a suite"""
     print("\n" + "="*70)
-    print("AUTHENTICATION TESTS")
+    print(suite)
     print("="*70)
-    
+
+
+def run_suite(suite: str):
+    """Run every check in a suite serially"""
+    print_suite_header(suite)
+    for check_suite, func in CHECKS:
+        if check_suite == suite:
+            func()
+
+
+def _run_captured(func: Callable[[], None]) -> List[Dict[str, Any]]:
+    """Run a check on the current thread, returning the results it logged"""
+    _capture.buffer = []
+    try:
+        func()
+        return _capture.buffer
+    finally:
+        del _capture.buffer
+
+
+def run_checks(suites: List[str] = None, workers: int = 1):
+    """
+    Run registered checks, optionally concurrently.
+
+    Every check is an independent unit. With more than one worker they are
+    submitted to a thread pool together, but their results are emitted
+    strictly in registration order, so test_results and the printed output
+    are identical to a serial run.
+    """
+    selected = [(suite, func) for suite, func in CHECKS
+                if suites is None or suite in suites]
+    if workers <= 1:
+        for suite in dict.fromkeys(suite for suite, _ in selected):
+            run_suite(suite)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_captured, func) for _, func in selected]
+        current_suite = None
+        for (suite, _), future in zip(selected, futures):
+            if suite != current_suite:
+                print_suite_header(suite)
+                current_suite = suite
+            for result in future.result():
+                emit_result(result)
+
+
+# ============================================================================
+# AUTHENTICATION TESTS
+# ============================================================================
+
+AUTH_SUITE = "AUTHENTICATION TESTS"
+
+
+@check(AUTH_SUITE)
+def check_missing_api_key():
     # Test 1: Missing API Key
     status, response = make_request("GET", "/price/byIsin", 
                                    headers={}, 
-                                   params={"isin": "AED01656C257"})
+                                   params={"isin": SINGLE_TEST_ISIN},
+                                   use_cache=False)
     if status == 401:
         log_test("Missing API Key", "/price/byIsin", "GET", "PASS", 
                 f"Correctly returned 401 Unauthorized")
     else:
         log_test("Missing API Key", "/price/byIsin", "GET", "FAIL", 
                 f"Expected 401, got {status}", response)
-    
+
+
+@check(AUTH_SUITE)
+def check_invalid_api_key():
     # Test 2: Invalid API Key
     status, response = make_request("GET", "/price/byIsin", 
                                    headers={"x-api-key": "INVALID_KEY_12345"}, 
-                                   params={"isin": "AED01656C257"})
+                                   params={"isin": SINGLE_TEST_ISIN},
+                                   use_cache=False)
     if status == 403:
         log_test("Invalid API Key", "/price/byIsin", "GET", "PASS", 
                 f"Correctly returned 403 Forbidden")
     else:
         log_test("Invalid API Key", "/price/byIsin", "GET", "FAIL", 
                 f"Expected 403, got {status}", response)
-    
+
+
+@check(AUTH_SUITE)
+def check_valid_api_key():
     # Test 3: Valid API Key
     status, response = make_request("GET", "/price/byIsin", 
-                                   params={"isin": "AED01656C257"})
+                                   params={"isin": SINGLE_TEST_ISIN},
+                                   use_cache=False)
     if status == 200:
         log_test("Valid API Key", "/price/byIsin", "GET", "PASS", 
                 f"Successfully authenticated with status 200")
@@ -99,31 +283,39 @@ def test_authentication():
                 f"Expected 200, got {status}", response)
 
 
+def test_authentication():
+    """Test authentication scenarios"""
+    run_suite(AUTH_SUITE)
+
+
 # ============================================================================
 # GET /price/byIsin TESTS
 # ============================================================================
 
-def test_get_single_price():
-    """Test GET /price/byIsin endpoint"""
-    print("\n" + "="*70)
-    print("GET /price/byIsin - SINGLE PRICE TESTS")
-    print("="*70)
-    
+SINGLE_SUITE = "GET /price/byIsin - SINGLE PRICE TESTS"
+
+
+@check(SINGLE_SUITE)
+def check_single_valid_isin():
     # Test 1: Valid ISIN
-    test_isin = "AED01656C257"
+    test_isin = SINGLE_TEST_ISIN
     status, response = make_request("GET", "/price/byIsin", 
                                    params={"isin": test_isin})
     if status == 200:
-        if isinstance(response, dict) and "reference" in response and "pricing" in response:
+        errors = SINGLE_PRICE_VALIDATOR(response)
+        if not errors:
             log_test("Valid ISIN", "/price/byIsin", "GET", "PASS", 
                     f"Successfully retrieved price for ISIN {test_isin}")
         else:
             log_test("Valid ISIN - Response Structure", "/price/byIsin", "GET", "FAIL", 
-                    "Response missing required 'reference' or 'pricing' fields", response)
+                    f"Invalid price record: {'; '.join(errors)}", response)
     else:
         log_test("Valid ISIN", "/price/byIsin", "GET", "FAIL", 
                 f"Expected 200, got {status}", response)
-    
+
+
+@check(SINGLE_SUITE)
+def check_single_missing_isin():
     # Test 2: Missing ISIN parameter
     status, response = make_request("GET", "/price/byIsin", params={})
     if status in [400, 422]:
@@ -132,7 +324,10 @@ def test_get_single_price():
     else:
         log_test("Missing ISIN Parameter", "/price/byIsin", "GET", "FAIL", 
                 f"Expected 400/422, got {status}", response)
-    
+
+
+@check(SINGLE_SUITE)
+def check_single_invalid_format():
     # Test 3: Invalid ISIN format (too short)
     status, response = make_request("GET", "/price/byIsin", 
                                    params={"isin": "INVALID"})
@@ -142,10 +337,13 @@ def test_get_single_price():
     else:
         log_test("Invalid ISIN Format", "/price/byIsin", "GET", "FAIL", 
                 f"Expected error status, got {status}", response)
-    
+
+
+@check(SINGLE_SUITE)
+def check_single_non_existent():
     # Test 4: Non-existent ISIN
     status, response = make_request("GET", "/price/byIsin", 
-                                   params={"isin": "US1234567890"})
+                                   params={"isin": NON_EXISTENT_ISIN})
     if status in [200, 404]:
         if status == 404:
             log_test("Non-existent ISIN", "/price/byIsin", "GET", "PASS", 
@@ -157,103 +355,124 @@ def test_get_single_price():
     else:
         log_test("Non-existent ISIN", "/price/byIsin", "GET", "FAIL", 
                 f"Unexpected status {status}", response)
-    
+
+
+@check(SINGLE_SUITE)
+def check_single_structure():
     # Test 5: Response structure validation
     status, response = make_request("GET", "/price/byIsin", 
-                                   params={"isin": test_isin})
+                                   params={"isin": SINGLE_TEST_ISIN})
     if status == 200 and isinstance(response, dict):
-        has_reference = "reference" in response
-        has_pricing = "pricing" in response
-        ref_has_isin = has_reference and "isin" in response.get("reference", {})
-        
-        if has_reference and has_pricing and ref_has_isin:
+        errors = SINGLE_PRICE_VALIDATOR(response)
+        if not errors:
             log_test("Response Structure Validation", "/price/byIsin", "GET", "PASS", 
                     "Response structure matches documentation")
         else:
             log_test("Response Structure Validation", "/price/byIsin", "GET", "FAIL", 
-                    f"Missing required fields. Reference: {has_reference}, Pricing: {has_pricing}, ISIN in ref: {ref_has_isin}", 
-                    response)
+                    f"Schema violations: {'; '.join(errors)}", response)
     else:
         log_test("Response Structure Validation", "/price/byIsin", "GET", "ERROR", 
                 f"Cannot validate structure - request failed with status {status}")
 
 
+def test_get_single_price():
+    """Test GET /price/byIsin endpoint"""
+    run_suite(SINGLE_SUITE)
+
+
 # ============================================================================
 # GET /price/byIsinHistorical TESTS
 # ============================================================================
 
-def test_get_historical_price():
-    """Test GET /price/byIsinHistorical endpoint"""
-    print("\n" + "="*70)
-    print("GET /price/byIsinHistorical - HISTORICAL PRICE TESTS")
-    print("="*70)
-    
-    test_isin = "AR0047526246"
-    today = datetime.now()
-    past_date = (today - timedelta(days=30)).strftime("%Y-%m-%d")
-    future_date = (today + timedelta(days=30)).strftime("%Y-%m-%d")
-    old_date = "2020-01-01"
-    
+HISTORICAL_SUITE = "GET /price/byIsinHistorical - HISTORICAL PRICE TESTS"
+
+
+@check(HISTORICAL_SUITE)
+def check_historical_valid():
     # Test 1: Valid ISIN + Valid Date
+    past_date = historical_test_dates()["past"]
     status, response = make_request("GET", "/price/byIsinHistorical", 
-                                   params={"isin": test_isin, "date": past_date})
+                                   params={"isin": HISTORICAL_TEST_ISIN, "date": past_date})
     if status == 200:
-        if isinstance(response, dict) and "reference" in response and "pricing" in response:
+        errors = HISTORICAL_PRICE_VALIDATOR(response)
+        if not errors:
             log_test("Valid ISIN + Valid Date", "/price/byIsinHistorical", "GET", "PASS", 
                     f"Successfully retrieved historical price for {past_date}")
         else:
             log_test("Valid ISIN + Valid Date", "/price/byIsinHistorical", "GET", "FAIL", 
-                    "Response missing required structure", response)
+                    f"Invalid price record: {'; '.join(errors)}", response)
     else:
         log_test("Valid ISIN + Valid Date", "/price/byIsinHistorical", "GET", "FAIL", 
                 f"Expected 200, got {status}", response)
-    
+
+
+@check(HISTORICAL_SUITE)
+def check_historical_missing_isin():
     # Test 2: Missing ISIN parameter
     status, response = make_request("GET", "/price/byIsinHistorical", 
-                                   params={"date": past_date})
+                                   params={"date": historical_test_dates()["past"]})
     if status in [400, 422]:
         log_test("Missing ISIN Parameter", "/price/byIsinHistorical", "GET", "PASS", 
                 f"Correctly returned error status {status} for missing ISIN")
     else:
         log_test("Missing ISIN Parameter", "/price/byIsinHistorical", "GET", "FAIL", 
                 f"Expected 400/422, got {status}", response)
-    
+
+
+@check(HISTORICAL_SUITE)
+def check_historical_missing_date():
     # Test 3: Missing Date parameter
     status, response = make_request("GET", "/price/byIsinHistorical", 
-                                   params={"isin": test_isin})
+                                   params={"isin": HISTORICAL_TEST_ISIN})
     if status in [400, 422]:
         log_test("Missing Date Parameter", "/price/byIsinHistorical", "GET", "PASS", 
                 f"Correctly returned error status {status} for missing date")
     else:
         log_test("Missing Date Parameter", "/price/byIsinHistorical", "GET", "FAIL", 
                 f"Expected 400/422, got {status}", response)
-    
+
+
+@check(HISTORICAL_SUITE)
+def check_historical_invalid_date():
     # Test 4: Invalid Date Format
     status, response = make_request("GET", "/price/byIsinHistorical", 
-                                   params={"isin": test_isin, "date": "01-01-2020"})
+                                   params={"isin": HISTORICAL_TEST_ISIN, "date": "01-01-2020"})
     if status in [400, 422]:
         log_test("Invalid Date Format", "/price/byIsinHistorical", "GET", "PASS", 
                 f"Correctly rejected invalid date format with status {status}")
     else:
         log_test("Invalid Date Format", "/price/byIsinHistorical", "GET", "FAIL", 
                 f"Expected 400/422, got {status}", response)
-    
+
+
+@check(HISTORICAL_SUITE)
+def check_historical_future_date():
     # Test 5: Future Date
     status, response = make_request("GET", "/price/byIsinHistorical", 
-                                   params={"isin": test_isin, "date": future_date})
+                                   params={"isin": HISTORICAL_TEST_ISIN,
+                                           "date": historical_test_dates()["future"]})
     if status in [200, 400, 422]:
         log_test("Future Date", "/price/byIsinHistorical", "GET", "PASS", 
                 f"Handled future date appropriately with status {status}", response)
     else:
         log_test("Future Date", "/price/byIsinHistorical", "GET", "FAIL", 
                 f"Unexpected status {status}", response)
-    
+
+
+@check(HISTORICAL_SUITE)
+def check_historical_old_date():
     # Test 6: Very Old Date
     status, response = make_request("GET", "/price/byIsinHistorical", 
-                                   params={"isin": test_isin, "date": old_date})
+                                   params={"isin": HISTORICAL_TEST_ISIN,
+                                           "date": historical_test_dates()["old"]})
     if status == 200:
+        errors = HISTORICAL_PRICE_VALIDATOR(response)
+        if errors:
+            log_test("Very Old Date", "/price/byIsinHistorical", "GET", "FAIL",
+                    f"Invalid price record: {'; '.join(errors)}", response)
+            return
         # Check for "closest date" message
-        pricing = response.get("pricing", {})
+        pricing = response["pricing"]
         if "message" in pricing or "pricing_date" in pricing:
             log_test("Very Old Date", "/price/byIsinHistorical", "GET", "PASS", 
                     "Returned closest available date or message", response)
@@ -263,50 +482,59 @@ def test_get_historical_price():
     else:
         log_test("Very Old Date", "/price/byIsinHistorical", "GET", "PASS", 
                 f"Handled old date with status {status}", response)
-    
+
+
+@check(HISTORICAL_SUITE)
+def check_historical_structure():
     # Test 7: Response structure validation
     status, response = make_request("GET", "/price/byIsinHistorical", 
-                                   params={"isin": test_isin, "date": past_date})
+                                   params={"isin": HISTORICAL_TEST_ISIN,
+                                           "date": historical_test_dates()["past"]})
     if status == 200 and isinstance(response, dict):
-        has_reference = "reference" in response
-        has_pricing = "pricing" in response
-        ref_has_isin = has_reference and "isin" in response.get("reference", {})
-        
-        if has_reference and has_pricing and ref_has_isin:
+        errors = HISTORICAL_PRICE_VALIDATOR(response)
+        if not errors:
             log_test("Historical Response Structure", "/price/byIsinHistorical", "GET", "PASS", 
                     "Response structure matches documentation")
         else:
             log_test("Historical Response Structure", "/price/byIsinHistorical", "GET", "FAIL", 
-                    "Response structure validation failed", response)
+                    f"Schema violations: {'; '.join(errors)}", response)
+
+
+def test_get_historical_price():
+    """Test GET /price/byIsinHistorical endpoint"""
+    run_suite(HISTORICAL_SUITE)
 
 
 # ============================================================================
 # POST /price/byIsinBulk TESTS
 # ============================================================================
 
-def test_bulk_prices():
-    """Test POST /price/byIsinBulk endpoint"""
-    print("\n" + "="*70)
-    print("POST /price/byIsinBulk - BULK PRICES TESTS")
-    print("="*70)
-    
+BULK_SUITE = "POST /price/byIsinBulk - BULK PRICES TESTS"
+
+
+@check(BULK_SUITE)
+def check_bulk_valid_list():
     # Test 1: Valid ISIN List (multiple)
-    valid_isins = ["US95040QAJ31", "US517834AF40", "US25389JAT34"]
+    valid_isins = BULK_TEST_ISINS
     status, response = make_request("POST", "/price/byIsinBulk", 
                                    json_data={"isin_list": valid_isins})
     if status == 200:
-        if isinstance(response, dict) and "success" in response:
+        errors = BULK_PRICES_VALIDATOR(response)
+        if not errors:
             log_test("Valid ISIN List (Multiple)", "/price/byIsinBulk", "POST", "PASS", 
                     f"Successfully processed {len(valid_isins)} ISINs")
         else:
             log_test("Valid ISIN List (Multiple)", "/price/byIsinBulk", "POST", "FAIL", 
-                    "Response missing 'success' array", response)
+                    f"Invalid bulk response: {'; '.join(errors)}", response)
     else:
         log_test("Valid ISIN List (Multiple)", "/price/byIsinBulk", "POST", "FAIL", 
                 f"Expected 200, got {status}", response)
-    
+
+
+@check(BULK_SUITE)
+def check_bulk_single_isin():
     # Test 2: Single ISIN in list
-    single_isin = ["AED01656C257"]
+    single_isin = [SINGLE_TEST_ISIN]
     status, response = make_request("POST", "/price/byIsinBulk", 
                                    json_data={"isin_list": single_isin})
     if status == 200:
@@ -315,7 +543,10 @@ def test_bulk_prices():
     else:
         log_test("Single ISIN in List", "/price/byIsinBulk", "POST", "FAIL", 
                 f"Expected 200, got {status}", response)
-    
+
+
+@check(BULK_SUITE)
+def check_bulk_empty_list():
     # Test 3: Empty ISIN List
     status, response = make_request("POST", "/price/byIsinBulk", 
                                    json_data={"isin_list": []})
@@ -325,26 +556,29 @@ def test_bulk_prices():
     else:
         log_test("Empty ISIN List", "/price/byIsinBulk", "POST", "FAIL", 
                 f"Unexpected status {status}", response)
-    
+
+
+@check(BULK_SUITE)
+def check_bulk_mixed_isins():
     # Test 4: Mix of Valid/Invalid ISINs
-    mixed_isins = ["AED01656C257", "US1234567890", "INVALID_ISIN"]
+    mixed_isins = [SINGLE_TEST_ISIN, NON_EXISTENT_ISIN, "INVALID_ISIN"]
     status, response = make_request("POST", "/price/byIsinBulk", 
                                    json_data={"isin_list": mixed_isins})
     if status == 200:
-        has_success = "success" in response
-        has_not_found = "not_found" in response
-        has_unprocessed = "unprocessed" in response
-        
-        if has_success or has_not_found or has_unprocessed:
+        errors = BULK_PRICES_VALIDATOR(response)
+        if not errors:
             log_test("Mixed Valid/Invalid ISINs", "/price/byIsinBulk", "POST", "PASS", 
                     "Correctly categorized ISINs into success/not_found/unprocessed")
         else:
             log_test("Mixed Valid/Invalid ISINs", "/price/byIsinBulk", "POST", "FAIL", 
-                    "Response missing categorization arrays", response)
+                    f"Invalid bulk response: {'; '.join(errors)}", response)
     else:
         log_test("Mixed Valid/Invalid ISINs", "/price/byIsinBulk", "POST", "FAIL", 
                 f"Expected 200, got {status}", response)
-    
+
+
+@check(BULK_SUITE)
+def check_bulk_missing_field():
     # Test 5: Missing isin_list in body
     status, response = make_request("POST", "/price/byIsinBulk", 
                                    json_data={})
@@ -354,107 +588,205 @@ def test_bulk_prices():
     else:
         log_test("Missing isin_list Field", "/price/byIsinBulk", "POST", "FAIL", 
                 f"Expected 400/422, got {status}", response)
-    
+
+
+@check(BULK_SUITE)
+def check_bulk_invalid_structure():
     # Test 6: Invalid JSON structure
     status, response = make_request("POST", "/price/byIsinBulk", 
-                                   json_data={"isin": "AED01656C257"})  # Wrong field name
+                                   json_data={"isin": SINGLE_TEST_ISIN})  # Wrong field name
     if status in [200, 400, 422]:
         log_test("Invalid JSON Structure", "/price/byIsinBulk", "POST", "PASS", 
                 f"Handled invalid structure with status {status}")
     else:
         log_test("Invalid JSON Structure", "/price/byIsinBulk", "POST", "FAIL", 
                 f"Unexpected status {status}", response)
-    
+
+
+@check(BULK_SUITE)
+def check_bulk_structure():
     # Test 7: Response structure validation
+    valid_isins = BULK_TEST_ISINS
     status, response = make_request("POST", "/price/byIsinBulk", 
                                    json_data={"isin_list": valid_isins})
     if status == 200 and isinstance(response, dict):
-        has_success = "success" in response
-        has_not_found = "not_found" in response
-        has_unprocessed = "unprocessed" in response
-        
-        if has_success and has_not_found and has_unprocessed:
+        errors = BULK_PRICES_VALIDATOR(response)
+        if not errors:
             log_test("Bulk Response Structure", "/price/byIsinBulk", "POST", "PASS", 
-                    "Response contains all required arrays (success, not_found, unprocessed)")
+                    "Response contains all required arrays (success, not_found, unprocessed) "
+                    "and every success record is valid")
         else:
             log_test("Bulk Response Structure", "/price/byIsinBulk", "POST", "FAIL", 
-                    f"Missing arrays. Success: {has_success}, Not Found: {has_not_found}, Unprocessed: {has_unprocessed}", 
-                    response)
+                    f"Schema violations: {'; '.join(errors)}", response)
     else:
         log_test("Bulk Response Structure", "/price/byIsinBulk", "POST", "ERROR", 
                 f"Cannot validate structure - request failed with status {status}")
 
 
+def test_bulk_prices():
+    """Test POST /price/byIsinBulk endpoint"""
+    run_suite(BULK_SUITE)
+
+
 # ============================================================================
 # MAIN EXECUTION
 # ============================================================================
 
+def print_timing_summary(timing_summary: Dict[str, Any]):
+    """Print mean and p90 of each request phase per endpoint"""
+    if not timing_summary:
+        return
+    print("\n" + "-"*70)
+    print("REQUEST TIMING (mean / p90 ms)")
+    print("-"*70)
+    print(f"{'Endpoint':<26}" + "".join(f"{phase:>13}" for phase in TIMING_PHASES))
+    for endpoint, entry in timing_summary.items():
+        cells = "".join(f"{entry[p]['mean_ms']:>6.1f}/{entry[p]['p90_ms']:<6.1f}" for p in TIMING_PHASES)
+        print(f"{endpoint:<26}{cells}")
+    split = {endpoint: entry for endpoint, entry in timing_summary.items() if "wire" in entry}
+    if not split:
+        return
+    print("\nCLIENT OVERHEAD vs WIRE TIME (mean / p90 ms)")
+    print(f"{'Endpoint':<26}{'wire':>13}{'client':>13}{'client share':>15}")
+    for endpoint, entry in split.items():
+        wire, overhead = entry["wire"], entry["client"]
+        total = wire["mean_ms"] + overhead["mean_ms"]
+        share = overhead["mean_ms"] / total * 100 if total else 0.0
+        print(f"{endpoint:<26}{wire['mean_ms']:>6.1f}/{wire['p90_ms']:<6.1f}"
+              f"{overhead['mean_ms']:>6.1f}/{overhead['p90_ms']:<6.1f}{share:>14.1f}%")
+
+
+def print_result_counts(aggregator: ResultAggregator):
+    """Print total/passed/failed/error counts"""
+    total_tests = aggregator.total
+    print(f"\nTotal Tests: {total_tests}")
+    print(f"Passed: {aggregator.passed} ({aggregator.passed/total_tests*100:.1f}%)")
+    print(f"Failed: {aggregator.failed} ({aggregator.failed/total_tests*100:.1f}%)")
+    print(f"Errors: {aggregator.errors} ({aggregator.errors/total_tests*100:.1f}%)")
+
+
+def print_failures(aggregator: ResultAggregator):
+    """Print the retained failing results"""
+    if aggregator.failed == 0 and aggregator.errors == 0:
+        return
+    print("\n" + "-"*70)
+    print("FAILED/ERROR TESTS:")
+    print("-"*70)
+    for result in aggregator.failures:
+        print(f"\n{result['test_name']} ({result['endpoint']})")
+        print(f"  Status: {result['status']}")
+        print(f"  Details: {result['details']}")
+        if result.get("response_data"):
+            print(f"  Response: {json.dumps(result['response_data'], indent=2)[:500]}")
+    omitted = aggregator.failed + aggregator.errors - len(aggregator.failures)
+    if omitted > 0:
+        print(f"\n... and {omitted} more (see {results_sink.path or 'the results file'})")
+
+
 def generate_summary():
     """Generate test summary report"""
     print("\n" + "="*70)
     print("TEST SUMMARY REPORT")
     print("="*70)
     
-    total_tests = len(test_results)
-    passed = sum(1 for r in test_results if r["status"] == "PASS")
-    failed = sum(1 for r in test_results if r["status"] == "FAIL")
-    errors = sum(1 for r in test_results if r["status"] == "ERROR")
+    aggregator = results_sink.aggregator
+    summary = aggregator.summary()
+    print_result_counts(aggregator)
     
-    print(f"\nTotal Tests: {total_tests}")
-    print(f"Passed: {passed} ({passed/total_tests*100:.1f}%)")
-    print(f"Failed: {failed} ({failed/total_tests*100:.1f}%)")
-    print(f"Errors: {errors} ({errors/total_tests*100:.1f}%)")
-    
-    if failed > 0 or errors > 0:
-        print("\n" + "-"*70)
-        print("FAILED/ERROR TESTS:")
-        print("-"*70)
-        for result in test_results:
-            if result["status"] in ["FAIL", "ERROR"]:
-                print(f"\n{result['test_name']} ({result['endpoint']})")
-                print(f"  Status: {result['status']}")
-                print(f"  Details: {result['details']}")
-                if result.get("response_data"):
-                    print(f"  Response: {json.dumps(result['response_data'], indent=2)[:500]}")
-    
-    # Save detailed results to JSON file
+    connections = client.stats()
+    print(f"\nHTTP Requests: {connections['requests']}")
+    print(f"Connections Opened: {connections['connections_opened']}")
+    print(f"Handshakes Avoided (connection reuse): {connections['connections_reused']}")
+    
+    cache_stats = client.cache_stats()
+    if cache_stats is not None:
+        print(f"Response Cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+              f"{cache_stats['coalesced']} coalesced ({cache_stats['hit_rate']*100:.1f}% hit rate)")
+    
+    limiter_stats = client.limiter_stats()
+    if limiter_stats is not None:
+        print_limiter_report(limiter_stats)
+    retry_stats = client.retry_stats()
+    if retry_stats is not None:
+        print_retry_report(retry_stats)
+    coalesce_stats = client.coalesce_stats()
+    if coalesce_stats is not None:
+        print_coalesce_report(coalesce_stats)
+    cassette_stats = client.cassette.stats() if client.cassette is not None else None
+    if cassette_stats is not None:
+        print_cassette_report(cassette_stats)
+    decode_stats = client.decode_stats()
+    validations = validation_stats()
+    print_codec_report(decode_stats, validations)
+    
+    print_timing_summary(summary["timings"])
+    print_failures(aggregator)
+    
+    # Save the summary, plus detailed results when they were kept in memory
+    report = {
+        "summary": {
+            **summary,
+            "connections": connections,
+            "cache": cache_stats,
+            "rate_limit": limiter_stats,
+            "retries": retry_stats,
+            "coalesce": coalesce_stats,
+            "decode": decode_stats,
+            "validation": validations,
+            "cassette": cassette_stats,
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+    if retain_results:
+        report["results"] = test_results
+    if results_sink.path:
+        report["results_file"] = results_sink.path
     with open("test_results.json", "w") as f:
-        json.dump({
-            "summary": {
-                "total": total_tests,
-                "passed": passed,
-                "failed": failed,
-                "errors": errors,
-                "timestamp": datetime.now().isoformat()
-            },
-            "results": test_results
-        }, f, indent=2)
+        json.dump(report, f, indent=2)
     
     print(f"\nDetailed results saved to: test_results.json")
+    if results_sink.path:
+        print(f"Streamed results saved to: {results_sink.path}")
     return {
-        "total": total_tests,
-        "passed": passed,
-        "failed": failed,
-        "errors": errors
+        "total": aggregator.total,
+        "passed": aggregator.passed,
+        "failed": aggregator.failed,
+        "errors": aggregator.errors
     }
 
 
-if __name__ == "__main__":
+def run_summarize_mode(args: argparse.Namespace):
+    """Rebuild and print the summary of a previous run from its JSONL results"""
+    print("\n" + "="*70)
+    print(f"TEST SUMMARY REPORT ({args.summarize})")
+    print("="*70)
+    aggregator = summarize_jsonl(args.summarize)
+    if aggregator.total == 0:
+        print("\nNo results found")
+        return
+    print_result_counts(aggregator)
+    print_timing_summary(aggregator.timings.summary())
+    print_failures(aggregator)
+
+
+def run_test_suite(args: argparse.Namespace):
+    """Run every registered check and print the summary"""
     print("\n" + "="*70)
     print("SQX API TEST SUITE")
     print("="*70)
-    print(f"Base URL: {BASE_URL}")
+    print(f"Base URL: {client.base_url}")
     print(f"Test Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
+    configure_results(args.results_file or None, args.retain_payloads,
+                      args.max_payload_bytes, retain=not args.no_retain_results)
     try:
         # Run all test suites
-        test_authentication()
-        test_get_single_price()
-        test_get_historical_price()
-        test_bulk_prices()
+        with profiler.phase("checks"):
+            run_checks(workers=args.workers)
         
         # Generate summary
-        summary = generate_summary()
+        with profiler.phase("summary"):
+            summary = generate_summary()
         
         print("\n" + "="*70)
         print("TESTING COMPLETE")
@@ -464,4 +796,633 @@ if __name__ == "__main__":
         print(f"\nCRITICAL ERROR: {str(e)}")
         import traceback
         traceback.print_exc()
+    finally:
+        results_sink.close()
+
+
+# History key of every suite request pooled together
+SUITE_POOL = "(all endpoints)"
+
+# Samples needed before an endpoint is judged, by default: a suite run
+# answers only about a dozen requests with 2xx, a load run thousands
+SUITE_MIN_SAMPLES = 10
+LOAD_MIN_SAMPLES = 20
+
+
+def suite_checks() -> List[str]:
+    """Return the names of the registered checks, in order"""
+    return [func.__name__ for _, func in CHECKS]
+
+
+def suite_histograms() -> Dict[str, LatencyHistogram]:
+    """
+    Return the latency histogram of each endpoint's 2xx responses in the suite.
+
+    One suite run makes only a handful of requests per endpoint, too few to
+    judge any endpoint alone, so they are also pooled under SUITE_POOL.
+    Cache hits and error responses are left out; runs are only compared
+    with runs of the same checks, so the pool's mix of requests is fixed.
+    """
+    histograms = dict(results_sink.aggregator.timings.served)
+    if histograms:
+        pooled = LatencyHistogram()
+        for histogram in histograms.values():
+            pooled.merge(histogram)
+        histograms[SUITE_POOL] = pooled
+    return histograms
+
+
+def load_histograms(report: Dict[str, Any]) -> Dict[str, LatencyHistogram]:
+    """Return the latency histogram of each endpoint in a load report, by its label"""
+    definitions = endpoint_requests()
+    labels = report["config"].get("labels", {})
+    return {labels.get(name) or definitions[name]["endpoint"]: LatencyHistogram.from_dict(row["histogram"])
+            for name, row in report["endpoints"].items()}
+
+
+def gate_latency(args: argparse.Namespace, mode: str,
+                 histograms: Dict[str, LatencyHistogram], checks: Optional[List[str]] = None) -> int:
+    """
+    Append this run to the latency history, first gating it with --compare.
+
+    Runs are keyed by --env, the base URL, mode and the suite checks run,
+    so only like runs form a baseline. The mock listens on a new port each
+    run, so its runs share the key "mock". Returns the process exit status.
+    """
+    if not args.history or not histograms:
+        return 0
+    base_url = "mock" if args.mock else client.base_url
+    history = LatencyHistory(args.history)
+    gate = None
+    if args.compare:
+        baseline, runs = history.baseline(args.env, base_url, mode, args.baseline_runs,
+                                          exclude_run=args.run_id, checks=checks)
+        min_samples = args.regression_min_samples
+        if min_samples is None:
+            min_samples = SUITE_MIN_SAMPLES if checks is not None else LOAD_MIN_SAMPLES
+        comparison = compare_runs(baseline, histograms, runs, args.regression_threshold,
+                                  args.regression_alpha, min_samples, args.regression_min_delta_ms)
+        print_comparison_report(comparison)
+        gate = comparison["gate"]
+    history.append(args.run_id, args.env, base_url, mode, histograms, gate, checks)
+    print(f"\nRun {args.run_id} ({args.env}, {mode}) appended to: {args.history}")
+    return REGRESSION_EXIT_CODE if gate == GATE_FAIL else 0
 
+
+def report_rate_limiting(report: Dict[str, Any]):
+    """Print the client's rate limiter state and add it to a run report"""
+    stats = client.limiter_stats()
+    if stats is not None:
+        report["rate_limit"] = stats
+        print_limiter_report(stats)
+
+
+def report_coalescing(report: Dict[str, Any]):
+    """Print the client's request coalescing counters and add them to a run report"""
+    stats = client.coalesce_stats()
+    if stats is not None:
+        report["coalesce"] = stats
+        print_coalesce_report(stats)
+
+
+def build_limiter(args: argparse.Namespace, processes: int = 1) -> Optional[RateLimiter]:
+    """
+    Build the client rate limiter from CLI options, or None when none are set.
+
+    With several processes each builds its own limiter, so the rate budgets
+    are split evenly between them.
+    """
+    if args.rate_limit is None and not args.endpoint_rate and not args.adaptive_concurrency:
+        return None
+    concurrency = None
+    if args.adaptive_concurrency:
+        maximum = args.max_concurrency or args.pool_size
+        concurrency = AdaptiveConcurrency(initial=maximum, maximum=maximum)
+    return RateLimiter(rates={endpoint: rate / processes
+                              for endpoint, rate in args.endpoint_rate.items()},
+                       default_rate=args.rate_limit / processes if args.rate_limit else None,
+                       burst=args.rate_burst / processes if args.rate_burst else None,
+                       concurrency=concurrency)
+
+
+def client_options(args: argparse.Namespace, processes: int = 1) -> Dict[str, Any]:
+    """Return SQXClient keyword arguments for the CLI options"""
+    return {
+        "pool_connections": args.pool_hosts,
+        "pool_maxsize": args.pool_size,
+        "keep_alive": not args.no_keep_alive,
+        "cache": ResponseCache(args.cache_size, args.cache_ttl) if args.cache else None,
+        "limiter": build_limiter(args, processes),
+        "timeout": args.timeout,
+        "retry": RetryPolicy(max_attempts=args.retries + 1,
+                             backoff_base=args.retry_backoff,
+                             backoff_max=args.retry_backoff_max,
+                             retry_after_max=args.retry_after_max,
+                             retry_statuses=args.retry_statuses) if args.retries else None,
+        "hedge": HedgePolicy(percentile=args.hedge_percentile,
+                             min_samples=args.hedge_min_samples) if args.hedge else None,
+        "codec": get_codec(args.json_codec),
+        "metrics": RequestMetrics({"run_id": args.run_id, "env": args.env})
+                   if args.metrics_port is not None else None,
+        "coalescer": BulkCoalescer(window=args.coalesce_window_ms / 1000,
+                                   max_batch=args.coalesce_max_batch) if args.coalesce else None,
+    }
+
+
+def build_worker_client(args: argparse.Namespace, base_url: str) -> SQXClient:
+    """Build a worker process's own client, with its share of the rate limits"""
+    return SQXClient(base_url, API_KEY, **client_options(args, args.processes))
+
+
+def run_load_mode(args: argparse.Namespace):
+    """Run the load generator against the selected endpoints and save the report"""
+    definitions = endpoint_requests()
+    targets = {name: definitions[name] for name in args.endpoints}
+    if args.load_isins and "single" in targets:
+        targets["single"] = {**targets["single"], "isins": list(read_isins(args.load_isins))}
+    
+    print("\n" + "="*70)
+    print("SQX API LOAD TEST")
+    print("="*70)
+    print(f"Base URL: {client.base_url}")
+    
+    # Requests for ISINs that cannot exist would only measure the API's
+    # rejection path, so they are screened out before any load is sent
+    screening = None
+    if not args.no_isin_validation:
+        requested = len(targets)
+        targets, screening = screen_targets(targets)
+        for name, rejected in screening["rejected"].items():
+            for entry in rejected[:10]:
+                print(f"Invalid ISIN in {name}: {entry['isin']!r} ({entry['reason']})")
+            if len(rejected) > 10:
+                print(f"... and {len(rejected) - 10} more invalid ISINs in {name}")
+        if screening["dropped_targets"]:
+            screening["requests_saved"] = int(args.rps * args.duration
+                                              * len(screening["dropped_targets"]) / requested)
+            print(f"Dropped endpoints: {', '.join(screening['dropped_targets'])} "
+                  f"(~{screening['requests_saved']} doomed requests not sent)")
+        if not targets:
+            print("No endpoints left with valid ISINs; nothing to load")
+            return None
+    if targets.get("single", {}).get("isins"):
+        print(f"Single lookups spread over {len(targets['single']['isins'])} ISINs "
+              f"from {args.load_isins}")
+    if client.coalescer is not None and "single" in targets:
+        # Coalesced lookups are a different workload from single requests,
+        # so they are reported and gated under their own label
+        targets = {("coalesced" if name == "single" else name):
+                   {**spec, "coalesce": True, "label": f"{spec['endpoint']} (coalesced)"}
+                   if name == "single" else spec
+                   for name, spec in targets.items()}
+    print(f"Endpoints: {', '.join(targets)}")
+    
+    if args.processes > 1:
+        print(f"Processes: {args.processes}")
+        report = run_load_processes(functools.partial(build_worker_client, args, client.base_url),
+                                    targets, rps=args.rps, duration=args.duration,
+                                    concurrency=args.concurrency, processes=args.processes,
+                                    snapshot_interval=args.snapshot_interval,
+                                    on_progress=print_progress)
+    else:
+        report = run_load(client, targets, rps=args.rps, duration=args.duration,
+                          concurrency=args.concurrency)
+    if screening is not None:
+        report["isin_validation"] = screening
+    print_load_report(report)
+    if args.processes == 1:
+        report_rate_limiting(report)
+        report_coalescing(report)
+    elif "coalesce" in report:
+        print_coalesce_report(report["coalesce"])
+    
+    with open("load_results.json", "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nLoad report saved to: load_results.json")
+    return report
+
+
+def run_bulk_mode(args: argparse.Namespace):
+    """Price every ISIN in a file through the bulk endpoint and save the report"""
+    print("\n" + "="*70)
+    print("SQX API BULK FETCH")
+    print("="*70)
+    print(f"Base URL: {client.base_url}")
+    print(f"ISIN file: {args.bulk_file}")
+    
+    controller_options = {"initial_batch": args.bulk_batch_size,
+                          "max_batch": args.bulk_max_batch,
+                          "max_in_flight": args.bulk_max_in_flight,
+                          "target_latency": args.bulk_target_latency}
+    fetcher_options = {"max_attempts": args.bulk_max_attempts,
+                       "max_backoff_resubmits": args.bulk_max_backoff_resubmits}
+    validate = not args.no_isin_validation
+    if args.processes > 1:
+        print(f"Processes: {args.processes}")
+        report = run_bulk_processes(functools.partial(build_worker_client, args, client.base_url),
+                                    args.bulk_file, args.bulk_output, controller_options,
+                                    args.processes, validate=validate,
+                                    rejects_path=args.bulk_rejects,
+                                    snapshot_interval=args.snapshot_interval,
+                                    fetcher_options=fetcher_options,
+                                    on_progress=print_progress)
+        validation = report.pop("isin_validation", None)
+    else:
+        fetcher = BulkFetcher(client, args.bulk_output, BatchController(**controller_options),
+                              **fetcher_options)
+        isins = read_isins(args.bulk_file)
+        isin_filter = None
+        if validate:
+            isin_filter = IsinFilter(rejects_path=args.bulk_rejects)
+            isins = isin_filter.filter(isins)
+        report = fetcher.run(isins)
+        validation = isin_filter.report() if isin_filter is not None else None
+    print_bulk_report(report)
+    if args.processes == 1:
+        report_rate_limiting(report)
+    
+    if validation is not None:
+        # Each invalid ISIN would have taken a batch slot and come back
+        # not_found; at the mean batch size that is this many requests
+        mean_batch = report["batch_size"]["mean"] or 1
+        validation["requests_saved"] = math.ceil(validation["invalid"] / mean_batch)
+        validation["rejects_file"] = args.bulk_rejects
+        report["isin_validation"] = validation
+        print_validation_report(validation)
+        if args.bulk_rejects:
+            print(f"Rejected ISINs written to: {args.bulk_rejects}")
+    
+    with open("bulk_results.json", "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Bulk report saved to: bulk_results.json")
+    return report
+
+
+def run_backfill_mode(args: argparse.Namespace):
+    """Sweep historical prices for every ISIN in a file across a date range"""
+    holidays = read_holidays(args.backfill_holidays) if args.backfill_holidays else set()
+    dates = sweep_dates(args.backfill_start, args.backfill_end, args.backfill_calendar, holidays)
+    
+    print("\n" + "="*70)
+    print("SQX API HISTORICAL BACKFILL")
+    print("="*70)
+    print(f"Base URL: {client.base_url}")
+    print(f"ISIN file: {args.backfill}")
+    print(f"Dates: {args.backfill_start} to {args.backfill_end} ({args.backfill_calendar}, "
+          f"{len(dates)} dates per ISIN)")
+    
+    sweeper = BackfillSweeper(client, dates, args.backfill_output,
+                              checkpoint_path=args.backfill_checkpoint,
+                              chunk_days=args.backfill_chunk_days,
+                              workers=args.backfill_workers,
+                              source=args.backfill)
+    isins = read_isins(args.backfill)
+    isin_filter = None
+    if not args.no_isin_validation:
+        isin_filter = IsinFilter()
+        isins = isin_filter.filter(isins)
+    report = sweeper.run(isins)
+    print_backfill_report(report)
+    report_rate_limiting(report)
+    
+    if isin_filter is not None:
+        validation = isin_filter.report()
+        validation["requests_saved"] = validation["invalid"] * len(dates)
+        report["isin_validation"] = validation
+        print_validation_report(validation)
+    
+    with open("backfill_results.json", "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Backfill report saved to: backfill_results.json")
+    return report
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="SQX API test suite")
+    parser.add_argument("--base-url", default=None,
+                        help="override BASE_URL, e.g. to target a local stub server")
+    parser.add_argument("--mock", action="store_true",
+                        help="start the bundled mock server and run against it")
+    parser.add_argument("--pool-hosts", type=int, default=4,
+                        help="number of hosts to keep connection pools for")
+    parser.add_argument("--pool-size", type=int, default=16,
+                        help="maximum open connections per host")
+    parser.add_argument("--no-keep-alive", action="store_true",
+                        help="close the connection after every request")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of checks to run concurrently (1 = serial)")
+    parser.add_argument("--no-isin-validation", action="store_true",
+                        help="send ISINs without local format/check-digit validation")
+    parser.add_argument("--cache", action="store_true",
+                        help="memoize identical GET requests for the run")
+    parser.add_argument("--cache-ttl", type=float, default=60.0,
+                        help="seconds a cached response stays valid")
+    parser.add_argument("--cache-size", type=int, default=256,
+                        help="maximum cached responses (least recently used are evicted)")
+    
+    retries = parser.add_argument_group("retries and hedging")
+    retries.add_argument("--timeout", type=float, default=30.0,
+                         help="seconds to wait for a connection or response")
+    retries.add_argument("--retries", type=int, default=0,
+                         help="extra attempts for GETs failing with a retryable status or error")
+    retries.add_argument("--retry-backoff", type=float, default=0.2,
+                         help="backoff cap in seconds for the first retry, doubling per retry")
+    retries.add_argument("--retry-backoff-max", type=float, default=5.0,
+                         help="largest backoff delay between attempts")
+    retries.add_argument("--retry-after-max", type=float, default=60.0,
+                         help="longest server Retry-After to wait out; longer ones give up")
+    retries.add_argument("--retry-statuses",
+                         default=",".join(str(status) for status in sorted(DEFAULT_RETRY_STATUSES)),
+                         help="comma-separated HTTP statuses to retry")
+    retries.add_argument("--hedge", action="store_true",
+                         help="send a duplicate GET when one outlives the endpoint's p95")
+    retries.add_argument("--hedge-percentile", type=float, default=95.0,
+                         help="latency percentile after which a GET is hedged")
+    retries.add_argument("--hedge-min-samples", type=int, default=20,
+                         help="responses to observe per endpoint before hedging")
+    
+    profiling = parser.add_argument_group("harness profiling and live metrics")
+    profiling.add_argument("--profile", choices=PROFILE_MODES, default=None,
+                           help="profile each run phase: cprofile (the phase's own thread) or "
+                                "sample (stack sampling of every thread)")
+    profiling.add_argument("--profile-dir", default=".",
+                           help="directory for per-phase .prof / .folded profiles")
+    profiling.add_argument("--profile-interval-ms", type=float, default=5.0,
+                           help="milliseconds between stack samples with --profile sample")
+    profiling.add_argument("--profile-top", type=int, default=15,
+                           help="functions listed per phase in the profile report")
+    profiling.add_argument("--metrics-port", type=int, default=None,
+                           help="serve live Prometheus metrics on this port (0 = any free port)")
+    profiling.add_argument("--metrics-host", default="127.0.0.1",
+                           help="address the metrics endpoint listens on")
+    
+    coalescing = parser.add_argument_group("request coalescing")
+    coalescing.add_argument("--coalesce", action="store_true",
+                            help="batch concurrent single-ISIN lookups of --load-isins into bulk "
+                                 "requests; suite checks are never coalesced")
+    coalescing.add_argument("--coalesce-window-ms", type=float, default=5.0,
+                            help="milliseconds a lookup waits for others to join its batch")
+    coalescing.add_argument("--coalesce-max-batch", type=int, default=100,
+                            help="ISINs per bulk request; a full batch is sent at once")
+    
+    limits = parser.add_argument_group("client rate limiting")
+    limits.add_argument("--rate-limit", type=float, default=None,
+                        help="requests/second budget for each endpoint")
+    limits.add_argument("--endpoint-rate", action="append", default=[], metavar="NAME=RPS",
+                        help="budget for one endpoint (single, historical, bulk or a path); repeatable")
+    limits.add_argument("--rate-burst", type=float, default=None,
+                        help="requests an endpoint may send at once after idling "
+                             "(default: one second's budget)")
+    limits.add_argument("--adaptive-concurrency", action="store_true",
+                        help="halve requests in flight on 429/503/504/timeouts, grow back on success")
+    limits.add_argument("--max-concurrency", type=int, default=None,
+                        help="upper bound for adaptive concurrency (default: --pool-size)")
+    
+    results = parser.add_argument_group("result streaming")
+    results.add_argument("--results-file", default="test_results.jsonl",
+                         help="JSONL file results are streamed to ('' to disable)")
+    results.add_argument("--retain-payloads", choices=RETAIN_POLICIES, default="all",
+                         help="which response payloads to keep in results")
+    results.add_argument("--max-payload-bytes", type=int, default=None,
+                         help="truncate kept payloads beyond this serialized size")
+    results.add_argument("--json-codec", choices=CODEC_NAMES, default="auto",
+                         help="JSON codec for responses and results (auto: orjson if installed)")
+    results.add_argument("--no-retain-results", action="store_true",
+                         help="do not hold results in memory; the summary uses running aggregates")
+    results.add_argument("--summarize", metavar="JSONL", default=None,
+                         help="print the summary of a previous run's streamed results and exit")
+    
+    cassettes = parser.add_argument_group("record and replay")
+    cassettes.add_argument("--record", metavar="CASSETTE", default=None,
+                           help="record every exchange, credentials scrubbed, to this cassette "
+                                "(e.g. run.cassette)")
+    cassettes.add_argument("--replay", metavar="CASSETTE", default=None,
+                           help="answer requests from this cassette instead of the API")
+    cassettes.add_argument("--replay-match", choices=MATCH_MODES, default=MATCH_STRICT,
+                           help="strict: params and body must be equal; lenient: fall back to "
+                                "requests of the same shape (e.g. a different date)")
+    
+    history = parser.add_argument_group("latency history and regression gate")
+    history.add_argument("--history", default=None,
+                         help="append this run's latency histograms to this file, "
+                              "e.g. sqx_history.jsonl")
+    history.add_argument("--env", default=os.environ.get("SQX_ENV", "default"),
+                         help="environment name runs are keyed by (default: $SQX_ENV or 'default')")
+    history.add_argument("--run-id", default=None,
+                         help="id recorded for this run (default: timestamp plus random suffix)")
+    history.add_argument("--compare", action="store_true",
+                         help="gate this run against the baseline; exit nonzero on regression")
+    history.add_argument("--baseline-runs", type=int, default=10,
+                         help="most recent passing runs merged into the baseline")
+    history.add_argument("--regression-threshold", type=float, default=10.0,
+                         help="percent a p50/p90/p99 must grow by to count as a regression")
+    history.add_argument("--regression-min-delta-ms", type=float, default=1.0,
+                         help="milliseconds that percentile must also grow by")
+    history.add_argument("--regression-alpha", type=float, default=0.01,
+                         help="significance level of the Mann-Whitney U test")
+    history.add_argument("--regression-min-samples", type=int, default=None,
+                         help="samples needed on both sides before an endpoint is judged "
+                              f"(default {SUITE_MIN_SAMPLES} for the suite, {LOAD_MIN_SAMPLES} for load)")
+    
+    load = parser.add_argument_group("load mode")
+    load.add_argument("--load", action="store_true",
+                      help="generate load instead of running the checks")
+    load.add_argument("--endpoints", default="single,historical,bulk",
+                      help="comma-separated endpoints to load: single, historical, bulk")
+    load.add_argument("--load-isins", default=None,
+                      help="spread single-ISIN load over the ISINs in this file (one per line) "
+                           "instead of repeating one test ISIN")
+    load.add_argument("--rps", type=float, default=10.0,
+                      help="target request rate (requests/second)")
+    load.add_argument("--duration", type=float, default=10.0,
+                      help="load duration in seconds")
+    load.add_argument("--concurrency", type=int, default=16,
+                      help="maximum requests in flight")
+    load.add_argument("--processes", type=int, default=1,
+                      help="worker processes for load and bulk modes, each with its own "
+                           "connection pool and a share of the rate, concurrency or ISINs")
+    load.add_argument("--snapshot-interval", type=float, default=5.0,
+                      help="seconds between merged progress reports with --processes")
+    
+    mock = parser.add_argument_group("mock server (with --mock)")
+    mock.add_argument("--mock-synthetic", action="store_true",
+                      help="price every well-formed ISIN instead of only the test ISINs")
+    add_fault_arguments(mock, prefix="mock-")
+    
+    bulk = parser.add_argument_group("bulk fetch mode")
+    bulk.add_argument("--bulk-file", default=None,
+                      help="price every ISIN in this file (one per line) via the bulk endpoint")
+    bulk.add_argument("--bulk-output", default="bulk_prices.jsonl",
+                      help="JSONL file for merged success/not_found results")
+    bulk.add_argument("--bulk-rejects", default=None,
+                      help="write ISINs rejected by local validation to this file")
+    bulk.add_argument("--bulk-batch-size", type=int, default=50,
+                      help="initial ISINs per bulk request")
+    bulk.add_argument("--bulk-max-batch", type=int, default=500,
+                      help="largest batch size the planner may grow to")
+    bulk.add_argument("--bulk-max-in-flight", type=int, default=8,
+                      help="maximum concurrent bulk requests")
+    bulk.add_argument("--bulk-max-attempts", type=int, default=5,
+                      help="attempts per ISIN before it is written as failed, not counting "
+                           "resubmits after throttling or server errors")
+    bulk.add_argument("--bulk-max-backoff-resubmits", type=int, default=100,
+                      help="resubmits per ISIN after 429 or 5xx batch responses")
+    bulk.add_argument("--bulk-target-latency", type=float, default=2.0,
+                      help="batch latency (seconds) the planner sizes batches for")
+    
+    backfill = parser.add_argument_group("historical backfill mode")
+    backfill.add_argument("--backfill", metavar="ISIN_FILE", default=None,
+                          help="sweep historical prices for every ISIN in this file")
+    backfill.add_argument("--backfill-start", default=None,
+                          help="first date to sweep, YYYY-MM-DD (default: one year before the end)")
+    backfill.add_argument("--backfill-end", default=None,
+                          help="last date to sweep, YYYY-MM-DD (default: today)")
+    backfill.add_argument("--backfill-calendar", choices=CALENDARS, default="weekdays",
+                          help="which days in the range to request")
+    backfill.add_argument("--backfill-holidays", default=None,
+                          help="file of YYYY-MM-DD dates to leave out of the calendar")
+    backfill.add_argument("--backfill-output", default="backfill_prices.csv",
+                          help="CSV file for swept prices")
+    backfill.add_argument("--backfill-checkpoint", default=None,
+                          help="checkpoint file (default: <output>.checkpoint.json); "
+                               "an existing checkpoint resumes the sweep")
+    backfill.add_argument("--backfill-workers", type=int, default=8,
+                          help="concurrent date chunks")
+    backfill.add_argument("--backfill-chunk-days", type=int, default=20,
+                          help="dates per work item")
+    
+    args = parser.parse_args(argv)
+    try:
+        args.mock_faults = faults_from_args(args, prefix="mock-")
+    except ValueError as e:
+        parser.error(str(e))
+    args.endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = [name for name in args.endpoints if name not in endpoint_requests()]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+    if args.rps <= 0 or args.duration <= 0:
+        parser.error("--rps and --duration must be positive")
+    endpoint_paths = {name: spec["endpoint"] for name, spec in endpoint_requests().items()}
+    rates = {}
+    for entry in args.endpoint_rate:
+        name, _, value = entry.partition("=")
+        try:
+            rate = float(value)
+        except ValueError:
+            parser.error(f"--endpoint-rate expects NAME=RPS, got {entry!r}")
+        if rate <= 0:
+            parser.error(f"--endpoint-rate must be positive, got {entry!r}")
+        rates[endpoint_paths.get(name.strip(), name.strip())] = rate
+    args.endpoint_rate = rates
+    try:
+        args.retry_statuses = {int(status) for status in args.retry_statuses.split(",") if status.strip()}
+    except ValueError:
+        parser.error("--retry-statuses expects comma-separated status codes")
+    if args.retries < 0 or args.timeout <= 0:
+        parser.error("--retries must not be negative and --timeout must be positive")
+    if args.retry_after_max < 0:
+        parser.error("--retry-after-max must not be negative")
+    if not 0 < args.hedge_percentile < 100:
+        parser.error("--hedge-percentile must be between 0 and 100")
+    if args.rate_limit is not None and args.rate_limit <= 0:
+        parser.error("--rate-limit must be positive")
+    if args.bulk_file and not os.path.isfile(args.bulk_file):
+        parser.error(f"--bulk-file not found: {args.bulk_file}")
+    if args.bulk_max_attempts < 1 or args.bulk_max_backoff_resubmits < 0:
+        parser.error("--bulk-max-attempts must be at least 1 and --bulk-max-backoff-resubmits "
+                     "not negative")
+    if args.load_isins and not os.path.isfile(args.load_isins):
+        parser.error(f"--load-isins not found: {args.load_isins}")
+    if args.coalesce and not (args.load and args.load_isins):
+        parser.error("--coalesce needs --load with --load-isins; lookups of one ISIN never batch")
+    if args.coalesce_window_ms < 0 or args.coalesce_max_batch < 1:
+        parser.error("--coalesce-window-ms must not be negative and --coalesce-max-batch at least 1")
+    if args.processes < 1 or args.snapshot_interval <= 0:
+        parser.error("--processes must be at least 1 and --snapshot-interval positive")
+    if args.load and args.concurrency < args.processes:
+        parser.error("--concurrency must be at least --processes")
+    if args.profile_interval_ms <= 0 or args.profile_top < 1:
+        parser.error("--profile-interval-ms must be positive and --profile-top at least 1")
+    if args.metrics_port is not None and args.processes > 1:
+        parser.error("--metrics-port needs a single process")
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+    if (args.record or args.replay) and args.processes > 1:
+        parser.error("--record and --replay need a single process")
+    if args.compare and not args.history:
+        parser.error("--compare needs a --history file")
+    if args.baseline_runs < 1 or not 0 < args.regression_alpha < 1:
+        parser.error("--baseline-runs must be at least 1 and --regression-alpha between 0 and 1")
+    args.run_id = args.run_id or new_run_id()
+    try:
+        get_codec(args.json_codec)
+    except ValueError as e:
+        parser.error(f"--json-codec: {e}")
+    if args.backfill:
+        try:
+            end = date.fromisoformat(args.backfill_end) if args.backfill_end else date.today()
+            start = (date.fromisoformat(args.backfill_start) if args.backfill_start
+                     else end - timedelta(days=365))
+        except ValueError as e:
+            parser.error(f"invalid backfill date: {e}")
+        if start > end:
+            parser.error("--backfill-start must not be after --backfill-end")
+        args.backfill_start, args.backfill_end = start.isoformat(), end.isoformat()
+        if args.backfill_workers < 1 or args.backfill_chunk_days < 1:
+            parser.error("--backfill-workers and --backfill-chunk-days must be at least 1")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    mock_server = None
+    if args.mock:
+        mock_server = MockSQXServer(API_KEY, MockDataset.default(synthetic=args.mock_synthetic),
+                                    args.mock_faults)
+        BASE_URL = mock_server.start()
+    elif args.base_url:
+        BASE_URL = args.base_url.rstrip("/")
+    cassette = None
+    if args.record:
+        cassette = CassetteRecorder(args.record, API_KEY, BASE_URL)
+    elif args.replay:
+        cassette = CassettePlayer(args.replay, API_KEY, args.replay_match)
+    configure_client(**client_options(args), cassette=cassette)
+    profiler = PhaseProfiler(args.profile, args.profile_dir, args.profile_interval_ms / 1000,
+                             args.profile_top)
+    metrics_server = None
+    if client.metrics is not None:
+        metrics_server = MetricsServer(client.metrics, args.metrics_port, args.metrics_host)
+        print(f"Serving live metrics at {metrics_server.start()}")
+    
+    exit_code = 0
+    try:
+        if args.summarize:
+            run_summarize_mode(args)
+        elif args.load:
+            with profiler.phase("load"):
+                load_report = run_load_mode(args)
+            if load_report is not None:
+                exit_code = gate_latency(args, f"load-{args.rps:g}rps", load_histograms(load_report))
+        elif args.bulk_file:
+            with profiler.phase("bulk"):
+                run_bulk_mode(args)
+        elif args.backfill:
+            with profiler.phase("backfill"):
+                run_backfill_mode(args)
+        else:
+            run_test_suite(args)
+            exit_code = gate_latency(args, "suite", suite_histograms(), suite_checks())
+        profile_report = profiler.report()
+        if profile_report is not None:
+            print_profile_report(profile_report)
+    finally:
+        if metrics_server is not None:
+            metrics_server.stop()
+        client.close()
+        if cassette is not None:
+            cassette.close()
+        if mock_server is not None:
+            mock_server.stop()
+    sys.exit(exit_code)
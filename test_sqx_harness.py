@@ -0,0 +1,224 @@
+"""
+SQX Harness Unit Tests
+Tests of the harness's own logic, run offline against stand-in clients or
+the in-process mock server:
+
+  python -m unittest test_sqx_harness
+"""
+
+import csv
+import json
+import os
+import random
+import tempfile
+import threading
+import unittest
+
+from datetime import date, timedelta
+
+from sqx_backfill import BackfillSweeper, CALENDAR_DAILY, sweep_dates
+from sqx_baseline import GATE_INSUFFICIENT, GATE_PASS, LatencyHistory, compare_runs
+from sqx_bulk import BatchController, BulkFetcher
+from sqx_client import SQXClient
+from sqx_coalesce import BulkCoalescer
+from sqx_histogram import LatencyHistogram
+from sqx_mock_server import MockDataset, MockSQXServer
+from sqx_retry import RetryPolicy
+from sqx_workers import split_concurrency
+
+API_KEY = "unit-test-key"
+
+
+class OmittingClient:
+    """Bulk client whose first response leaves one ISIN out of every array"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def request(self, method, endpoint, json_data=None, **kwargs):
+        self.calls += 1
+        isins = json_data["isin_list"]
+        if self.calls == 1:
+            isins = isins[1:]
+        return 200, {"success": [{"isin": isin, "price": 100.0} for isin in isins],
+                     "not_found": [], "unprocessed": []}
+
+
+class BatchControllerTest(unittest.TestCase):
+
+    def test_random_unprocessed_rate_does_not_collapse_batches(self):
+        rng = random.Random(7)
+        controller = BatchController()
+        for _ in range(2000):
+            sent = controller.next_batch_size()
+            processed = sum(rng.random() >= 0.3 for _ in range(sent))
+            controller.record_success(sent, processed, 0.05)
+        self.assertEqual(controller.ceiling, controller.max_batch)
+        self.assertEqual(controller.next_batch_size(), controller.max_batch)
+
+    def test_fixed_server_ceiling_is_detected(self):
+        controller = BatchController()
+        for _ in range(50):
+            sent = controller.next_batch_size()
+            controller.record_success(sent, min(sent, 100), 0.05)
+        self.assertIn(controller.ceiling, (100, 101))
+        self.assertLessEqual(controller.next_batch_size(), 101)
+
+    def test_capped_and_random_unprocessed_keeps_batches_near_the_cap(self):
+        rng = random.Random(7)
+        controller = BatchController()
+        for _ in range(500):
+            sent = controller.next_batch_size()
+            processed = sum(rng.random() >= 0.3 for _ in range(min(sent, 100)))
+            controller.record_success(sent, processed, 0.05)
+        self.assertGreaterEqual(controller.next_batch_size(), 50)
+        self.assertLessEqual(controller.ceiling, 100)
+
+
+class BulkFetcherTest(unittest.TestCase):
+
+    def test_isins_missing_from_a_response_are_resubmitted(self):
+        isins = [f"US{n:010d}" for n in range(5)]
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "bulk.jsonl")
+            fetcher = BulkFetcher(OmittingClient(), output)
+            report = fetcher.run(isins)
+            with open(output) as f:
+                written = [json.loads(line)["isin"] for line in f]
+        self.assertEqual(sorted(written), isins)
+        self.assertEqual(report["missing_isins"], 1)
+        self.assertEqual(report["success"], len(isins))
+
+
+class BulkCoalescerTest(unittest.TestCase):
+
+    def lookup_all(self, coalescer, isins, send_bulk, send_single):
+        results = {}
+
+        def lookup(isin):
+            results[isin] = coalescer.lookup(isin, send_bulk, send_single)
+
+        threads = [threading.Thread(target=lookup, args=(isin,)) for isin in isins]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_failed_bulk_request_is_handed_to_every_lookup(self):
+        singles = []
+        coalescer = BulkCoalescer(window=0.2, max_batch=3)
+        results = self.lookup_all(
+            coalescer, ["US0000000001", "US0000000002", "US0000000003"],
+            lambda isins: (429, {"message": "Too Many Requests"}, {"wire_ms": 1.0}),
+            lambda isin: singles.append(isin) or (200, {}, None))
+        self.assertEqual(singles, [])
+        self.assertEqual({result[0] for result, _ in results.values()}, {429})
+        self.assertEqual(coalescer.stats()["bulk_failures"], 1)
+
+    def test_lookups_share_the_bulk_request_timing(self):
+        isins = ["US0000000001", "US0000000002"]
+        coalescer = BulkCoalescer(window=0.2, max_batch=2)
+        results = self.lookup_all(
+            coalescer, isins,
+            lambda batch: (200, {"success": [{"isin": isin} for isin in batch]}, {"wire_ms": 4.0}),
+            lambda isin: (200, {}, None))
+        for (status, _), info in results.values():
+            self.assertEqual(status, 200)
+            self.assertEqual(info["timing"], {"wire_ms": 4.0})
+            self.assertEqual(info["batch_size"], 2)
+
+
+class BackfillSweeperTest(unittest.TestCase):
+
+    def setUp(self):
+        # Weekday prices from 2021-01-04 only, so sweeps can start before the history
+        prices = {}
+        day = date(2021, 1, 4)
+        while day <= date(2021, 2, 26):
+            if day.weekday() < 5:
+                prices[day.isoformat()] = 100.0 + len(prices)
+            day += timedelta(days=1)
+        self.priced = sorted(prices)
+        self.server = MockSQXServer(API_KEY, MockDataset({"US0000000001": {
+            "reference": {"name": "Test Bond", "currency": "USD"}, "prices": prices}}))
+        self.client = SQXClient(self.server.start(), API_KEY)
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        self.directory.cleanup()
+
+    def sweep(self, start, end, chunk_days):
+        dates = sweep_dates(start, end, CALENDAR_DAILY)
+        output = os.path.join(self.directory.name, f"backfill-{chunk_days}.csv")
+        report = BackfillSweeper(self.client, dates, output, chunk_days=chunk_days,
+                                 workers=1).run(["US0000000001"])
+        with open(output, newline="") as f:
+            rows = [(row["isin"], row["pricing_date"]) for row in csv.DictReader(f)]
+        return dates, report, rows
+
+    def test_sweep_starting_before_history_stores_each_price_once(self):
+        for chunk_days in (1, 5, 20, 45):
+            with self.subTest(chunk_days=chunk_days):
+                dates, report, rows = self.sweep("2020-12-20", "2021-01-31", chunk_days)
+                expected = [day for day in self.priced if day <= "2021-01-31"]
+                self.assertEqual(len(rows), len(set(rows)))
+                self.assertEqual(sorted(day for _, day in rows), expected)
+                self.assertEqual(report["failed_dates"], 0)
+                self.assertLessEqual(report["requests"], len(dates))
+
+
+class LatencyHistoryTest(unittest.TestCase):
+
+    @staticmethod
+    def histogram(*seconds):
+        histogram = LatencyHistogram()
+        for value in seconds:
+            histogram.record(value)
+        return histogram
+
+    def test_baseline_only_merges_runs_of_the_same_checks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            history = LatencyHistory(os.path.join(directory, "history.jsonl"))
+            history.append("a", "env", "mock", "suite", {"/x": self.histogram(0.01)}, checks=["one"])
+            history.append("b", "env", "mock", "suite", {"/x": self.histogram(0.02)},
+                           checks=["one", "two"])
+            baseline, runs = history.baseline("env", "mock", "suite", checks=["one"])
+        self.assertEqual(runs, ["a"])
+        self.assertEqual(baseline["/x"].total_count, 1)
+
+    def test_gate_is_insufficient_when_nothing_could_be_judged(self):
+        few = {"/x": self.histogram(0.01, 0.01)}
+        self.assertEqual(compare_runs(few, few, ["a"], min_samples=10)["gate"], GATE_INSUFFICIENT)
+        self.assertEqual(compare_runs({}, few, [], min_samples=10)["gate"], GATE_PASS)
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def test_retry_after_longer_than_backoff_max_is_waited_out(self):
+        policy = RetryPolicy(backoff_base=0.2, backoff_max=5.0, retry_after_max=60.0)
+        for retry in range(5):
+            self.assertGreaterEqual(policy.delay(retry, 10.0), 10.0)
+        self.assertLessEqual(policy.delay(0), 0.2)
+
+    def test_retry_after_beyond_the_cap_gives_up(self):
+        policy = RetryPolicy(retry_after_max=30.0)
+        self.assertIsNone(policy.delay(0, 120.0))
+        self.assertEqual(policy.delay(0, 30.0), 30.0)
+
+
+class SplitConcurrencyTest(unittest.TestCase):
+
+    def test_worker_limits_add_up_to_the_concurrency(self):
+        self.assertEqual(split_concurrency(16, 3), [6, 5, 5])
+        for concurrency in range(1, 40):
+            for processes in range(1, concurrency + 1):
+                shares = split_concurrency(concurrency, processes)
+                self.assertEqual(sum(shares), concurrency)
+                self.assertLessEqual(max(shares) - min(shares), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()